@@ -2,28 +2,161 @@
 """
 Phase A-1年齢層別実装テスト - Gemini相談スクリプト
 学生向けプロンプト最適化の実証テスト
+
+使い方:
+  python3 age_group_implementation_test.py [--stream] [--resume] [--output PATH]
+  python3 age_group_implementation_test.py --matrix-only [--matrix-output PATH] [--workers 4]
+  python3 age_group_implementation_test.py --provider record|replay [--cassette PATH]
+      [--replay-latency lognormal:0.8,0.6] [--replay-error-rate 0.05] [--seed N]
+
+--stream では API 応答をチャンク単位で受け取り、テストが終わるたびに
+phase_a1_test_results.jsonl へ1行追記する。--resume は完了済みのテストを飛ばして再開する。
+
+--provider record は API 応答をカセットに記録し、replay はカセットから遅延・エラーを注入しつつ
+返す（gemini_tools/providers.py）。replay は API キーなしでもモックではなく応答処理の経路を通る。
+
+年齢層別シナリオテストは、AGE_GROUP_SCENARIOS の年齢層 × 場面 × duration（5/15/30）の
+全セルについて提案を生成し、suggestions_master の形での検証と品質ヒューリスティック
+（supabase/_lib/quality_scorer.py）で採点する（gemini_tools/scenario_matrix.py）。セルは
+--workers 本のワーカーで並行に処理し、終わるたびに --matrix-output（JSONL）へ1行追記する。
+モックモードは全セルを1秒以内に終えるので、--matrix-only をコミットごとの確認に使える
+（失敗したセルがあれば終了コード 1）。
 """
 
 import os
+import sys
 import json
+import argparse
 import time
-from typing import Dict, List, Any
-import google.generativeai as genai
+from pathlib import Path
+from typing import Dict, Any
+
+from gemini_tools.rate_limit import RateLimiter, is_rate_limit_error
+from gemini_tools.response_cache import ResponseCache
+from gemini_tools.metrics import CallMetrics, latency_history, print_steps
+from gemini_tools.providers import GeminiProvider, add_provider_args, provider_from_args
+from gemini_tools.results_log import ResultsLog
+from gemini_tools.retry import (
+    DEFAULT_DEADLINE, ResilientCaller, add_retry_args, caller_from_args, check_cancel,
+)
+from gemini_tools.scenario_matrix import DEFAULT_WORKERS, DURATIONS, matrix_cells, run_matrix, summarize
+from gemini_tools.suggestion_stream import SuggestionStreamParser, parse_suggestions
+
+MODEL_NAME = 'gemini-1.5-flash'
+
+# 結果の既定の出力先（リポジトリ直下）。--output / --matrix-output で変えられる
+RESULTS_DIR = Path(__file__).resolve().parent
+RESULTS_PATH = RESULTS_DIR / 'phase_a1_test_results.json'
+MATRIX_RESULTS_PATH = RESULTS_DIR / 'phase_a1_matrix_results.jsonl'
+
+# 提案を suggestions_master の行に揃えるときの既定値（学生向けプロンプトの条件と同じ）
+STUDENT_DEFAULTS = {'duration': 5, 'situation': ['studying'], 'age_groups': ['student']}
+
+# 年齢層別シナリオ（年齢層 -> 場面）。各場面を DURATIONS の全 duration で試す
+AGE_GROUP_SCENARIOS = {
+    'student': ['studying', 'school', 'home', 'commuting'],
+    'office_worker': ['workplace', 'home', 'outside'],
+    'middle_school': ['school', 'home', 'outside'],
+    'housewife': ['home', 'outside'],
+    'elderly': ['home', 'outside'],
+}
+AGE_GROUP_LABELS = {
+    'student': '16-22歳の高校生・大学生',
+    'office_worker': '社会人（会社員）',
+    'middle_school': '中学生',
+    'housewife': '主婦・主夫',
+    'elderly': '高齢者',
+}
+SITUATION_LABELS = {
+    'studying': '勉強中・勉強の合間',
+    'school': '学校',
+    'home': '家',
+    'commuting': '通学・通勤中',
+    'workplace': '職場',
+    'outside': '外出先',
+}
+
+# シナリオ行列の1セル分のプロンプト（学生向けプロンプトの要件を年齢層・場面・時間で差し替えたもの）
+SCENARIO_PROMPT_TEMPLATE = """{age_group}のストレスに寄り添うAIカウンセラーとして、気晴らし方法を3つ提案してください。
+
+条件：
+- 場所: {situation}
+- 時間: {duration}分
+- 対象: {age_group}
+
+要件：
+1. 具体的で実行可能な提案
+2. {duration}分間でちょうど完了できる内容にする
+3. 認知的気晴らし（頭の中で行う）と行動的気晴らし（体を動かす）をバランスよく含める
+4. 絵文字を適度に使用（各提案に1-2個）
+5. 各提案には以下を含める：
+   - タイトル（20文字以内）
+   - 説明（100文字程度）
+   - カテゴリ（"認知的" または "行動的"）
+   - 具体的な手順（3-5ステップ）
+   - ガイド（実行時の案内文、200文字程度）
+   - duration（実行時間: {duration}）
+
+以下のJSON形式で回答してください：
+[{{"title":"提案のタイトル","description":"提案の説明","category":"認知的","steps":["ステップ1","ステップ2","ステップ3"],"guide":"案内文","duration":{duration}}}]
+
+重要: コードブロック記法を使わず、純粋なJSON配列のみを返してください。"""
+
+# 結果ログで完了扱いにするステータス（API フォールバックは再開時にやり直す）
+COMPLETED_STATUSES = ('api_success', 'cache_hit', 'mock_success')
 
-# Gemini API設定
+def completed(result: Dict[str, Any]) -> bool:
+    """結果ログで完了扱いにするか（シナリオ行列は失敗したセルが無いときだけ）"""
+    matrix = result.get('_matrix')
+    if matrix is not None:
+        return not matrix['failed_cells']
+    return result.get('status', 'mock_success') in COMPLETED_STATUSES
+
+# Gemini API設定（SDK はモックモードでは読み込まない）
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
-if not GEMINI_API_KEY:
-    print("注意: GEMINI_API_KEY環境変数が設定されていません")
-    print("テストはモックデータで実行されます")
-    GEMINI_MOCK_MODE = True
-else:
-    genai.configure(api_key=GEMINI_API_KEY)
-    GEMINI_MOCK_MODE = False
+GEMINI_MOCK_MODE = not GEMINI_API_KEY
+
+def quality_scorer():
+    """supabase/_lib/quality_scorer.py の score_suggestions
+
+    NumPy を読み込むので、モジュールの import ではなくシナリオ行列を実行するときに読み込む。
+    """
+    path = str(Path(__file__).resolve().parent / 'supabase')
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    from _lib.quality_scorer import score_suggestions
+    return score_suggestions
+
 
 class PhaseA1ImplementationTester:
-    def __init__(self):
-        if not GEMINI_MOCK_MODE:
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
+    def __init__(self, stream: bool = False, resume: bool = False, provider=None,
+                 caller: ResilientCaller = None, output=RESULTS_PATH,
+                 matrix_output=MATRIX_RESULTS_PATH, workers: int = DEFAULT_WORKERS):
+        self.stream = stream
+        self.resume = resume
+        self.output = Path(output)
+        self.matrix_output = Path(matrix_output)
+        self.workers = workers
+        # 結果ログは結果 JSON と同じ場所に拡張子 .jsonl で置く
+        self.log = ResultsLog(self.output.with_suffix('.jsonl'), resume) if stream or resume else None
+        # プロバイダーを渡されたとき（replay など）は API キーが無くてもモックにしない
+        self.mock = provider is None and GEMINI_MOCK_MODE
+        if self.mock:
+            print("注意: GEMINI_API_KEY環境変数が設定されていません")
+            print("テストはモックデータで実行されます")
+        else:
+            self.provider = provider or GeminiProvider(MODEL_NAME, GEMINI_API_KEY)
+            # 上限は GEMINI_RATE_PLAN（既定 free）のプラン値
+            self.limiter = RateLimiter.from_plan()
+            # 同じプロンプトの応答は .cache/gemini-responses/ から使い回す（GEMINI_NO_CACHE=1 で無効）
+            self.cache = ResponseCache()
+            # 429 / 5xx のリトライ・期限・ヘッジ（gemini_tools/retry.py）
+            self.caller = caller or ResilientCaller(deadline=DEFAULT_DEADLINE)
+            # ヘッジの分位は過去の実行の所要時間から始める（1回きりの実行ではサンプルが揃わない）
+            if self.caller.hedge_percentile is not None:
+                self.caller.latency.extend(latency_history("phase_a1"))
+        # API 呼び出しの所要時間・トークン・コスト（gemini_tools/metrics.py）
+        self.metrics = CallMetrics("phase_a1", MODEL_NAME)
         self.test_results = {}
         
     def test_student_prompt_optimization(self) -> Dict[str, Any]:
@@ -81,24 +214,93 @@ class PhaseA1ImplementationTester:
 
         test_results = {}
         
-        if GEMINI_MOCK_MODE:
+        if self.mock:
             print("🔸 モックモード: サンプル学生向け提案を生成中...")
             test_results['student_response'] = self.generate_mock_student_response()
             test_results['status'] = 'mock_success'
         else:
             try:
                 print("🔸 Gemini APIに学生向けプロンプトを送信中...")
-                response = self.model.generate_content(student_prompt)
-                test_results['student_response'] = response.text
-                test_results['status'] = 'api_success'
+                text, test_results['status'] = self._generate(student_prompt, 'student_prompt')
+                test_results['student_response'] = text
                 print("✅ 学生向け提案生成成功")
             except Exception as e:
                 print(f"❌ API エラー: {e}")
                 test_results['student_response'] = self.generate_mock_student_response()
                 test_results['status'] = 'fallback_to_mock'
         
+        # 応答の提案を suggestions_master の形に照らして検証
+        suggestions, validation = parse_suggestions(test_results['student_response'], STUDENT_DEFAULTS)
+        test_results['suggestions'] = suggestions
+        test_results['validation'] = validation
+        print(f"   提案の検証: 有効 {validation['valid']} 件 / 無効 {validation['invalid']} 件")
+        
         return test_results
     
+    def _generate(self, prompt: str, step: str):
+        """キャッシュに無ければレート制限・リトライ付きで API を呼ぶ。(応答テキスト, ステータス) を返す
+
+        失敗した呼び出しも計測に記録してから例外を送出する（複数のスレッドから呼んでよい）。
+        """
+        queued_since = time.perf_counter()
+        key = self.cache.key(MODEL_NAME, prompt)
+        text = self.cache.get(key)
+        if text is not None:
+            self.metrics.record(step, prompt, text, cached=True)
+            return text, 'cache_hit'
+        sent_at = []
+        stats = {}
+
+        def attempt(cancel):
+            # リトライ・ヘッジの送信もそれぞれレート制限を通す
+            self.limiter.acquire()
+            # 待っている間に期限切れ・ヘッジで負けて不要になっていたら送らない
+            check_cancel(cancel)
+            sent_at.append(time.perf_counter())
+            return self._request(prompt, cancel)
+
+        try:
+            text, first_chunk = self.caller.call(attempt, step, stats)
+        except Exception as e:
+            if sent_at:
+                self.metrics.record(step, prompt, wall_seconds=time.perf_counter() - sent_at[0],
+                                    queued_seconds=sent_at[0] - queued_since,
+                                    retries=stats.get('attempts', 1) - 1, error=e,
+                                    sent=len(sent_at))
+            raise
+        started = sent_at[0]
+        self.metrics.record(step, prompt, text, time.perf_counter() - started, first_chunk,
+                            started - queued_since, retries=stats['attempts'] - 1,
+                            hedged=stats['hedged'], sent=len(sent_at))
+        self.cache.put(key, text, model=MODEL_NAME)
+        return text, 'api_success'
+
+    def _request(self, prompt: str, cancel=None):
+        """1回分の API 呼び出し。(応答テキスト, 最初のチャンクまでの秒数) を返す"""
+        started = time.perf_counter()
+        first_chunk = None
+        check_cancel(cancel)
+        try:
+            if not self.stream:
+                return self.provider.generate(prompt), None
+            # 提案オブジェクトが閉じるたびに検証して表示する（応答の受信を待たない）
+            parts = []
+            parser = SuggestionStreamParser(STUDENT_DEFAULTS)
+            for chunk in self.provider.stream(prompt):
+                if cancel is not None and cancel.is_set():
+                    break
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - started
+                parts.append(chunk)
+                for row in parser.feed(chunk):
+                    print(f"   📥 提案 {parser.emitted}: {row['title']}")
+            parser.close()
+            return ''.join(parts), first_chunk
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.limiter.pause()
+            raise
+
     def generate_mock_student_response(self) -> str:
         """学生向けモック提案データ"""
         return """[
@@ -144,42 +346,75 @@ class PhaseA1ImplementationTester:
   }
 ]"""
     
+    def generate_mock_cell_response(self, cell) -> str:
+        """シナリオ行列のモック応答（学生向けモック提案の duration をセルに合わせたもの）"""
+        suggestions = json.loads(self.generate_mock_student_response())
+        for suggestion in suggestions:
+            suggestion['duration'] = cell.duration
+        return json.dumps(suggestions, ensure_ascii=False)
+
+    def _generate_cell(self, cell):
+        if self.mock:
+            return self.generate_mock_cell_response(cell), 'mock_success'
+        prompt = SCENARIO_PROMPT_TEMPLATE.format(age_group=AGE_GROUP_LABELS[cell.age_group],
+                                                 situation=SITUATION_LABELS[cell.situation],
+                                                 duration=cell.duration)
+        return self._generate(prompt, 'scenario')
+
+    def _score_cell(self, cell, text: str) -> Dict[str, Any]:
+        """応答の提案を検証し、品質ヒューリスティックで採点する"""
+        score_suggestions = quality_scorer()
+        defaults = {'duration': cell.duration, 'situation': [cell.situation], 'age_groups': [cell.age_group]}
+        suggestions, validation = parse_suggestions(text, defaults)
+        quality = score_suggestions(suggestions, expected_duration=cell.duration)
+        scores = quality.scores()
+        return {
+            'valid': validation['valid'],
+            'invalid': validation['invalid'],
+            'quality_total': sum(scores),
+            'quality': round(sum(scores) / len(scores), 2) if scores else 0.0,
+            'pass_rates': {rule: round(rate, 3) for rule, rate in quality.pass_rates().items()},
+            'titles': [suggestion['title'] for suggestion in suggestions],
+        }
+
     def test_age_group_scenarios(self) -> Dict[str, Any]:
-        """年齢層別シナリオテスト"""
+        """年齢層別シナリオテスト（年齢層 × 場面 × duration の全セルを生成・採点）"""
         print("\n=== Phase A-1 年齢層別シナリオテスト ===")
-        
-        scenarios = {
-            'student': ['studying', 'school', 'home', 'commuting'],
-            'office_worker': ['workplace', 'home', 'outside'],
-            'middle_school': ['school', 'home', 'outside'],
-            'housewife': ['home', 'outside'],
-            'elderly': ['home', 'outside']
+        cells = matrix_cells(AGE_GROUP_SCENARIOS, DURATIONS)
+        log = ResultsLog(self.matrix_output, self.resume)
+        print(f"🔸 {len(cells)} セル（{len(AGE_GROUP_SCENARIOS)} 年齢層 × 場面 × {len(DURATIONS)} 時間）を"
+              f"{self.workers} ワーカーで実行中...")
+        started = time.perf_counter()
+        # ワーカーのスレッドで初めて import しないよう、先に読み込んでおく
+        quality_scorer()
+
+        def report(cell, result):
+            if result['status'] == 'error':
+                print(f"   ❌ {cell.key}: {result['error']}")
+            else:
+                print(f"   📊 {cell.key}: 有効 {result['valid']} / 無効 {result['invalid']} / "
+                      f"品質 {result['quality']:.2f}")
+
+        results = run_matrix(cells, self._generate_cell, self._score_cell, log, self.workers,
+                             ok=lambda result: result['status'] in COMPLETED_STATUSES, on_cell=report)
+        elapsed = time.perf_counter() - started
+
+        test_results = summarize(cells, results, totals=('valid', 'invalid', 'quality_total'))
+        failed = [key for key, result in results.items()
+                  if result['status'] == 'error' or not result['valid']]
+        for data in test_results.values():
+            data['count'] = len(data['situations'])
+            data['quality'] = round(data.pop('quality_total') / data['valid'], 2) if data['valid'] else 0.0
+        test_results['_matrix'] = {
+            'cells': len(cells),
+            'failed_cells': failed,
+            'elapsed_seconds': round(elapsed, 3),
+            'output': str(log.path),
         }
-        
-        test_results = {}
-        
-        for age_group, situations in scenarios.items():
-            print(f"🔸 {age_group} 向けシナリオ: {situations}")
-            test_results[age_group] = {
-                'situations': situations,
-                'count': len(situations),
-                '適用性': self.evaluate_scenario_applicability(age_group, situations)
-            }
-        
-        print("✅ 年齢層別シナリオ設計完了")
+        print(f"{'⚠️' if failed else '✅'} 年齢層別シナリオ {len(cells)} セル完了"
+              f"（{elapsed:.2f}秒、失敗 {len(failed)} セル） → {log.path}")
         return test_results
     
-    def evaluate_scenario_applicability(self, age_group: str, situations: List[str]) -> str:
-        """シナリオの適用性評価"""
-        evaluations = {
-            'student': "✅ 学生生活に特化した4つのシナリオで、勉強・学校・通学・家庭のすべての場面をカバー",
-            'office_worker': "✅ 従来の職場・家・外出先の3シナリオで社会人のライフスタイルに適合",
-            'middle_school': "✅ 中学生の安全性を重視したシナリオ設計（外出制限考慮）",
-            'housewife': "✅ 家事・育児中心の生活パターンに最適化したシナリオ",
-            'elderly': "✅ 高齢者の体力・移動制約を考慮した安全なシナリオ"
-        }
-        return evaluations.get(age_group, "評価対象外")
-    
     def test_prompt_personalization(self) -> Dict[str, Any]:
         """プロンプトのパーソナライゼーションテスト"""
         print("\n=== Phase A-1 プロンプトパーソナライゼーションテスト ===")
@@ -235,21 +470,35 @@ class PhaseA1ImplementationTester:
         print("🚀 Phase A-1 年齢層別展開戦略 - 実装テスト開始")
         print("="*60)
         
-        # 各テストの実行
-        self.test_results['student_prompt'] = self.test_student_prompt_optimization()
-        time.sleep(1)
-        
-        self.test_results['age_group_scenarios'] = self.test_age_group_scenarios()
-        time.sleep(1)
-        
-        self.test_results['prompt_personalization'] = self.test_prompt_personalization()
+        # 各テストの実行（--stream / --resume ではテストごとに結果ログへ追記）
+        # API 呼び出しの間隔は self.limiter が決める
+        tests = {
+            'student_prompt': self.test_student_prompt_optimization,
+            'age_group_scenarios': self.test_age_group_scenarios,
+            'prompt_personalization': self.test_prompt_personalization,
+        }
+        for key, run in tests.items():
+            if self.log and key in self.log.completed:
+                self.test_results[key] = self.log.completed[key]
+                print(f"⏭️  {key}: 前回の結果を再利用（{self.log.path.name}）")
+                continue
+            self.test_results[key] = run()
+            if self.log:
+                self.log.append(key, self.test_results[key], ok=completed(self.test_results[key]))
         
         # 結果の保存
-        with open('/home/ryu/projects/kibarashi-app/phase_a1_test_results.json', 'w', encoding='utf-8') as f:
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.output, 'w', encoding='utf-8') as f:
             json.dump(self.test_results, f, ensure_ascii=False, indent=2)
         
         # サマリーの表示
         self.display_test_summary()
+
+        if self.metrics.calls:
+            print("\n📈 API 呼び出しの計測:")
+            print_steps(self.metrics.report())
+            json_path, prom_path = self.metrics.export()
+            print(f"   計測レポート: {json_path} / Prometheus: {prom_path}")
     
     def display_test_summary(self):
         """テスト結果サマリーの表示"""
@@ -261,15 +510,39 @@ class PhaseA1ImplementationTester:
         student_status = self.test_results['student_prompt']['status']
         if student_status == 'api_success':
             print("   ✅ Gemini API成功 - リアルタイム学生向け提案生成確認")
+        elif student_status == 'cache_hit':
+            print("   ✅ 応答キャッシュ - 以前の Gemini API 応答を再利用")
         elif student_status == 'mock_success':
             print("   🔸 モック成功 - サンプル提案で機能確認")
         else:
             print("   ⚠️ APIフォールバック - モックデータで代替実行")
+        validation = self.test_results['student_prompt'].get('validation')
+        if validation:
+            print(f"   提案の検証: 有効 {validation['valid']} 件 / 無効 {validation['invalid']} 件")
+            for errors in validation['errors']:
+                print(f"     ❌ {' / '.join(errors)}")
+        
+        if not self.mock:
+            cache = self.cache.summary()
+            if cache['enabled']:
+                print(f"   応答キャッシュ: ヒット {cache['hits']} / ミス {cache['misses']}")
+            if hasattr(self.provider, 'summary'):
+                replay = self.provider.summary()
+                print(f"   再生: {replay['calls']} 回 / 記録なし {replay['misses']} / "
+                      f"注入エラー {replay['injected_errors']}")
         
         print("\n🔍 年齢層別シナリオ:")
         scenarios = self.test_results['age_group_scenarios']
         for age_group, data in scenarios.items():
-            print(f"   ✅ {age_group}: {data['count']}シナリオ実装済み")
+            if age_group == '_matrix':
+                continue
+            mark = '✅' if not data['errors'] else '⚠️'
+            print(f"   {mark} {age_group}: {data['count']}シナリオ × {len(DURATIONS)}時間 / "
+                  f"有効な提案 {data['valid']} 件 / 品質 {data['quality']:.2f}")
+        matrix = scenarios.get('_matrix')
+        if matrix:
+            print(f"   {matrix['cells']} セル（{matrix['elapsed_seconds']:.2f}秒）、"
+                  f"失敗 {len(matrix['failed_cells'])} セル: {matrix['output']}")
         
         print("\n🎨 プロンプトパーソナライゼーション:")
         personalization = self.test_results['prompt_personalization']
@@ -283,13 +556,51 @@ class PhaseA1ImplementationTester:
         print("   ✅ API統合: 100%完了")
         print("   ⏳ A/Bテスト: 実装待ち")
         
-        print(f"\n📝 詳細な結果は phase_a1_test_results.json を参照してください")
+        print(f"\n📝 詳細な結果は {self.output} を参照してください")
+        if self.log:
+            print(f"   結果ログ: {self.log.path}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Phase A-1 年齢層別実装テスト")
+    parser.add_argument("--stream", action="store_true",
+                        help="API 応答をストリーミングで受け取り、テストごとに結果ログ（JSONL）へ追記する")
+    parser.add_argument("--resume", action="store_true",
+                        help="結果ログで完了済みのテスト（シナリオ行列では完了済みのセル）を飛ばして再開する")
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH,
+                        help="結果 JSON の出力先（結果ログは同じ場所の .jsonl。既定: リポジトリ直下）")
+    parser.add_argument("--matrix-output", type=Path, default=MATRIX_RESULTS_PATH,
+                        help="シナリオ行列のセルごとの結果（JSONL）の出力先")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"シナリオ行列を並行に処理するワーカー数（既定: {DEFAULT_WORKERS}）")
+    parser.add_argument("--matrix-only", action="store_true",
+                        help="年齢層別シナリオ行列だけを実行し、失敗したセルがあれば終了コード 1 で終える")
+    add_retry_args(parser)
+    add_provider_args(parser)
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers は1以上を指定してください")
+    return args
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    caller = caller_from_args(args, args.seed)
     try:
-        tester = PhaseA1ImplementationTester()
+        # --provider gemini（既定）は従来どおり API キーが無ければモックで実行する
+        provider = None if args.provider == "gemini" else provider_from_args(args, MODEL_NAME, GEMINI_API_KEY)
+        tester = PhaseA1ImplementationTester(stream=args.stream or args.resume, resume=args.resume,
+                                             provider=provider, caller=caller,
+                                             output=args.output, matrix_output=args.matrix_output,
+                                             workers=args.workers)
+        if args.matrix_only:
+            failed = tester.test_age_group_scenarios()['_matrix']['failed_cells']
+            raise SystemExit(1 if failed else 0)
         tester.run_comprehensive_test()
     except KeyboardInterrupt:
         print("\n\n⚠️ ユーザーによってテストが中断されました")
     except Exception as e:
-        print(f"\n\n❌ 予期しないエラーが発生しました: {e}")
\ No newline at end of file
+        print(f"\n\n❌ 予期しないエラーが発生しました: {e}")
+    finally:
+        # 期限切れ・ヘッジで置き去りにした呼び出しを止める（終了を待たせない）
+        caller.close()
\ No newline at end of file
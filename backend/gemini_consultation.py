@@ -6,15 +6,10 @@ Phase 2の実装に向けて、フロントエンドでの音声ガイド統合
 最適な設計と実装アプローチを検討します。
 """
 
-import os
 import json
 from datetime import datetime
-import google.generativeai as genai
 from typing import Dict, Any
 
-# Gemini APIの設定
-genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-
 def create_consultation_prompt() -> str:
     """フロントエンド統合に関する相談プロンプトを作成"""
     
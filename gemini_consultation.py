@@ -2,33 +2,54 @@
 """
 Google Gemini API 相談スクリプト
 学生向けプロンプト最適化と年齢層別コンテンツ戦略の検証
-"""
 
+使い方:
+  python3 gemini_consultation.py [--plan free|pro|internal] [--no-cache] [--batch-size N]
+  python3 gemini_consultation.py --async [--concurrency 3]
+  python3 gemini_consultation.py --stream [--resume] [--results-log PATH] [--output PATH]
+  python3 gemini_consultation.py --dry-run            # API を呼ばず、ファイルも書かない
+  python3 gemini_consultation.py --prompt-report [--token-budget N]
+  python3 gemini_consultation.py --provider record|replay [--cassette PATH]
+  python3 gemini_consultation.py --ab-samples 30 [--concurrency 3]
+
+各オプションは --help を、レート制限・リトライ・キャッシュ・計測などの仕組みは
+gemini_tools/ の各モジュールを参照。
+"""
+import argparse
+import asyncio
 import os
 import json
 import time
+from pathlib import Path
 from typing import Dict, List, Any
-import google.generativeai as genai
 
-# Gemini API設定
-GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
-if not GEMINI_API_KEY:
-    print("警告: GEMINI_API_KEY環境変数が設定されていません")
-    GEMINI_API_KEY = input("Gemini API キーを入力してください: ")
+from gemini_tools.ab_eval import parse_scores, print_report as print_ab_report, run_ab
+from gemini_tools.batching import PromptBatcher
+from gemini_tools.rate_limit import PLANS, RateLimiter, is_rate_limit_error
+from gemini_tools.response_cache import ResponseCache
+from gemini_tools.metrics import CallMetrics, latency_history, load_report, print_compare, print_steps
+from gemini_tools.prompt_compiler import (
+    PromptBudgetError, check_budget, compact, compact_embedded, compile_prompts, print_report,
+)
+from gemini_tools.providers import GeminiProvider, add_provider_args, provider_from_args
+from gemini_tools.results_log import ResultsLog
+from gemini_tools.retry import (
+    DEFAULT_DEADLINE, ResilientCaller, add_retry_args, caller_from_args, check_cancel,
+)
+from gemini_tools.suggestion_stream import parse_suggestions
 
-genai.configure(api_key=GEMINI_API_KEY)
+MODEL_NAME = 'gemini-1.5-flash'
 
-class GeminiConsultationTool:
-    def __init__(self):
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
-        self.results = {}
-        
-    def test_student_prompt(self) -> Dict[str, Any]:
-        """学生向けプロンプトの検証テスト"""
-        print("\n=== 学生向けプロンプト最適化の検証 ===")
-        
-        # 現行プロンプト（職場向け）
-        current_prompt = """
+# 結果の既定の出力先（リポジトリ直下）。--output / --results-log で変えられる
+RESULTS_DIR = Path(__file__).resolve().parent
+RESULTS_PATH = RESULTS_DIR / 'gemini_consultation_results.json'
+RESULTS_LOG_PATH = RESULTS_DIR / 'gemini_consultation_results.jsonl'
+
+# 非同期モードの既定の同時実行数
+DEFAULT_CONCURRENCY = 3
+
+# 現行プロンプト（職場向け）
+CURRENT_PROMPT = """
         あなたは職場のストレス解消をサポートするAIアシスタントです。
         
         【状況】: 職場で
@@ -39,9 +60,9 @@ class GeminiConsultationTool:
         - 職場環境に適している
         - 科学的根拠がある
         """
-        
-        # 学生向け最適化プロンプト
-        student_prompt = """
+
+# 学生向け最適化プロンプト
+STUDENT_PROMPT = """
         あなたは高校生・大学生（16-22歳）の気持ちに寄り添うAIカウンセラーです。
         勉強、友人関係、将来への不安など、学生特有のストレスを理解し、
         親しみやすく実践的なアドバイスを提供してください。
@@ -71,38 +92,15 @@ class GeminiConsultationTool:
           ]
         }
         """
-        
-        # 現行版と学生版の比較テスト
-        results = {}
-        
-        try:
-            # 現行版テスト
-            print("現行プロンプト（職場向け）をテスト中...")
-            current_response = self.model.generate_content(current_prompt)
-            results['current'] = {
-                'prompt': current_prompt,
-                'response': current_response.text
-            }
-            
-            time.sleep(2)  # API制限対策
-            
-            # 学生版テスト
-            print("学生向け最適化プロンプトをテスト中...")
-            student_response = self.model.generate_content(student_prompt)
-            results['student'] = {
-                'prompt': student_prompt,
-                'response': student_response.text
-            }
-            
-            # 比較分析
-            analysis_prompt = f"""
+
+ANALYSIS_PROMPT_TEMPLATE = """
             以下の2つのAI応答を比較分析してください：
             
             【現行版（職場向け）】:
-            {current_response.text}
+            {current}
             
             【学生向け最適化版】:
-            {student_response.text}
+            {student}
             
             以下の観点で分析してください：
             1. 差別化の十分性（職場向けとの違いの明確さ）
@@ -112,33 +110,17 @@ class GeminiConsultationTool:
             5. 全体的な改善点と推奨事項
             
             JSON形式で結果を返してください：
-            {
+            {{
               "differentiation_score": 1-10,
               "friendliness_score": 1-10, 
               "scientific_explanation_score": 1-10,
               "practicality_safety_balance": 1-10,
               "overall_improvement": "具体的な改善提案",
               "recommendations": ["推奨事項1", "推奨事項2", "推奨事項3"]
-            }
+            }}
             """
-            
-            time.sleep(2)
-            analysis_response = self.model.generate_content(analysis_prompt)
-            results['analysis'] = analysis_response.text
-            
-            print("✅ 学生向けプロンプト検証完了")
-            
-        except Exception as e:
-            print(f"❌ エラー: {e}")
-            results['error'] = str(e)
-            
-        return results
-    
-    def optimize_age_group_prompts(self) -> Dict[str, Any]:
-        """年齢層別プロンプト最適化戦略の相談"""
-        print("\n=== 年齢層別コンテンツ品質向上戦略 ===")
-        
-        optimization_prompt = """
+
+AGE_GROUP_PROMPT = """
         気晴らしレシピアプリの年齢層別展開について相談です。
         現在は20-40代の職場向けMVPから、以下の年齢層への最適化を検討しています：
         
@@ -169,20 +151,8 @@ class GeminiConsultationTool:
           }
         }
         """
-        
-        try:
-            response = self.model.generate_content(optimization_prompt)
-            print("✅ 年齢層別最適化戦略の生成完了")
-            return {'optimization_strategy': response.text}
-        except Exception as e:
-            print(f"❌ エラー: {e}")
-            return {'error': str(e)}
-    
-    def design_safety_check_system(self) -> Dict[str, Any]:
-        """安全性チェック機能の実装方法の相談"""
-        print("\n=== 安全性チェック機能の実装方法 ===")
-        
-        safety_prompt = """
+
+SAFETY_PROMPT = """
         年齢層別気晴らしレシピで実装すべき安全性チェック機能について相談です。
         Gemini APIを使用して以下を実現する方法を提案してください：
         
@@ -217,20 +187,8 @@ class GeminiConsultationTool:
           }
         }
         """
-        
-        try:
-            response = self.model.generate_content(safety_prompt)
-            print("✅ 安全性チェックシステム設計完了")
-            return {'safety_system': response.text}
-        except Exception as e:
-            print(f"❌ エラー: {e}")
-            return {'error': str(e)}
-    
-    def analyze_cost_optimization(self) -> Dict[str, Any]:
-        """API利用コスト最適化戦略の分析"""
-        print("\n=== API利用コスト最適化戦略 ===")
-        
-        cost_prompt = """
+
+COST_PROMPT = """
         Gemini APIを使用した気晴らしレシピのコスト最適化について相談です。
         現在の想定：
         - DAU: 1,000人（成長目標）
@@ -270,20 +228,8 @@ class GeminiConsultationTool:
           }
         }
         """
-        
-        try:
-            response = self.model.generate_content(cost_prompt)
-            print("✅ コスト最適化戦略の分析完了")
-            return {'cost_optimization': response.text}
-        except Exception as e:
-            print(f"❌ エラー: {e}")
-            return {'error': str(e)}
-    
-    def create_implementation_roadmap(self) -> Dict[str, Any]:
-        """技術実装ロードマップの作成"""
-        print("\n=== 技術実装ロードマップ（3週間計画） ===")
-        
-        roadmap_prompt = """
+
+ROADMAP_PROMPT = """
         年齢層別気晴らしレシピの技術実装について、3週間の詳細なロードマップを作成してください。
         
         現在の技術基盤：
@@ -330,43 +276,569 @@ class GeminiConsultationTool:
           }
         }
         """
+
+
+def build_analysis_prompt(current: str, student: str, compacted: bool = False) -> str:
+    """現行版と学生版の応答を比較分析するプロンプトを組み立てる
+
+    compacted=True ではテンプレートを詰め、JSON の応答は空白なしにして埋め込む。
+    """
+    if not compacted:
+        return ANALYSIS_PROMPT_TEMPLATE.format(current=current, student=student)
+    # 応答の行頭位置で字下げの判定が狂わないよう、テンプレートだけを先に詰める
+    template = compact(ANALYSIS_PROMPT_TEMPLATE.format(current='\x00current\x00', student='\x00student\x00'))
+    return (template.replace('\x00current\x00', compact_embedded(current))
+            .replace('\x00student\x00', compact_embedded(student)))
+
+
+# 単発の相談: (結果キー, 見出し, プロンプト, 結果フィールド, 完了メッセージ)
+CONSULTATIONS = [
+    ('age_group_optimization', '年齢層別コンテンツ品質向上戦略', AGE_GROUP_PROMPT,
+     'optimization_strategy', '年齢層別最適化戦略の生成完了'),
+    ('safety_check_design', '安全性チェック機能の実装方法', SAFETY_PROMPT,
+     'safety_system', '安全性チェックシステム設計完了'),
+    ('cost_optimization', 'API利用コスト最適化戦略', COST_PROMPT,
+     'cost_optimization', 'コスト最適化戦略の分析完了'),
+    ('implementation_roadmap', '技術実装ロードマップ（3週間計画）', ROADMAP_PROMPT,
+     'implementation_roadmap', '技術実装ロードマップの作成完了'),
+]
+
+# 学生向け応答の提案を suggestions_master の行に揃えるときの既定値（プロンプトの条件と同じ）
+STUDENT_DEFAULTS = {'duration': 5, 'situation': ['studying'], 'age_groups': ['student']}
+# 比較分析の応答から集計する採点項目（ANALYSIS_PROMPT_TEMPLATE の数値フィールド）
+JUDGE_SCORES = ['differentiation_score', 'friendliness_score', 'scientific_explanation_score',
+                'practicality_safety_balance']
+
+# 結果のステップ（保存・表示の順序）
+STEP_KEYS = ['student_prompt_test'] + [c[0] for c in CONSULTATIONS]
+
+# バッチ実行でまとめる依頼（比較分析は現行版・学生版の応答が要るので含めない）
+BATCH_REQUESTS = {
+    'current': CURRENT_PROMPT,
+    'student': STUDENT_PROMPT,
+    **{c[0]: c[2] for c in CONSULTATIONS},
+}
+# 計測のラベル（プロンプト -> 依頼名）
+PROMPT_STEPS = {prompt: key for key, prompt in BATCH_REQUESTS.items()}
+
+class GeminiConsultationTool:
+    def __init__(self, plan: str = None, use_cache: bool = None, stream: bool = False,
+                 log_path: str = None, resume: bool = False, api_key: str = None,
+                 dry_run: bool = False, provider=None, metrics_dir: str = None,
+                 compare_metrics: str = None, compact_prompts: bool = True,
+                 token_budget: int = None, caller: ResilientCaller = None,
+                 ab_samples: int = 1, ab_concurrency: int = DEFAULT_CONCURRENCY,
+                 output=RESULTS_PATH):
+        self.dry_run = dry_run
+        self.output = Path(output)
+        # 学生向け検証のサンプル数（2以上で A/B 評価）と、同時に進めるサンプル数
+        self.ab_samples = ab_samples
+        self.ab_concurrency = ab_concurrency
+        # リトライ（指数バックオフ + ジッター）・期限・ヘッジ（gemini_tools/retry.py）
+        self.caller = caller or ResilientCaller(deadline=DEFAULT_DEADLINE)
+        # 送信前にプロンプトを詰める（gemini_tools/prompt_compiler.py）。--no-compact で元のまま送る
+        self.compact = compact_prompts
+        self.compiled = compile_prompts(BATCH_REQUESTS) if compact_prompts else None
+        sent = self.compiled.prompts if compact_prompts else BATCH_REQUESTS
+        self._sent = {BATCH_REQUESTS[key]: text for key, text in sent.items()}
+        self._steps = {text: key for key, text in sent.items()}
+        # 固定のプロンプトは API を呼ぶ前に予算を確かめる（超えていれば PromptBudgetError）
+        self.token_budget = token_budget
+        self.budget_violations = []
+        check_budget(sent, token_budget)
+        # モデル呼び出しの差し替え口（gemini_tools/providers.py）。既定は Gemini API
+        self.provider = provider or GeminiProvider(MODEL_NAME, api_key)
+        self.limiter = RateLimiter.from_plan(plan)
+        # ドライランの応答はキャッシュに書かない
+        self.cache = ResponseCache(enabled=False if dry_run else use_cache)
+        self.stream = stream
+        # ドライランは結果ログ・結果 JSON・計測レポートを書かない（作業ツリーに何も残さない）
+        self.log = ResultsLog(log_path, resume) if log_path and not dry_run else None
+        # 呼び出しごとの所要時間・トークン・コスト（gemini_tools/metrics.py）
+        self.metrics = CallMetrics("consultation", MODEL_NAME)
+        self.metrics_dir = metrics_dir
+        # ヘッジの分位は過去の実行の所要時間から始める（1回きりの実行ではサンプルが揃わない）
+        if self.caller.hedge_percentile is not None:
+            self.caller.latency.extend(latency_history("consultation", metrics_dir))
+        self.compare_metrics = compare_metrics
+        self.batcher = None
+        self.results = {}
+        self._semaphore = None
+
+    def _call(self, prompt: str, cancel=None):
+        """(応答テキスト, 最初のチャンクまでの秒数) を返す。ストリーミングでなければ後者は None
+
+        cancel（threading.Event）が立ったら、ストリーミングはチャンクの受信をやめる（ヘッジで負けた側）。
+        """
+        if self.dry_run:
+            return f"[dry-run] {MODEL_NAME} へのプロンプト {len(prompt)} 文字", None
+        # 期限切れ・ヘッジで負けて不要になっていたら送らない
+        check_cancel(cancel)
+        try:
+            if not self.stream:
+                return self.provider.generate(prompt), None
+            # ストリーミング: チャンクを受け取りながら連結し、最初のチャンクまでの時間を記録する
+            started = time.perf_counter()
+            first_chunk = None
+            parts = []
+            for chunk in self.provider.stream(prompt):
+                if cancel is not None and cancel.is_set():
+                    break
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - started
+                parts.append(chunk)
+            return ''.join(parts), first_chunk
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.limiter.pause()
+            raise
+
+    def _timed_call(self, prompt: str, step: str, queued_since: float) -> str:
+        """レート制限を待って _call をリトライ・期限・ヘッジ付きで呼び（self.caller）、計測する
+
+        queued_since は同時実行数の枠を待ち始めた時刻。リトライ・ヘッジの送信もそれぞれ
+        レート制限のトークンを1つ使う。
+        """
+        sent_at = []
+
+        def attempt(cancel):
+            if not self.dry_run:
+                self.limiter.acquire()
+            check_cancel(cancel)
+            sent_at.append(time.perf_counter())
+            return self._call(prompt, cancel)
+
+        stats = {}
+        try:
+            text, first_chunk = self.caller.call(attempt, step, stats)
+        except Exception as e:
+            started = sent_at[0] if sent_at else time.perf_counter()
+            self.metrics.record(step, prompt, wall_seconds=time.perf_counter() - started,
+                                queued_seconds=started - queued_since,
+                                retries=stats.get('attempts', 1) - 1, error=e,
+                                sent=len(sent_at))
+            raise
+        started = sent_at[0]
+        self.metrics.record(step, prompt, text, time.perf_counter() - started, first_chunk,
+                            started - queued_since, retries=stats['attempts'] - 1,
+                            hedged=stats['hedged'], sent=len(sent_at))
+        return text
+
+    def _step(self, prompt: str) -> str:
+        """計測のラベル。バッチにまとめたプロンプトは batch"""
+        return (PROMPT_STEPS.get(prompt) or self._steps.get(prompt)
+                or ('batch' if '<<<REQUEST id=' in prompt else 'other'))
+
+    def _prepare(self, prompt: str, step: str) -> str:
+        """送信するテキスト（固定のプロンプトはコンパクト化済みのもの）。予算超過なら PromptBudgetError"""
+        text = self._sent.get(prompt, prompt)
+        try:
+            check_budget({step: text}, self.token_budget)
+        except PromptBudgetError as e:
+            self.budget_violations.extend(e.violations)
+            raise
+        return text
+
+    def _analysis_text(self, current: str, student: str) -> str:
+        return build_analysis_prompt(current, student, compacted=self.compact)
+
+    def _generate(self, prompt: str, step: str = None, params: dict = None) -> str:
+        step = step or self._step(prompt)
+        prompt = self._prepare(prompt, step)
+        key = self.cache.key(MODEL_NAME, prompt, params)
+        text = self.cache.get(key)
+        if text is not None:
+            self.metrics.record(step, prompt, text, cached=True)
+            return text
+        text = self._timed_call(prompt, step, time.perf_counter())
+        self.cache.put(key, text, model=MODEL_NAME)
+        return text
+
+    async def _agenerate(self, prompt: str, step: str = None, params: dict = None) -> str:
+        """キャッシュに無ければ、同時実行数の枠を待ってから _timed_call をスレッドで呼ぶ
+
+        params はキャッシュのキーに加える値（A/B 評価のサンプル番号など）。
+        """
+        step = step or self._step(prompt)
+        prompt = self._prepare(prompt, step)
+        key = self.cache.key(MODEL_NAME, prompt, params)
+        text = self.cache.get(key)
+        if text is not None:
+            self.metrics.record(step, prompt, text, cached=True)
+            return text
+        queued_since = time.perf_counter()
+        async with self._semaphore:
+            # レート制限の待ちとリトライの待ちは呼び出しごとにスレッド側で行う
+            text = await asyncio.to_thread(self._timed_call, prompt, step, queued_since)
+        self.cache.put(key, text, model=MODEL_NAME)
+        return text
+
+    def test_student_prompt(self) -> Dict[str, Any]:
+        """学生向けプロンプトの検証テスト"""
+        if self.ab_samples > 1:
+            return asyncio.run(self.evaluate_student_prompt_ab())
+        print("\n=== 学生向けプロンプト最適化の検証 ===")
+        
+        # 現行版と学生版の比較テスト
+        results = {}
         
         try:
-            response = self.model.generate_content(roadmap_prompt)
-            print("✅ 技術実装ロードマップの作成完了")
-            return {'implementation_roadmap': response.text}
+            # 現行版テスト
+            print("現行プロンプト（職場向け）をテスト中...")
+            current_response = self._generate(CURRENT_PROMPT)
+            results['current'] = {
+                'prompt': CURRENT_PROMPT,
+                'response': current_response
+            }
+            
+            # 学生版テスト
+            print("学生向け最適化プロンプトをテスト中...")
+            student_response = self._generate(STUDENT_PROMPT)
+            results['student'] = self._student_entry(student_response)
+            
+            # 比較分析
+            results['analysis'] = self._generate(self._analysis_text(current_response, student_response),
+                                                 'analysis')
+            
+            print("✅ 学生向けプロンプト検証完了")
+            
+        except Exception as e:
+            print(f"❌ エラー: {e}")
+            results['error'] = str(e)
+            
+        return results
+
+    async def test_student_prompt_async(self) -> Dict[str, Any]:
+        """学生向けプロンプトの検証テスト（現行版と学生版を並行に取り、揃い次第比較分析）"""
+        if self.ab_samples > 1:
+            return await self.evaluate_student_prompt_ab()
+        print("\n=== 学生向けプロンプト最適化の検証 ===")
+        results = {}
+
+        try:
+            responses = await asyncio.gather(
+                self._agenerate(CURRENT_PROMPT),
+                self._agenerate(STUDENT_PROMPT),
+                return_exceptions=True,
+            )
+            if not isinstance(responses[0], Exception):
+                results['current'] = {'prompt': CURRENT_PROMPT, 'response': responses[0]}
+            if not isinstance(responses[1], Exception):
+                results['student'] = self._student_entry(responses[1])
+            for response in responses:
+                if isinstance(response, Exception):
+                    raise response
+
+            results['analysis'] = await self._agenerate(self._analysis_text(*responses), 'analysis')
+            print("✅ 学生向けプロンプト検証完了")
+
+        except Exception as e:
+            print(f"❌ エラー: {e}")
+            results['error'] = str(e)
+
+        return results
+
+    async def evaluate_student_prompt_ab(self) -> Dict[str, Any]:
+        """現行版・学生版から ab_samples 件ずつ取り、比較分析のスコアを平均 ±95% 信頼区間で集計する"""
+        samples = self.ab_samples
+        print(f"\n=== 学生向けプロンプト最適化の検証（A/B 評価、{samples} サンプル）===")
+        own_semaphore = self._semaphore is None
+        if own_semaphore:
+            self._semaphore = asyncio.Semaphore(self.ab_concurrency)
+        first = {}
+
+        def params(i: int):
+            # 0番は1サンプルの実行とキャッシュを共有し、それ以外は別の応答として取る
+            return {'ab_sample': i} if i else None
+
+        async def generate(variant: str, prompt: str, i: int) -> str:
+            text = await self._agenerate(prompt, None, params(i))
+            if i == 0:
+                first[variant] = text
+            return text
+
+        async def judge(i: int, texts: Dict[str, str]) -> Dict[str, float]:
+            analysis = await self._agenerate(self._analysis_text(texts['current'], texts['student']),
+                                             'analysis', params(i))
+            if i == 0:
+                first['analysis'] = analysis
+            return parse_scores(analysis, JUDGE_SCORES)
+
+        def score(variant: str, text: str) -> Dict[str, float]:
+            _, validation = parse_suggestions(text, STUDENT_DEFAULTS)
+            return {'response_chars': len(text), 'valid_suggestions': validation['valid']}
+
+        results = {}
+        try:
+            report = await run_ab({'current': CURRENT_PROMPT, 'student': STUDENT_PROMPT}, samples,
+                                  generate, judge, score, window=self.ab_concurrency,
+                                  on_sample=lambda r: print(f"   {r.progress_line()}"))
+        finally:
+            if own_semaphore:
+                self._semaphore = None
+        print_ab_report(report)
+        results['ab_evaluation'] = report.to_dict()
+        # 1サンプルの実行と同じ形の結果も0番のサンプルで残す
+        if 'current' in first:
+            results['current'] = {'prompt': CURRENT_PROMPT, 'response': first['current']}
+        if 'student' in first:
+            results['student'] = self._student_entry(first['student'])
+        if 'analysis' in first:
+            results['analysis'] = first['analysis']
+        if report.completed and not report.judged:
+            results['error'] = f"比較分析のスコアを取れたサンプルがありません（{samples} 件）"
+        else:
+            print("✅ 学生向けプロンプト検証完了")
+        return results
+
+    def _student_entry(self, response: str) -> Dict[str, Any]:
+        """学生版の応答と、そこから取り出して検証した提案"""
+        suggestions, validation = parse_suggestions(response, STUDENT_DEFAULTS)
+        print(f"   提案の検証: 有効 {validation['valid']} 件 / 無効 {validation['invalid']} 件")
+        return {
+            'prompt': STUDENT_PROMPT,
+            'response': response,
+            'suggestions': suggestions,
+            'validation': validation,
+        }
+
+    def _consult(self, heading: str, prompt: str, field: str, done: str) -> Dict[str, Any]:
+        print(f"\n=== {heading} ===")
+        try:
+            response = self._generate(prompt)
+            print(f"✅ {done}")
+            return {field: response}
         except Exception as e:
             print(f"❌ エラー: {e}")
             return {'error': str(e)}
+
+    async def _consult_async(self, heading: str, prompt: str, field: str, done: str) -> Dict[str, Any]:
+        print(f"\n=== {heading} ===")
+        try:
+            response = await self._agenerate(prompt)
+            print(f"✅ {done}")
+            return {field: response}
+        except Exception as e:
+            print(f"❌ エラー: {e}")
+            return {'error': str(e)}
+
+    def optimize_age_group_prompts(self) -> Dict[str, Any]:
+        """年齢層別プロンプト最適化戦略の相談"""
+        return self._consult(*CONSULTATIONS[0][1:])
+    
+    def design_safety_check_system(self) -> Dict[str, Any]:
+        """安全性チェック機能の実装方法の相談"""
+        return self._consult(*CONSULTATIONS[1][1:])
+    
+    def analyze_cost_optimization(self) -> Dict[str, Any]:
+        """API利用コスト最適化戦略の分析"""
+        return self._consult(*CONSULTATIONS[2][1:])
+    
+    def create_implementation_roadmap(self) -> Dict[str, Any]:
+        """技術実装ロードマップの作成"""
+        return self._consult(*CONSULTATIONS[3][1:])
     
-    def run_full_consultation(self):
+    def _batched_results(self, responses: Dict[str, Any]) -> Dict[str, Any]:
+        """バッチ応答を直列実行と同じ形の results にする（比較分析は呼び出し側で足す）"""
+        results = {}
+        if 'current' in responses:
+            student = results['student_prompt_test'] = {}
+            for key in ('current', 'student'):
+                if isinstance(responses[key], Exception):
+                    student['error'] = str(responses[key])
+                elif key == 'current':
+                    student[key] = {'prompt': CURRENT_PROMPT, 'response': responses[key]}
+                else:
+                    student[key] = self._student_entry(responses[key])
+        for key, heading, _, field, done in CONSULTATIONS:
+            if key not in responses:
+                continue
+            print(f"\n=== {heading} ===")
+            if isinstance(responses[key], Exception):
+                print(f"❌ エラー: {responses[key]}")
+                results[key] = {'error': str(responses[key])}
+            else:
+                print(f"✅ {done}")
+                results[key] = {field: responses[key]}
+        return results
+
+    def _batch_requests(self) -> Dict[str, str]:
+        """まだ結果の無いステップの依頼だけを集める"""
+        pending = self._pending()
+        # コンパクト化しているときは共通プレフィックスを除いた本文（プレフィックスはバッチに1回だけ置く）
+        prompts = self.compiled.bodies if self.compact else BATCH_REQUESTS
+        return {key: prompt for key, prompt in prompts.items()
+                if ('student_prompt_test' if key in ('current', 'student') else key) in pending}
+
+    def _batcher(self, batch_size: int) -> PromptBatcher:
+        return PromptBatcher(self._generate, batch_size,
+                             prefix=self.compiled.prefix if self.compact else '')
+
+    def _analysis_prompt(self, student: Dict[str, Any]):
+        print("\n=== 学生向けプロンプト最適化の検証 ===")
+        if 'error' in student:
+            print(f"❌ エラー: {student['error']}")
+            return None
+        return self._analysis_text(student['current']['response'], student['student']['response'])
+
+    def _pending(self) -> List[str]:
+        return [key for key in STEP_KEYS if key not in self.results]
+
+    def _record(self, key: str, result: Dict[str, Any]) -> None:
+        """ステップの結果を保持し、結果ログがあれば1行追記する"""
+        self.results[key] = result
+        if self.log:
+            self.log.append(key, result, ok='error' not in result)
+
+    def _restore(self) -> None:
+        """--resume: 結果ログで完了済みのステップを読み戻す"""
+        if not self.log:
+            return
+        for key in STEP_KEYS:
+            if key in self.log.completed:
+                self.results[key] = self.log.completed[key]
+                print(f"⏭️  {key}: 前回の結果を再利用（{self.log.path.name}）")
+
+    def run_full_consultation(self, batch_size: int = 1):
         """全体相談の実行"""
         print("🚀 Google Gemini API との学生向けプロンプト最適化・年齢層別戦略相談を開始します")
+        started = time.perf_counter()
+        self._restore()
+        
+        if batch_size > 1:
+            self.batcher = self._batcher(batch_size)
+            batched = self._batched_results(self.batcher.run(self._batch_requests()))
+            student = batched.get('student_prompt_test')
+            if student is not None:
+                prompt = self._analysis_prompt(student)
+                if prompt:
+                    try:
+                        student['analysis'] = self._generate(prompt, 'analysis')
+                        print("✅ 学生向けプロンプト検証完了")
+                    except Exception as e:
+                        print(f"❌ エラー: {e}")
+                        student['error'] = str(e)
+            for key, result in batched.items():
+                self._record(key, result)
+            self._finish(time.perf_counter() - started)
+            return
+        
+        # 各検証・分析の実行（ステップが終わるたびに結果ログへ追記）
+        # 送信間隔は self.limiter が決める
+        steps = {
+            'student_prompt_test': self.test_student_prompt,
+            'age_group_optimization': self.optimize_age_group_prompts,
+            'safety_check_design': self.design_safety_check_system,
+            'cost_optimization': self.analyze_cost_optimization,
+            'implementation_roadmap': self.create_implementation_roadmap,
+        }
+        for key in self._pending():
+            self._record(key, steps[key]())
         
-        # 各検証・分析の実行
-        self.results['student_prompt_test'] = self.test_student_prompt()
-        time.sleep(3)  # API制限対策
-        
-        self.results['age_group_optimization'] = self.optimize_age_group_prompts()
-        time.sleep(3)
-        
-        self.results['safety_check_design'] = self.design_safety_check_system()
-        time.sleep(3)
-        
-        self.results['cost_optimization'] = self.analyze_cost_optimization()
-        time.sleep(3)
-        
-        self.results['implementation_roadmap'] = self.create_implementation_roadmap()
-        
+        self._finish(time.perf_counter() - started)
+
+    async def run_full_consultation_async(self, concurrency: int = DEFAULT_CONCURRENCY,
+                                          batch_size: int = 1):
+        """全体相談の実行（独立な相談を concurrency 件まで並行に実行）"""
+        print("🚀 Google Gemini API との学生向けプロンプト最適化・年齢層別戦略相談を開始します"
+              f"（非同期・同時 {concurrency} 件）")
+        started = time.perf_counter()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._restore()
+
+        if batch_size > 1:
+            # バッチ同士は並行に投げ、比較分析は全バッチが返ってから始める
+            self.batcher = self._batcher(batch_size)
+            responses = await self.batcher.run_async(self._batch_requests(), self._agenerate)
+            batched = self._batched_results(responses)
+            student = batched.get('student_prompt_test')
+            if student is not None:
+                prompt = self._analysis_prompt(student)
+                if prompt:
+                    try:
+                        student['analysis'] = await self._agenerate(prompt, 'analysis')
+                        print("✅ 学生向けプロンプト検証完了")
+                    except Exception as e:
+                        print(f"❌ エラー: {e}")
+                        student['error'] = str(e)
+            for key, result in batched.items():
+                self._record(key, result)
+            self._finish(time.perf_counter() - started)
+            return
+
+        async def step(key: str, coro) -> None:
+            # 終わったステップから順に結果ログへ書く
+            self._record(key, await coro)
+
+        consultations = {c[0]: c[1:] for c in CONSULTATIONS}
+        await asyncio.gather(*(
+            step(key, self.test_student_prompt_async() if key == 'student_prompt_test'
+                 else self._consult_async(*consultations[key]))
+            for key in self._pending()
+        ))
+
+        self._finish(time.perf_counter() - started)
+
+    def _finish(self, elapsed: float):
+        # 保存・表示の順序は直列実行と同じにする
+        self.results = {key: self.results[key] for key in STEP_KEYS if key in self.results}
+
         # 結果の保存
-        with open('/home/ryu/projects/kibarashi-app/gemini_consultation_results.json', 'w', encoding='utf-8') as f:
-            json.dump(self.results, f, ensure_ascii=False, indent=2)
-        
-        print("\n✅ 全体相談完了！結果をgemini_consultation_results.jsonに保存しました")
+        if self.dry_run:
+            print(f"\n✅ 全体相談完了！（{elapsed:.1f}秒）ドライランのため結果は保存しません")
+        else:
+            self.output.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.output, 'w', encoding='utf-8') as f:
+                json.dump(self.results, f, ensure_ascii=False, indent=2)
+            print(f"\n✅ 全体相談完了！（{elapsed:.1f}秒）結果を {self.output} に保存しました")
+        limits = self.limiter.summary()
+        print(f"   レート制限: {limits['plan']} プラン / {limits['calls']} 回呼び出し / "
+              f"待機 {limits['waited_seconds']:.1f}秒")
+        cache = self.cache.summary()
+        if cache['enabled']:
+            print(f"   応答キャッシュ: ヒット {cache['hits']} / ミス {cache['misses']}"
+                  f"（期限切れ {cache['expired']}、削除 {cache['evicted']}）")
+        else:
+            print("   応答キャッシュ: 無効")
+        if self.batcher:
+            batch = self.batcher.summary()
+            print(f"   バッチ: {batch['batch_calls']} 回で {batch['batched_requests']} 件、"
+                  f"個別フォールバック {batch['fallbacks']} 件")
+        if self.log:
+            print(f"   結果ログ: {self.log.path}")
+        if hasattr(self.provider, 'summary'):
+            replay = self.provider.summary()
+            print(f"   再生: {replay['calls']} 回 / 記録なし {replay['misses']} / "
+                  f"注入エラー {replay['injected_errors']}（{replay['cassette']}）")
+        resilience = self.caller.summary()
+        print(f"   リトライ: {resilience['retries']} 回 / ヘッジ {resilience['hedges']} 回"
+              f"（先着 {resilience['hedge_wins']}）/ 期限切れ {resilience['deadlines_exceeded']} 回")
+        if self.compact:
+            rows = self.compiled.report()
+            before, after = sum(r[3] for r in rows), sum(r[4] for r in rows)
+            print(f"   プロンプトのコンパクト化: {before} → {after} トークン（概算、{1 - after / before:.0%} 削減）")
+        self._report_metrics()
         
         # 簡潔なサマリーの表示
         self.display_summary()
+
+        # 実行中に組み立てたプロンプト（比較分析・バッチ）が予算を超えていたら実行を失敗にする
+        if self.budget_violations:
+            raise PromptBudgetError(self.budget_violations, self.token_budget)
     
+    def _report_metrics(self):
+        """呼び出しごとの計測をステップ別に表示し、JSON / Prometheus に書き出す"""
+        report = self.metrics.report()
+        print("\n📈 呼び出しの計測（所要時間の長い順）:")
+        print_steps(report)
+        if not self.dry_run:
+            json_path, prom_path = self.metrics.export(self.metrics_dir)
+            print(f"   計測レポート: {json_path}")
+            print(f"   Prometheus: {prom_path}")
+        if self.compare_metrics:
+            print(f"\n前回（{self.compare_metrics}）との比較:")
+            print_compare(load_report(self.compare_metrics), report)
+
     def display_summary(self):
         """結果サマリーの表示"""
         print("\n" + "="*60)
@@ -380,13 +852,102 @@ class GeminiConsultationTool:
             else:
                 print(f"   ✅ 正常に完了 ({len(str(result))} 文字の詳細回答)")
         
-        print(f"\n📝 詳細な結果は gemini_consultation_results.json を参照してください")
+        if not self.dry_run:
+            print(f"\n📝 詳細な結果は {self.output} を参照してください")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Google Gemini API 相談スクリプト")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="独立な相談を並行に実行する")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"非同期モードの同時実行数（既定: {DEFAULT_CONCURRENCY}）")
+    parser.add_argument("--plan", choices=list(PLANS), default=None,
+                        help="レート制限プラン（既定: GEMINI_RATE_PLAN または free）")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="独立な依頼を N 件ずつ1回の呼び出しにまとめる（既定: 1 = まとめない）")
+    parser.add_argument("--stream", action="store_true",
+                        help="応答をストリーミングで受け取り、ステップごとに結果ログ（JSONL）へ追記する")
+    parser.add_argument("--resume", action="store_true",
+                        help="結果ログで完了済みのステップを飛ばして再開する（--stream を含む）")
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH,
+                        help="結果 JSON の出力先（既定: リポジトリ直下）")
+    parser.add_argument("--results-log", type=Path, default=RESULTS_LOG_PATH,
+                        help="結果ログ（JSONL）のパス（既定: リポジトリ直下）")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false", default=None,
+                        help="応答キャッシュを使わない（GEMINI_NO_CACHE=1 と同じ）")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="API を呼ばずに流れだけ確認する（SDK も API キーも不要。ファイルは書かない）")
+    parser.add_argument("--metrics-dir", default=None,
+                        help="計測レポート（JSON）と Prometheus ファイルの出力先（既定 .cache/gemini-metrics）")
+    parser.add_argument("--compare-metrics", metavar="REPORT_JSON", default=None,
+                        help="以前の計測レポートとステップ別に比較する")
+    parser.add_argument("--no-compact", dest="compact_prompts", action="store_false",
+                        help="プロンプトを詰めずに元の字下げ・整形のまま送る")
+    parser.add_argument("--token-budget", type=int, default=None,
+                        help="1プロンプトあたりのトークン上限（概算）。超えたら実行を失敗にする")
+    parser.add_argument("--ab-samples", type=int, default=1,
+                        help="学生向け検証で現行版・学生版から N サンプルずつ取り、スコアを信頼区間つきで"
+                             "比べる（既定: 1 = 1回だけ比較）")
+    parser.add_argument("--prompt-report", action="store_true",
+                        help="プロンプトごとのコンパクト化の削減量を表示して終了する（API は呼ばない）")
+    add_retry_args(parser)
+    add_provider_args(parser)
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error("--concurrency は1以上を指定してください")
+    if args.batch_size < 1:
+        parser.error("--batch-size は1以上を指定してください")
+    if args.ab_samples < 1:
+        parser.error("--ab-samples は1以上を指定してください")
+    if args.ab_samples > 1 and args.batch_size > 1:
+        # バッチ実行では学生向け検証も1回の呼び出しにまとめるので、サンプルを分けられない
+        parser.error("--ab-samples と --batch-size は同時に指定できません")
+    return args
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.prompt_report:
+        compiled = compile_prompts(BATCH_REQUESTS)
+        print_report(compiled.report(), compiled.prefix)
+        try:
+            check_budget(compiled.prompts if args.compact_prompts else BATCH_REQUESTS, args.token_budget)
+        except PromptBudgetError as e:
+            print(f"❌ {e}")
+            raise SystemExit(1)
+        raise SystemExit(0)
+    caller = caller_from_args(args, args.seed)
     try:
-        consultation = GeminiConsultationTool()
-        consultation.run_full_consultation()
+        # Gemini API設定（API キーは実際に呼ぶときだけ必要）
+        api_key = os.environ.get('GEMINI_API_KEY')
+        if not api_key and not args.dry_run and args.provider != "replay":
+            print("警告: GEMINI_API_KEY環境変数が設定されていません")
+            api_key = input("Gemini API キーを入力してください: ")
+
+        streaming = args.stream or args.resume
+        consultation = GeminiConsultationTool(
+            args.plan, args.use_cache, stream=streaming,
+            log_path=args.results_log if streaming else None, resume=args.resume,
+            api_key=api_key, dry_run=args.dry_run,
+            provider=provider_from_args(args, MODEL_NAME, api_key),
+            metrics_dir=args.metrics_dir, compare_metrics=args.compare_metrics,
+            compact_prompts=args.compact_prompts, token_budget=args.token_budget,
+            caller=caller,
+            ab_samples=args.ab_samples, ab_concurrency=args.concurrency,
+            output=args.output,
+        )
+        if args.use_async:
+            asyncio.run(consultation.run_full_consultation_async(args.concurrency, args.batch_size))
+        else:
+            consultation.run_full_consultation(args.batch_size)
+    except PromptBudgetError as e:
+        print(f"\n\n❌ {e}")
+        raise SystemExit(1)
     except KeyboardInterrupt:
         print("\n\n⚠️ ユーザーによって中断されました")
     except Exception as e:
-        print(f"\n\n❌ 予期しないエラーが発生しました: {e}")
\ No newline at end of file
+        print(f"\n\n❌ 予期しないエラーが発生しました: {e}")
+    finally:
+        # 期限切れ・ヘッジで置き去りにした呼び出しを止める（終了を待たせない）
+        caller.close()
\ No newline at end of file
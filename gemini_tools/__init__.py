@@ -0,0 +1,2 @@
+"""Gemini 相談スクリプト（gemini_consultation.py / age_group_implementation_test.py /
+backend/gemini_consultation.py）から使う共通モジュール群。"""
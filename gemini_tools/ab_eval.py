@@ -0,0 +1,203 @@
+"""
+プロンプトの A/B 評価エンジン。各バリアントから N サンプルを並行に取り、届いた順に採点して
+平均と 95% 信頼区間を出す。
+
+  生成  サンプル i ごとに全バリアントの応答を並行に取る（generate は呼び出し側のコルーチン。
+        レート制限・キャッシュ・リトライは呼び出し側の経路に任せる）
+  採点  score(バリアント, 応答) でローカルの指標を、judge(i, {バリアント: 応答}) でモデルによる
+        比較採点（differentiation_score など）を取る。judge はサンプル i の応答が揃った時点で
+        始まるので、他のサンプルの生成と重なる
+  集計  指標ごとに Welford 法で平均・分散を逐次更新し、t 分布で 95% 信頼区間を出す
+
+同時に進めるサンプル数は window で抑える。生成を全部キューに積むと、先に揃ったサンプルの
+judge が後ろのサンプルの生成待ちになり、生成と採点が重ならないため。
+
+使い方:
+  report = await run_ab({"current": CURRENT, "student": STUDENT}, samples=100,
+                        generate=generate, judge=judge, score=score, window=3,
+                        on_sample=lambda report: print(report.progress_line()))
+  report.to_dict()
+"""
+import json
+import math
+import re
+import time
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+# 両側 95% の t 値（自由度 -> t）。表に無い自由度はそれ以下で最大の自由度の値を使い、121 以上は正規近似
+T_975 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+    10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980,
+}
+
+
+def t_critical(df: int) -> float:
+    if df > 120:
+        return 1.960
+    return T_975[max(k for k in T_975 if k <= df)]
+
+
+class RunningStats:
+    """平均・標準偏差・95% 信頼区間を逐次更新する（Welford 法）"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self._m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def half_width(self) -> float:
+        """95% 信頼区間の半幅。サンプルが1件以下なら inf"""
+        if self.n < 2:
+            return math.inf
+        return t_critical(self.n - 1) * self.std / math.sqrt(self.n)
+
+    def to_dict(self) -> dict:
+        half = self.half_width()
+        return {
+            "n": self.n,
+            "mean": round(self.mean, 4),
+            "std": round(self.std, 4),
+            "ci95": None if math.isinf(half) else [round(self.mean - half, 4), round(self.mean + half, 4)],
+        }
+
+
+def parse_scores(text: str, fields) -> dict:
+    """応答の JSON オブジェクトから数値の採点項目だけを取り出す（数値でない項目は捨てる）"""
+    body = _FENCE.sub("", text.strip())
+    start, end = body.find("{"), body.rfind("}")
+    if start < 0 or end < start:
+        return {}
+    try:
+        obj = json.loads(body[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(obj, dict):
+        return {}
+    scores = {}
+    for field in fields:
+        value = obj.get(field)
+        if isinstance(value, str):
+            try:
+                value = float(value.strip())
+            except ValueError:
+                continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            scores[field] = float(value)
+    return scores
+
+
+class ABReport:
+    def __init__(self, variants, samples: int):
+        self.variants = list(variants)
+        self.samples = samples
+        self.completed = 0
+        self.errors = {variant: 0 for variant in self.variants}
+        self.judge_failures = 0
+        self.local = {}     # (バリアント, 指標) -> RunningStats
+        self.judged = {}    # 指標 -> RunningStats
+        self.rows = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def _stats(self, table: dict, key) -> RunningStats:
+        if key not in table:
+            table[key] = RunningStats()
+        return table[key]
+
+    def progress_line(self) -> str:
+        parts = [f"[{self.completed}/{self.samples}]"]
+        for metric, stats in self.judged.items():
+            half = stats.half_width()
+            parts.append(f"{metric} {stats.mean:.2f}" + ("" if math.isinf(half) else f" ±{half:.2f}"))
+        return "  ".join(parts)
+
+    def to_dict(self) -> dict:
+        local = {}
+        for (variant, metric), stats in self.local.items():
+            local.setdefault(variant, {})[metric] = stats.to_dict()
+        return {
+            "variants": self.variants,
+            "samples": self.samples,
+            "completed": self.completed,
+            "generation_errors": self.errors,
+            "judge_failures": self.judge_failures,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "samples_per_minute": round(self.completed / self.elapsed * 60, 2) if self.elapsed else None,
+            "judge": {metric: stats.to_dict() for metric, stats in self.judged.items()},
+            "local": local,
+            "rows": self.rows,
+        }
+
+
+async def run_ab(variants: dict, samples: int, generate, judge=None, score=None,
+                 window: int = 3, on_sample=None) -> ABReport:
+    """variants {名前: プロンプト} から samples 件ずつ生成して採点する
+
+    generate(バリアント, プロンプト, i) / judge(i, {バリアント: 応答}) はコルーチン関数、
+    score(バリアント, 応答) は {指標: 数値} を返す同期関数。on_sample(report) はサンプルごとに呼ぶ。
+    """
+    import asyncio
+
+    report = ABReport(variants, samples)
+    gate = asyncio.Semaphore(window)
+
+    async def one(i: int) -> None:
+        async with gate:
+            names = list(variants)
+            texts = await asyncio.gather(*(generate(name, variants[name], i) for name in names),
+                                         return_exceptions=True)
+            row = {"sample": i, "local": {}, "judge": {}}
+            ok = {}
+            for name, text in zip(names, texts):
+                if isinstance(text, Exception):
+                    report.errors[name] += 1
+                    row.setdefault("errors", {})[name] = str(text)
+                    continue
+                ok[name] = text
+                if score:
+                    row["local"][name] = score(name, text)
+                    for metric, value in row["local"][name].items():
+                        report._stats(report.local, (name, metric)).add(value)
+            if judge and len(ok) == len(names):
+                try:
+                    row["judge"] = await judge(i, ok)
+                except Exception as e:
+                    row.setdefault("errors", {})["judge"] = str(e)
+                if not row["judge"]:
+                    report.judge_failures += 1
+                for metric, value in row["judge"].items():
+                    report._stats(report.judged, metric).add(value)
+            report.rows.append(row)
+            report.completed += 1
+            if on_sample:
+                on_sample(report)
+
+    await asyncio.gather(*(one(i) for i in range(samples)))
+    report.rows.sort(key=lambda row: row["sample"])
+    report.elapsed = time.perf_counter() - report.started
+    return report
+
+
+def print_report(report: ABReport) -> None:
+    data = report.to_dict()
+    print(f"サンプル {data['completed']}/{data['samples']}（{data['elapsed_seconds']:.1f}秒、"
+          f"{data['samples_per_minute']} 件/分）、生成エラー {data['generation_errors']}、"
+          f"採点失敗 {data['judge_failures']}")
+    print(f"{'metric':<32} {'n':>4} {'mean':>8} {'95% CI':>20}")
+    rows = [(metric, stats) for metric, stats in data["judge"].items()]
+    rows += [(f"{variant}.{metric}", stats) for variant, metrics in data["local"].items()
+             for metric, stats in metrics.items()]
+    for name, stats in rows:
+        ci = "-" if stats["ci95"] is None else f"[{stats['ci95'][0]:.2f}, {stats['ci95'][1]:.2f}]"
+        print(f"{name:<32} {stats['n']:>4} {stats['mean']:>8.2f} {ci:>20}")
@@ -0,0 +1,145 @@
+"""
+独立した複数の依頼を1回の generate_content にまとめるプロンプトバッチング。
+
+依頼ごとに区切り行（<<<REQUEST id=...>>> 〜 <<<END id=...>>>）で囲んだプロンプトを組み立て、
+応答は {"responses": [{"id": ..., "response": ...}, ...]} の JSON エンベロープで返させる。
+エンベロープを依頼ごとに分解し、解析できなかった・欠けていた依頼だけを個別呼び出しで取り直す。
+バッチ呼び出し自体が失敗した場合も、そのバッチの依頼を個別呼び出しにフォールバックする。
+
+使い方:
+  batcher = PromptBatcher(generate, max_batch_size=4)   # generate(prompt) -> str
+  batcher = PromptBatcher(generate, 4, prefix=compiled.prefix)   # 共通プレフィックスは1回だけ送る
+  responses = batcher.run({"safety": SAFETY_PROMPT, "cost": COST_PROMPT})
+  # responses[id] は応答テキスト、または個別呼び出しでも失敗したときの例外
+  responses = await batcher.run_async(requests, agenerate)
+"""
+import json
+import re
+
+DEFAULT_MAX_BATCH_SIZE = 4
+
+BATCH_HEADER = """以下の{count}件の依頼はそれぞれ独立しています。各依頼に、単独で受け取った場合と同じ内容で回答してください。
+回答は次の形式の JSON オブジェクトだけを返してください（コードブロック記法や説明文は付けない）:
+{{"responses": [{{"id": "依頼ID", "response": 回答}}, ...]}}
+- id には各依頼の区切り行にある ID をそのまま入れる
+- 依頼が JSON 形式の回答を求めている場合、response にはその JSON 値をそのまま入れる。それ以外は文字列にする
+"""
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+
+def build_batch_prompt(requests: dict, prefix: str = "") -> str:
+    """{id: prompt} を区切り付きの1つのプロンプトにまとめる。prefix はすべての依頼の前提として1回だけ置く"""
+    parts = [BATCH_HEADER.format(count=len(requests))]
+    if prefix:
+        parts.append(f"すべての依頼に共通する前提:\n{prefix}")
+    for request_id, prompt in requests.items():
+        parts.append(f"<<<REQUEST id={request_id}>>>\n{prompt.strip()}\n<<<END id={request_id}>>>")
+    return "\n\n".join(parts) + "\n"
+
+
+def parse_batch_response(text: str, ids) -> dict:
+    """エンベロープを {id: 応答テキスト} に分解する。解析できない依頼は含めない"""
+    body = _FENCE.sub("", text.strip())
+    start, end = body.find("{"), body.rfind("}")
+    if start < 0 or end < start:
+        return {}
+    try:
+        envelope = json.loads(body[start:end + 1])
+    except ValueError:
+        return {}
+    items = envelope.get("responses") if isinstance(envelope, dict) else None
+    if not isinstance(items, list):
+        return {}
+    wanted = set(ids)
+    parsed = {}
+    for item in items:
+        if not isinstance(item, dict) or item.get("id") not in wanted:
+            continue
+        response = item.get("response")
+        if response is None or response == "":
+            continue
+        if not isinstance(response, str):
+            response = json.dumps(response, ensure_ascii=False, indent=2)
+        parsed.setdefault(item["id"], response)
+    return parsed
+
+
+class PromptBatcher:
+    """{id: prompt} を max_batch_size 件ずつまとめて投げ、依頼ごとの応答に戻す"""
+
+    def __init__(self, generate, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, prefix: str = ""):
+        self.generate = generate
+        self.max_batch_size = max_batch_size
+        # requests の各プロンプトは prefix を除いた本文。個別呼び出しでは prefix を付け直す
+        self.prefix = prefix
+        self.batch_calls = 0
+        self.batched = 0
+        self.fallbacks = 0
+
+    def _chunks(self, requests: dict) -> list:
+        items = list(requests.items())
+        return [dict(items[i:i + self.max_batch_size])
+                for i in range(0, len(items), self.max_batch_size)]
+
+    def _single(self, prompt: str) -> str:
+        return f"{self.prefix}\n\n{prompt}" if self.prefix else prompt
+
+    def _split(self, chunk: dict, text) -> dict:
+        """バッチ応答（または例外）から取れた分を返し、残りの件数をフォールバックとして数える"""
+        parsed = {} if isinstance(text, Exception) else parse_batch_response(text, chunk)
+        self.batched += len(parsed)
+        self.fallbacks += len(chunk) - len(parsed)
+        return parsed
+
+    def run(self, requests: dict) -> dict:
+        responses = {}
+        for chunk in self._chunks(requests):
+            if len(chunk) > 1:
+                self.batch_calls += 1
+                try:
+                    text = self.generate(build_batch_prompt(chunk, self.prefix))
+                except Exception as e:
+                    text = e
+                responses.update(self._split(chunk, text))
+            for request_id, prompt in chunk.items():
+                if request_id not in responses:
+                    try:
+                        responses[request_id] = self.generate(self._single(prompt))
+                    except Exception as e:
+                        responses[request_id] = e
+        return {request_id: responses[request_id] for request_id in requests}
+
+    async def run_async(self, requests: dict, agenerate) -> dict:
+        """バッチ同士は並行に投げる。agenerate(prompt) は応答テキストを返すコルーチン"""
+        import asyncio
+
+        async def run_chunk(chunk: dict) -> dict:
+            responses = {}
+            if len(chunk) > 1:
+                self.batch_calls += 1
+                try:
+                    text = await agenerate(build_batch_prompt(chunk, self.prefix))
+                except Exception as e:
+                    text = e
+                responses.update(self._split(chunk, text))
+            missing = [request_id for request_id in chunk if request_id not in responses]
+            results = await asyncio.gather(
+                *(agenerate(self._single(chunk[request_id])) for request_id in missing),
+                return_exceptions=True,
+            )
+            responses.update(zip(missing, results))
+            return responses
+
+        responses = {}
+        for part in await asyncio.gather(*(run_chunk(chunk) for chunk in self._chunks(requests))):
+            responses.update(part)
+        return {request_id: responses[request_id] for request_id in requests}
+
+    def summary(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "batch_calls": self.batch_calls,
+            "batched_requests": self.batched,
+            "fallbacks": self.fallbacks,
+        }
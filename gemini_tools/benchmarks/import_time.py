@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Gemini 相談スクリプトの import 時間と、SDK（google.generativeai）を読み込まないことの確認。
+
+各対象を新しいプロセスで repeat 回ずつ実行し、import（と対象によってはモック・ドライラン
+経路の1回分）にかかった時間の中央値を出す。どの対象も、終わった時点で SDK が
+sys.modules に無いことを確かめる（読み込まれていたら終了コード 1）。SDK がインストール
+されていれば、比較用に SDK 自体の import 時間も測る。
+
+使い方:
+  python3 gemini_tools/benchmarks/import_time.py [--repeat 10] [--importtime]
+
+--importtime は python -X importtime の結果から、各対象の累積時間の大きいモジュールを表示する。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+
+# 子プロセスで実行するコード。経過時間（秒）と SDK の読み込み有無を JSON で出力する
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "sdk_loaded": "google.generativeai" in sys.modules}}))
+"""
+
+TARGETS = {
+    "gemini_consultation (import)": "import gemini_consultation",
+    "gemini_consultation (dry-run 1 call)": (
+        "import gemini_consultation as gc\n"
+        "gc.GeminiConsultationTool(use_cache=False, dry_run=True)._generate(gc.SAFETY_PROMPT)"
+    ),
+    "age_group_implementation_test (import)": "import age_group_implementation_test",
+    "age_group_implementation_test (mock test)": (
+        "import age_group_implementation_test as t\n"
+        "t.PhaseA1ImplementationTester().test_student_prompt_optimization()"
+    ),
+    "backend/gemini_consultation (import)": (
+        "import importlib.util\n"
+        "spec = importlib.util.spec_from_file_location("
+        "'backend_gemini_consultation', 'backend/gemini_consultation.py')\n"
+        "spec.loader.exec_module(importlib.util.module_from_spec(spec))"
+    ),
+}
+SDK_TARGET = ("google.generativeai (SDK 本体)", "import google.generativeai")
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    # モック経路を通すため API キーは渡さない。結果ファイル・キャッシュにも触れない
+    env.pop("GEMINI_API_KEY", None)
+    env["GEMINI_NO_CACHE"] = "1"
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def run_child(body: str, env: dict, extra_args=()) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *extra_args, "-c", CHILD.format(body=body)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+
+
+def measure(body: str, repeat: int, env: dict) -> dict:
+    seconds = []
+    sdk_loaded = False
+    for _ in range(repeat):
+        proc = run_child(body, env)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "failed")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        seconds.append(result["seconds"])
+        sdk_loaded = sdk_loaded or result["sdk_loaded"]
+    return {
+        "median_ms": statistics.median(seconds) * 1000,
+        "min_ms": min(seconds) * 1000,
+        "sdk_loaded": sdk_loaded,
+    }
+
+
+def top_imports(body: str, env: dict, limit: int = 8) -> list:
+    """-X importtime の出力（stderr）から累積時間の大きいトップレベルのモジュールを返す"""
+    proc = run_child(body, env, ("-X", "importtime"))
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        # 入れ子の import は名前の前に段数分の空白が付く
+        if not name[1:].startswith(" "):
+            entries.append((int(cumulative_us), name.strip()))
+    return sorted(entries, reverse=True)[:limit]
+
+
+def sdk_installed(env: dict) -> bool:
+    proc = subprocess.run([sys.executable, "-c", "import importlib.util, sys; "
+                           "sys.exit(importlib.util.find_spec('google.generativeai') is None)"],
+                          env=env, capture_output=True)
+    return proc.returncode == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true",
+                        help="-X importtime で時間のかかっているモジュールを表示する")
+    args = parser.parse_args()
+
+    env = child_env()
+    targets = dict(TARGETS)
+    try:
+        has_sdk = sdk_installed(env)
+    except OSError:
+        has_sdk = False
+    if has_sdk:
+        targets[SDK_TARGET[0]] = SDK_TARGET[1]
+
+    print(f"python {sys.version.split()[0]}, repeat {args.repeat}")
+    print(f"{'median ms':>10} {'min ms':>8} {'SDK':>4}  target")
+    leaked = []
+    for name, body in targets.items():
+        try:
+            result = measure(body, args.repeat, env)
+        except RuntimeError as e:
+            print(f"{'-':>10} {'-':>8} {'-':>4}  {name}: 失敗 ({e})")
+            leaked.append(name)
+            continue
+        print(f"{result['median_ms']:>10.1f} {result['min_ms']:>8.1f} "
+              f"{'yes' if result['sdk_loaded'] else 'no':>4}  {name}")
+        if result["sdk_loaded"] and name != SDK_TARGET[0]:
+            leaked.append(name)
+        if args.importtime:
+            for cumulative_us, module in top_imports(body, env):
+                print(f"{'':>24}{cumulative_us / 1000:>8.1f} ms  {module}")
+    if not has_sdk:
+        print("google.generativeai は未インストールのため SDK 本体の import 時間は測っていません")
+
+    if leaked:
+        print(f"\nNG: SDK を読み込んだ、または失敗した対象: {', '.join(leaked)}")
+        sys.exit(1)
+    print("\nOK: どの対象も SDK を読み込んでいません")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+応答処理（提案のパース・検証・採点）のスループットと、1応答あたりのメモリ確保量を測る。
+
+gemini_tools/workload.py の合成応答（コードブロック・説明文つき・途中で切れた JSON・
+必須項目の欠け・絵文字の多寡・数千字の長文を混ぜたもの）を seed 固定で作り、次の経路に通す。
+
+  parse          parse_suggestions()（応答全体を一度に渡す）
+  stream         SuggestionStreamParser に --chunk 文字ずつ feed する（ストリーミング受信と同じ）
+  parse+score    parse の後、有効な提案を品質ヒューリスティックで採点する
+                 （supabase/_lib/quality_scorer.py）
+
+どの経路でも、有効と判定した提案の数が合成時の期待値と一致することを確かめる
+（一致しなければ終了コード 1）。時間は応答数/秒と MB/秒、メモリは tracemalloc で測った
+1応答の処理中のピーク確保量（先頭 --alloc-sample 件の平均と p95）。最後に parse の
+応答数/秒を崩れ方ごとに出す。ネットワークは使わない。
+
+使い方:
+  python3 gemini_tools/benchmarks/response_throughput.py [--responses 2000] [--seed 42]
+      [--chunk 64] [--alloc-sample 200] [--emoji-density 1.0] [--truncate-rate 0.1]
+      [--missing-rate 0.08] [--long-rate 0.05]
+"""
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "supabase"))
+from _lib.quality_scorer import score_suggestions  # noqa: E402
+from gemini_tools.suggestion_stream import SuggestionStreamParser, parse_suggestions  # noqa: E402
+from gemini_tools.workload import WorkloadConfig, generate_workload  # noqa: E402
+
+# duration は既定値で補わない（workload の expected_valid の前提）
+DEFAULTS = {"situation": ["studying"], "age_groups": ["student"]}
+
+
+def run_parse(text: str) -> int:
+    return parse_suggestions(text, DEFAULTS)[1]["valid"]
+
+
+def make_run_stream(chunk: int):
+    def run_stream(text: str) -> int:
+        parser = SuggestionStreamParser(DEFAULTS)
+        valid = 0
+        for start in range(0, len(text), chunk):
+            valid += len(parser.feed(text[start:start + chunk]))
+        parser.close()
+        return valid
+    return run_stream
+
+
+def run_parse_score(text: str) -> int:
+    rows, summary = parse_suggestions(text, DEFAULTS)
+    if rows:
+        score_suggestions(rows)
+    return summary["valid"]
+
+
+def measure(fn, responses: list) -> tuple:
+    """(秒, 期待値と一致しなかった応答数)"""
+    mismatches = 0
+    start = time.perf_counter()
+    for response in responses:
+        if fn(response.text) != response.expected_valid:
+            mismatches += 1
+    return time.perf_counter() - start, mismatches
+
+
+def peak_allocations(fn, responses: list) -> list:
+    """応答ごとの処理中のピーク確保量（バイト）"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for response in responses:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn(response.text)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk", type=int, default=64, help="stream で1回に feed する文字数")
+    parser.add_argument("--alloc-sample", type=int, default=200, help="メモリ確保量を測る応答数")
+    parser.add_argument("--emoji-density", type=float, default=WorkloadConfig().emoji_density)
+    parser.add_argument("--truncate-rate", type=float, default=WorkloadConfig().truncate_rate)
+    parser.add_argument("--missing-rate", type=float, default=WorkloadConfig().missing_rate)
+    parser.add_argument("--long-rate", type=float, default=WorkloadConfig().long_rate)
+    args = parser.parse_args()
+
+    config = WorkloadConfig(count=args.responses, seed=args.seed, emoji_density=args.emoji_density,
+                            truncate_rate=args.truncate_rate, missing_rate=args.missing_rate,
+                            long_rate=args.long_rate)
+    start = time.perf_counter()
+    responses = list(generate_workload(config))
+    chars = sum(len(r.text) for r in responses)
+    megabytes = sum(len(r.text.encode("utf-8")) for r in responses) / 1e6
+    print(f"responses: {len(responses)}（生成 {time.perf_counter() - start:.2f}秒）、"
+          f"平均 {chars / len(responses):.0f} 文字、期待される有効な提案 "
+          f"{sum(r.expected_valid for r in responses)} 件")
+
+    paths = {
+        "parse": run_parse,
+        f"stream ({args.chunk})": make_run_stream(args.chunk),
+        "parse+score": run_parse_score,
+    }
+    failed = False
+    print(f"\n{'path':<14} {'resp/s':>9} {'MB/s':>7} {'peak KB/resp':>13} {'p95 KB':>8} {'mismatch':>9}")
+    for name, fn in paths.items():
+        seconds, mismatches = measure(fn, responses)
+        peaks = peak_allocations(fn, responses[:args.alloc_sample])
+        p95 = sorted(peaks)[min(len(peaks) - 1, int(0.95 * len(peaks)))] if peaks else 0
+        print(f"{name:<14} {len(responses) / seconds:>9.0f} {megabytes / seconds:>7.2f} "
+              f"{statistics.mean(peaks) / 1024 if peaks else 0:>13.1f} {p95 / 1024:>8.1f} {mismatches:>9}")
+        failed = failed or mismatches > 0
+
+    # 崩れ方ごとの parse のスループット（1応答が複数の崩れ方に数えられる）
+    by_kind = defaultdict(list)
+    for response in responses:
+        for kind in response.kinds:
+            by_kind[kind].append(response)
+    print(f"\n{'kind':<12} {'count':>6} {'avg chars':>10} {'resp/s':>9}")
+    for kind, group in sorted(by_kind.items(), key=lambda item: -len(item[1])):
+        seconds, _ = measure(run_parse, group)
+        print(f"{kind:<12} {len(group):>6} {sum(len(r.text) for r in group) / len(group):>10.0f} "
+              f"{len(group) / seconds:>9.0f}")
+
+    if failed:
+        print("\n❌ 有効な提案の数が合成時の期待値と一致しない応答があります")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
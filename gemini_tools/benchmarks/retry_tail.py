@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+gemini_tools/retry.py（リトライ・期限・ヘッジ）の効果をローカルのスタブで測る。
+
+スタブは API の代わりに、裾の長い遅延（対数正規分布 + 一定割合の極端に遅い応答）と
+429 / 503 を注入する。同じ seed・同じ呼び出し数で設定ごとに ResilientCaller を通し、
+成功率・所要時間の p50 / p95 / p99 / 最大・実際に送った回数を比べる。ネットワークは使わない。
+
+使い方:
+  python3 gemini_tools/benchmarks/retry_tail.py [--calls 300] [--concurrency 8]
+      [--median 0.05] [--sigma 0.5] [--slow-rate 0.03] [--error-rate 0.1] [--seed 42]
+"""
+import argparse
+import math
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from gemini_tools.providers import ProviderError  # noqa: E402
+from gemini_tools.retry import ResilientCaller, RetryPolicy  # noqa: E402
+
+
+class Stub:
+    """遅延とエラーを注入する API の代わり。cancel が立つと待つのをやめる"""
+
+    def __init__(self, median: float, sigma: float, slow_rate: float, error_rate: float, seed: int):
+        self.median = median
+        self.sigma = sigma
+        self.slow_rate = slow_rate
+        self.error_rate = error_rate
+        self.seed = seed
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, call_id: int, cancel: threading.Event) -> str:
+        with self._lock:
+            self.sent += 1
+            n = self.sent
+        # 送信ごとに独立な乱数（同じ呼び出しのリトライ・ヘッジも別の遅延になる）
+        rng = random.Random(f"{self.seed}:{call_id}:{n}")
+        delay = rng.lognormvariate(math.log(self.median), self.sigma)
+        if rng.random() < self.slow_rate:
+            delay *= 20
+        if cancel.wait(delay):
+            return ""
+        if rng.random() < self.error_rate:
+            code = rng.choice((429, 503))
+            raise ProviderError(code, f"{code} injected")
+        return f"response {call_id}"
+
+
+def run(label: str, caller: ResilientCaller, stub: Stub, calls: int, concurrency: int) -> dict:
+    stub.sent = 0
+    walls = []
+    failures = 0
+    lock = threading.Lock()
+
+    def one(call_id: int) -> None:
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            caller.call(lambda cancel: stub(call_id, cancel), key="step")
+        except Exception:
+            with lock:
+                failures += 1
+        with lock:
+            walls.append(time.perf_counter() - started)
+
+    # ヘッジの基準（所要時間の分位）は最初に返った数件から作られ、以降は流しながら更新される
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(calls)))
+    walls.sort()
+
+    def pct(q: float) -> float:
+        return walls[min(len(walls) - 1, int(q * len(walls)))] * 1000
+
+    return {
+        "label": label,
+        "success": 1 - failures / calls,
+        "p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "max": walls[-1] * 1000,
+        "sent": stub.sent,
+        "calls": calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--median", type=float, default=0.05, help="遅延の中央値（秒）")
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--slow-rate", type=float, default=0.03, help="中央値の20倍遅い応答の割合")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="429 / 503 の割合")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    stub = Stub(args.median, args.sigma, args.slow_rate, args.error_rate, args.seed)
+    # バックオフ・期限はスタブの遅延の尺度に合わせて縮める
+    policy = RetryPolicy(max_attempts=4, base_delay=args.median, max_delay=args.median * 10)
+    deadline = args.median * 30
+    configs = [
+        ("素のまま（リトライなし）", ResilientCaller(RetryPolicy(max_attempts=1), seed=args.seed)),
+        ("リトライ", ResilientCaller(policy, seed=args.seed)),
+        ("リトライ + 期限", ResilientCaller(policy, deadline=deadline, seed=args.seed)),
+        ("リトライ + 期限 + ヘッジ p95",
+         ResilientCaller(policy, deadline=deadline, hedge_percentile=0.95, seed=args.seed,
+                         max_workers=args.concurrency * 2)),
+    ]
+    print(f"calls {args.calls}, concurrency {args.concurrency}, 遅延中央値 {args.median * 1000:.0f} ms, "
+          f"遅い応答 {args.slow_rate:.0%}, エラー {args.error_rate:.0%}, 期限 {deadline * 1000:.0f} ms")
+    print(f"{'success':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'sent':>6}  config")
+    for label, caller in configs:
+        r = run(label, caller, stub, args.calls, args.concurrency)
+        print(f"{r['success']:>8.1%} {r['p50']:>8.0f} {r['p95']:>8.0f} {r['p99']:>8.0f} "
+              f"{r['max']:>8.0f} {r['sent']:>6}  {label}")
+        summary = caller.summary()
+        if summary["retries"] or summary["hedges"] or summary["deadlines_exceeded"]:
+            print(f"{'':>45}リトライ {summary['retries']} / ヘッジ {summary['hedges']}"
+                  f"（先着 {summary['hedge_wins']}）/ 期限切れ {summary['deadlines_exceeded']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+モデル呼び出しごとの計測（所要時間・最初のチャンクまでの時間・トークン概算・リトライ・概算コスト）。
+
+呼び出し1回ごとに CallMetrics.record() し、実行の最後に JSON レポートと Prometheus の
+テキスト形式（node_exporter の textfile collector でそのまま読める）を書き出す。
+
+  JSON        <dir>/<run>-<YYYYmmdd-HHMMSS>.json  呼び出し一覧 + ステップ別集計 + ヒストグラム
+  Prometheus  <dir>/<run>.prom                    最新の実行で上書き
+
+トークン数は API を呼ばずに概算する（estimate_tokens）。ASCII は4文字で1トークン、
+それ以外（日本語・絵文字）は1文字1トークンとみなす。Gemini のトークナイザーより多めに出るので、
+コストは上限の目安として読む。単価は PRICING（100万トークンあたりの USD）。
+リトライ・ヘッジで1回の呼び出しが複数回送られたときは、送った回数（sent）分のプロンプトと、
+失敗しなかった送信の分の応答を数える。
+
+使い方:
+  metrics = CallMetrics("consultation", MODEL_NAME)
+  metrics.record("safety", prompt, text, wall_seconds=1.2, first_chunk_seconds=0.3)
+  json_path, prom_path = metrics.export()
+  print_compare(load_report(old_json), metrics.report())
+  caller.latency.extend(latency_history("consultation"))  # 過去の実行の所要時間でヘッジを始める
+"""
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_METRICS_DIR = ROOT / ".cache" / "gemini-metrics"
+
+# 100万トークンあたりの USD（128k トークン以下のプロンプトの単価）
+PRICING = {
+    "gemini-1.5-flash": {"input": 0.075, "output": 0.30},
+    "gemini-1.5-pro": {"input": 1.25, "output": 5.00},
+}
+
+# latency_history が読む直近のレポート数
+HISTORY_REPORTS = 20
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+def estimate_tokens(text: str) -> int:
+    """ネットワークなしのトークン概算（ASCII 4文字で1、それ以外は1文字で1）"""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ch < "\x80")
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def estimate_cost(model: str, prompt_tokens: int, response_tokens: int) -> float:
+    price = PRICING.get(model)
+    if price is None:
+        return 0.0
+    return (prompt_tokens * price["input"] + response_tokens * price["output"]) / 1_000_000
+
+
+class Histogram:
+    """Prometheus と同じ累積バケットのヒストグラム"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+            "count": self.count,
+            "sum": round(self.sum, 4),
+        }
+
+
+def _percentile(values: list, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CallMetrics:
+    """呼び出しの記録とステップ別の集計（スレッドセーフ）"""
+
+    def __init__(self, run: str, model: str):
+        self.run = run
+        self.model = model
+        self.started_at = datetime.now()
+        self.calls = []
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, step: str, prompt: str, response: str = None, wall_seconds: float = 0.0,
+               first_chunk_seconds: float = None, queued_seconds: float = 0.0, retries: int = 0,
+               cached: bool = False, hedged: bool = False, error: BaseException = None,
+               sent: int = None) -> dict:
+        """sent は実際に送った回数（リトライ・ヘッジを含む。省略時はキャッシュヒットで 0、それ以外 1）"""
+        prompt_tokens = estimate_tokens(prompt)
+        response_tokens = estimate_tokens(response or "")
+        if sent is None:
+            sent = 0 if cached else 1
+        # 送った回数分のプロンプトと、エラーにならなかった送信の応答に課金される（キャッシュヒットは 0）
+        answered = 0 if error is not None else max(1, sent - retries) if sent else 0
+        call = {
+            "step": step,
+            "outcome": "error" if error is not None else "cache_hit" if cached else "ok",
+            "wall_seconds": round(wall_seconds, 4),
+            "first_chunk_seconds": None if first_chunk_seconds is None else round(first_chunk_seconds, 4),
+            "queued_seconds": round(queued_seconds, 4),
+            "prompt_chars": len(prompt),
+            "prompt_tokens": prompt_tokens,
+            "response_tokens": response_tokens,
+            "retries": retries,
+            "hedged": hedged,
+            "sent": sent,
+            "cost_usd": estimate_cost(self.model, prompt_tokens * sent, response_tokens * answered),
+        }
+        if error is not None:
+            call["error"] = f"{type(error).__name__}: {error}"
+        with self._lock:
+            self.calls.append(call)
+            if not cached:
+                self._observe(step, "wall_seconds", LATENCY_BUCKETS, wall_seconds)
+                if first_chunk_seconds is not None:
+                    self._observe(step, "first_chunk_seconds", LATENCY_BUCKETS, first_chunk_seconds)
+                self._observe(step, "prompt_tokens", TOKEN_BUCKETS, prompt_tokens)
+                self._observe(step, "response_tokens", TOKEN_BUCKETS, response_tokens)
+        return call
+
+    def _observe(self, step: str, name: str, buckets, value: float) -> None:
+        key = (name, step)
+        if key not in self._histograms:
+            self._histograms[key] = Histogram(buckets)
+        self._histograms[key].observe(value)
+
+    def steps(self) -> dict:
+        """ステップ別の集計"""
+        grouped = {}
+        for call in self.calls:
+            grouped.setdefault(call["step"], []).append(call)
+        steps = {}
+        for step, calls in grouped.items():
+            walls = [c["wall_seconds"] for c in calls if c["outcome"] != "cache_hit"]
+            firsts = [c["first_chunk_seconds"] for c in calls if c["first_chunk_seconds"] is not None]
+            steps[step] = {
+                "calls": len(calls),
+                "errors": sum(c["outcome"] == "error" for c in calls),
+                "cache_hits": sum(c["outcome"] == "cache_hit" for c in calls),
+                "retries": sum(c["retries"] for c in calls),
+                "hedged": sum(c["hedged"] for c in calls),
+                "wall_p50": _percentile(walls, 0.5),
+                "wall_p95": _percentile(walls, 0.95),
+                "wall_max": max(walls) if walls else None,
+                "first_chunk_p50": _percentile(firsts, 0.5),
+                "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+                "response_tokens": sum(c["response_tokens"] for c in calls),
+                "cost_usd": round(sum(c["cost_usd"] for c in calls), 6),
+            }
+        return steps
+
+    def totals(self) -> dict:
+        calls = self.calls
+        return {
+            "calls": len(calls),
+            "errors": sum(c["outcome"] == "error" for c in calls),
+            "cache_hits": sum(c["outcome"] == "cache_hit" for c in calls),
+            "retries": sum(c["retries"] for c in calls),
+            "wall_seconds": round(sum(c["wall_seconds"] for c in calls), 3),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+            "response_tokens": sum(c["response_tokens"] for c in calls),
+            "cost_usd": round(sum(c["cost_usd"] for c in calls), 6),
+        }
+
+    def report(self) -> dict:
+        with self._lock:
+            histograms = {}
+            for (name, step), histogram in sorted(self._histograms.items()):
+                histograms.setdefault(name, {})[step] = histogram.to_dict()
+            return {
+                "run": self.run,
+                "model": self.model,
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "pricing_per_million_tokens": PRICING.get(self.model),
+                "totals": self.totals(),
+                "steps": self.steps(),
+                "histograms": histograms,
+                "calls": list(self.calls),
+            }
+
+    def prometheus(self) -> str:
+        """Prometheus のテキスト形式"""
+        labels = f'run="{self.run}",model="{self.model}"'
+        lines = []
+        with self._lock:
+            for name, help_text in (
+                ("wall_seconds", "モデル呼び出しの所要時間"),
+                ("first_chunk_seconds", "最初のチャンクまでの時間"),
+                ("prompt_tokens", "プロンプトのトークン数（概算）"),
+                ("response_tokens", "応答のトークン数（概算）"),
+            ):
+                metric = f"gemini_call_{name}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for (hist_name, step), histogram in sorted(self._histograms.items()):
+                    if hist_name != name:
+                        continue
+                    step_labels = f'{labels},step="{step}"'
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{metric}_bucket{{{step_labels},le="{bound}"}} {count}')
+                    lines.append(f'{metric}_bucket{{{step_labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f"{metric}_sum{{{step_labels}}} {histogram.sum:.6f}")
+                    lines.append(f"{metric}_count{{{step_labels}}} {histogram.count}")
+
+            steps = self.steps()
+            lines.append("# HELP gemini_calls_total モデル呼び出し回数（outcome: ok / error / cache_hit）")
+            lines.append("# TYPE gemini_calls_total counter")
+            for step, data in steps.items():
+                ok = data["calls"] - data["errors"] - data["cache_hits"]
+                for outcome, count in (("ok", ok), ("error", data["errors"]), ("cache_hit", data["cache_hits"])):
+                    lines.append(f'gemini_calls_total{{{labels},step="{step}",outcome="{outcome}"}} {count}')
+            for metric, field, help_text in (
+                ("gemini_retries_total", "retries", "リトライ回数"),
+                ("gemini_hedged_calls_total", "hedged", "ヘッジ（2本目）を送った呼び出し数"),
+                ("gemini_estimated_cost_usd_total", "cost_usd", "概算コスト（USD）"),
+            ):
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for step, data in steps.items():
+                    lines.append(f'{metric}{{{labels},step="{step}"}} {data[field]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory=None):
+        """JSON レポートと Prometheus ファイルを書き、(json のパス, prom のパス) を返す"""
+        directory = Path(directory or DEFAULT_METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        json_path = directory / f"{self.run}-{self.started_at:%Y%m%d-%H%M%S}.json"
+        prom_path = directory / f"{self.run}.prom"
+        json_path.write_text(json.dumps(self.report(), ensure_ascii=False, indent=2), encoding="utf-8")
+        # textfile collector が書きかけを読まないように置き換える
+        tmp = prom_path.with_suffix(".prom.tmp")
+        tmp.write_text(self.prometheus(), encoding="utf-8")
+        tmp.replace(prom_path)
+        return json_path, prom_path
+
+
+def load_report(path) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def latency_history(run: str, directory=None, max_reports: int = HISTORY_REPORTS) -> dict:
+    """直近 max_reports 件のレポートから、ステップ別の所要時間（リトライなしで成功した呼び出し）を返す
+
+    ヘッジの分位は同じステップのサンプルが揃うまで決まらないので、1回きりの実行では
+    これで過去の実行の分布を引き継ぐ。壊れたレポートは読み飛ばす。
+    """
+    directory = Path(directory or DEFAULT_METRICS_DIR)
+    history = {}
+    for path in sorted(directory.glob(f"{run}-*.json"))[-max_reports:]:
+        try:
+            calls = load_report(path).get("calls", [])
+        except (OSError, ValueError):
+            continue
+        for call in calls:
+            if call.get("outcome") == "ok" and not call.get("retries"):
+                history.setdefault(call["step"], []).append(call["wall_seconds"])
+    return history
+
+
+def print_steps(report: dict) -> None:
+    print(f"{'step':<24} {'calls':>5} {'err':>4} {'p50 s':>7} {'p95 s':>7} {'1st s':>6} "
+          f"{'in tok':>7} {'out tok':>7} {'cost $':>9}")
+    for step, data in sorted(report["steps"].items(), key=lambda kv: -(kv[1]["wall_max"] or 0)):
+        print(f"{step:<24} {data['calls']:>5} {data['errors']:>4} {_fmt(data['wall_p50']):>7} "
+              f"{_fmt(data['wall_p95']):>7} {_fmt(data['first_chunk_p50']):>6} "
+              f"{data['prompt_tokens']:>7} {data['response_tokens']:>7} {data['cost_usd']:>9.5f}")
+    totals = report["totals"]
+    print(f"{'合計':<23} {totals['calls']:>5} {totals['errors']:>4} {'':>7} {'':>7} {'':>6} "
+          f"{totals['prompt_tokens']:>7} {totals['response_tokens']:>7} {totals['cost_usd']:>9.5f}")
+
+
+def print_compare(old: dict, new: dict) -> None:
+    """2回の実行のステップ別 p50 所要時間・トークン・コストの差"""
+    print(f"{'step':<24} {'p50 s':>15} {'out tok':>15} {'cost $':>21}")
+    for step in sorted(set(old["steps"]) | set(new["steps"])):
+        before, after = old["steps"].get(step, {}), new["steps"].get(step, {})
+        print(f"{step:<24} {_fmt(before.get('wall_p50')):>6} → {_fmt(after.get('wall_p50')):<6} "
+              f"{before.get('response_tokens', '-'):>6} → {after.get('response_tokens', '-'):<6} "
+              f"{before.get('cost_usd', 0):>9.5f} → {after.get('cost_usd', 0):<9.5f}")
+
+
+def _fmt(value) -> str:
+    return "-" if value is None else f"{value:.2f}"
@@ -0,0 +1,196 @@
+"""
+送信前のプロンプトのコンパクト化とトークン予算チェック。
+
+ソース中のプロンプトは読みやすさのために字下げした三重引用符の文字列で、JSON の出力例も
+整形してある。そのまま送ると字下げと改行だけで数百トークンになるので、送信前に次を行う。
+
+  1. 字下げを外し（textwrap.dedent）、行末の空白を削り、連続する空行を1つにまとめる
+  2. JSON の出力例（行頭が { / [ で始まり、括弧が閉じるまでのブロック）の空白を詰める。
+     "1-10" や "{ ... }" のような JSON として正しくない例でも、文字列の外の空白だけを詰める
+  3. 複数のプロンプトに同じ段落（空行区切り）があれば、共通プレフィックスとして先頭にまとめる。
+     どのプロンプトも同じプレフィックスで始まるので、バッチでは1回だけ送ればよい
+
+トークン数は metrics.estimate_tokens の概算（ネットワーク不要）。予算を超えたプロンプトが
+あれば check_budget() が PromptBudgetError を送出する。
+
+使い方:
+  compiled = compile_prompts({"safety": SAFETY_PROMPT, "cost": COST_PROMPT})
+  compiled.prompts["safety"]      # 共通プレフィックス + 本文
+  print_report(compiled.report())
+  check_budget(compiled.prompts, budget=1500)
+"""
+import json
+import re
+import textwrap
+
+from gemini_tools.metrics import estimate_tokens
+
+_BLANK_LINES = re.compile(r"\n{3,}")
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+_STRUCTURAL = set("{}[],:")
+
+
+class PromptBudgetError(ValueError):
+    """トークン予算を超えたプロンプトがある"""
+
+    def __init__(self, violations: list, budget: int):
+        self.violations = violations
+        self.budget = budget
+        names = ", ".join(f"{name}（{tokens} トークン）" for name, tokens in violations)
+        super().__init__(f"トークン予算 {budget} を超えたプロンプトがあります: {names}")
+
+
+def minify_json_like(block: str) -> str:
+    """文字列の外の空白を詰める。構造記号の前後は削り、語と語の間は空白1つにする"""
+    out = []
+    pending_space = False
+    in_string = False
+    escape = False
+    for ch in block:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch.isspace():
+            pending_space = True
+            continue
+        if pending_space and out and out[-1] not in _STRUCTURAL and ch not in _STRUCTURAL:
+            out.append(" ")
+        pending_space = False
+        out.append(ch)
+        if ch == '"':
+            in_string = True
+    return "".join(out)
+
+
+def _bracket_delta(line: str) -> int:
+    depth = 0
+    in_string = False
+    escape = False
+    for ch in line:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+    return depth
+
+
+def _minify_blocks(lines: list) -> list:
+    """行頭が { / [ のブロックを括弧が閉じるまで集め、キーを含むものだけ詰める"""
+    out = []
+    i = 0
+    while i < len(lines):
+        if not lines[i].lstrip().startswith(("{", "[")):
+            out.append(lines[i])
+            i += 1
+            continue
+        depth = 0
+        j = i
+        while j < len(lines):
+            depth += _bracket_delta(lines[j])
+            j += 1
+            if depth <= 0:
+                break
+        block = "\n".join(lines[i:j])
+        if depth == 0 and '":' in block.replace('" :', '":'):
+            out.append(minify_json_like(block))
+        else:
+            out.extend(lines[i:j])
+        i = j
+    return out
+
+
+def compact(text: str) -> str:
+    """字下げ・行末空白・連続空行を除き、JSON の出力例を詰める"""
+    lines = [line.rstrip() for line in textwrap.dedent(text).strip("\n").split("\n")]
+    text = "\n".join(_minify_blocks(lines)).strip()
+    return _BLANK_LINES.sub("\n\n", text)
+
+
+def compact_embedded(text: str) -> str:
+    """プロンプトに埋め込む応答テキスト。JSON なら空白なしに詰め、そうでなければ前後の空白だけ削る"""
+    body = _FENCE.sub("", text.strip())
+    try:
+        return json.dumps(json.loads(body), ensure_ascii=False, separators=(",", ":"))
+    except ValueError:
+        return text.strip()
+
+
+def _paragraphs(text: str) -> list:
+    return [p for p in text.split("\n\n") if p.strip()]
+
+
+class CompiledPrompts:
+    def __init__(self, sources: dict, prefix: str, bodies: dict):
+        self.sources = sources
+        self.prefix = prefix
+        self.bodies = bodies
+        self.prompts = {name: self.with_prefix(body) for name, body in bodies.items()}
+
+    def with_prefix(self, body: str) -> str:
+        return f"{self.prefix}\n\n{body}" if self.prefix else body
+
+    def report(self) -> list:
+        """プロンプトごとの (名前, 元の文字数, 後の文字数, 元のトークン, 後のトークン)"""
+        return [
+            (name, len(self.sources[name]), len(self.prompts[name]),
+             estimate_tokens(self.sources[name]), estimate_tokens(self.prompts[name]))
+            for name in self.prompts
+        ]
+
+
+def compile_prompts(prompts: dict, shared_min: int = 2) -> CompiledPrompts:
+    """{名前: プロンプト} をコンパクト化し、shared_min 件以上に出てくる段落を共通プレフィックスにする"""
+    compacted = {name: compact(text) for name, text in prompts.items()}
+    seen = {}
+    for name, text in compacted.items():
+        for paragraph in dict.fromkeys(_paragraphs(text)):
+            seen.setdefault(paragraph, []).append(name)
+    shared = [p for p, names in seen.items() if len(names) >= shared_min]
+    shared_set = set(shared)
+    bodies = {
+        name: "\n\n".join(p for p in _paragraphs(text) if p not in shared_set)
+        for name, text in compacted.items()
+    }
+    return CompiledPrompts(dict(prompts), "\n\n".join(shared), bodies)
+
+
+def check_budget(prompts: dict, budget: int) -> None:
+    """{名前: プロンプト} のうち budget トークンを超えるものがあれば PromptBudgetError"""
+    if not budget:
+        return
+    violations = [(name, estimate_tokens(text)) for name, text in prompts.items()
+                  if estimate_tokens(text) > budget]
+    if violations:
+        raise PromptBudgetError(violations, budget)
+
+
+def print_report(rows: list, prefix: str = "") -> None:
+    print(f"{'prompt':<24} {'chars':>13} {'tokens':>13} {'saved':>6}")
+    total_before = total_after = 0
+    for name, chars_before, chars_after, tokens_before, tokens_after in rows:
+        total_before += tokens_before
+        total_after += tokens_after
+        saved = 1 - tokens_after / tokens_before if tokens_before else 0
+        print(f"{name:<24} {chars_before:>5} → {chars_after:<5} {tokens_before:>5} → {tokens_after:<5} "
+              f"{saved:>6.0%}")
+    saved = 1 - total_after / total_before if total_before else 0
+    print(f"{'合計':<23} {'':>13} {total_before:>5} → {total_after:<5} {saved:>6.0%}")
+    if prefix:
+        print(f"共通プレフィックス: {len(_paragraphs(prefix))} 段落 / {estimate_tokens(prefix)} トークン")
+    else:
+        print("共通プレフィックス: なし（複数のプロンプトに共通する段落はありません）")
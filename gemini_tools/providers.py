@@ -0,0 +1,295 @@
+"""
+モデル呼び出しの差し替え口（プロバイダー）。gemini / record / replay の3種類。
+
+  gemini   google.generativeai を呼ぶ（SDK は最初の呼び出しで読み込む）
+  record   内側のプロバイダーを呼び、応答（チャンク列）・所要時間・エラーをカセット
+           （JSONL、1呼び出し1行）に追記する
+  replay   カセットの応答をネットワークなしで返す。遅延は分布から、エラーは error_rate で注入する
+
+どのプロバイダーも generate(prompt) -> str と stream(prompt) -> テキストチャンクの iterator を持つ。
+replay の遅延・エラーは (seed, プロンプト, そのプロンプトの何回目の呼び出しか) から決まるので、
+スレッドや asyncio で並行に呼んでも同じ seed なら同じ結果になる。
+
+遅延の指定（--replay-latency）:
+  recorded             記録時の所要時間（既定）
+  fixed:0.5            毎回 0.5 秒
+  uniform:0.2,1.5      0.2〜1.5 秒の一様分布
+  lognormal:0.8,0.6    中央値 0.8 秒、σ=0.6 の対数正規分布（API の裾の長い遅延に近い）
+
+使い方:
+  provider = make_provider("record", MODEL_NAME, cassette=".cache/gemini-cassette.jsonl")
+  text = provider.generate(prompt)
+  provider = make_provider("replay", MODEL_NAME, cassette=..., latency="lognormal:0.8,0.6",
+                           error_rate=0.05, seed=1)
+"""
+import json
+import math
+import random
+import threading
+import time
+from pathlib import Path
+
+from gemini_tools.response_cache import ResponseCache
+from gemini_tools.sdk import load_genai
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CASSETTE = ROOT / ".cache" / "gemini-cassette.jsonl"
+PROVIDERS = ("gemini", "record", "replay")
+
+# replay で注入するエラー（HTTP ステータス, メッセージ）。429 は is_rate_limit_error で拾える
+INJECTED_ERRORS = (
+    (429, "429 Resource has been exhausted (e.g. check quota)."),
+    (500, "500 An internal error has occurred."),
+    (503, "503 The service is currently unavailable."),
+)
+# 記録時の所要時間のうち最初のチャンクまでが占める割合（記録が無いときの既定）
+DEFAULT_FIRST_CHUNK_RATIO = 0.3
+
+
+class ProviderError(Exception):
+    """replay が注入したエラー。code は HTTP ステータス"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class CassetteMiss(KeyError):
+    """カセットに記録の無いプロンプトを replay しようとした"""
+
+
+class Provider:
+    name = "base"
+
+    def stream(self, prompt: str):
+        yield self.generate(prompt)
+
+    def generate(self, prompt: str) -> str:
+        return "".join(self.stream(prompt))
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+
+    def __init__(self, model_name: str, api_key: str = None):
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = load_genai(self.api_key).GenerativeModel(self.model_name)
+        return self._model
+
+    def generate(self, prompt: str) -> str:
+        return self.model.generate_content(prompt).text
+
+    def stream(self, prompt: str):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            yield chunk.text
+
+
+class RecordingProvider(Provider):
+    """inner の応答をカセットに追記しながらそのまま返す（エラーも記録してから送出する）"""
+
+    name = "record"
+
+    def __init__(self, inner: Provider, model_name: str, cassette=DEFAULT_CASSETTE):
+        self.inner = inner
+        self.model_name = model_name
+        self.path = Path(cassette)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str) -> str:
+        started = time.perf_counter()
+        try:
+            text = self.inner.generate(prompt)
+        except Exception as e:
+            self._append(self._entry(prompt, [], started, None, e))
+            raise
+        elapsed = time.perf_counter() - started
+        self._append(self._entry(prompt, [text], started, elapsed))
+        return text
+
+    def stream(self, prompt: str):
+        started = time.perf_counter()
+        first_chunk = None
+        chunks = []
+        error = None
+        try:
+            for chunk in self.inner.stream(prompt):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - started
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._append(self._entry(prompt, chunks, started, first_chunk, error))
+
+    def _entry(self, prompt: str, chunks: list, started: float, first_chunk: float,
+               error: Exception = None) -> dict:
+        entry = {
+            "key": ResponseCache.key(self.model_name, prompt),
+            "model": self.model_name,
+            "prompt_chars": len(prompt),
+            "chunks": chunks,
+            "latency_seconds": round(time.perf_counter() - started, 4),
+            "first_chunk_seconds": None if first_chunk is None else round(first_chunk, 4),
+        }
+        if error is not None:
+            entry["error"] = {"code": getattr(error, "code", None), "message": str(error)}
+        return entry
+
+    def _append(self, entry: dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.recorded += 1
+
+
+def parse_latency(spec: str):
+    """遅延の指定を (分布名, 引数タプル) にする"""
+    name, _, params = (spec or "recorded").partition(":")
+    values = tuple(float(v) for v in params.split(",")) if params else ()
+    expected = {"recorded": 0, "fixed": 1, "uniform": 2, "lognormal": 2}
+    if name not in expected or len(values) != expected[name]:
+        raise ValueError(f"遅延の指定が不正です: {spec!r}（recorded / fixed:S / uniform:A,B / lognormal:MEDIAN,SIGMA）")
+    return name, values
+
+
+class ReplayProvider(Provider):
+    """カセットの応答を返す。同じプロンプトの記録が複数あれば呼ぶたびに順に使う"""
+
+    name = "replay"
+
+    def __init__(self, model_name: str, cassette=DEFAULT_CASSETTE, latency: str = "recorded",
+                 error_rate: float = 0.0, seed: int = 0, speed: float = 1.0,
+                 sleep=time.sleep):
+        self.model_name = model_name
+        self.path = Path(cassette)
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.seed = seed
+        # recorded の遅延に掛ける倍率（0 で待たない）
+        self.speed = speed
+        self.sleep = sleep
+        self.entries = self._load()
+        self.calls = 0
+        self.injected = 0
+        self.misses = 0
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        entries = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    entries.setdefault(entry["key"], []).append(entry)
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _next(self, prompt: str):
+        key = ResponseCache.key(self.model_name, prompt)
+        with self._lock:
+            self.calls += 1
+            n = self._counts.get(key, 0)
+            self._counts[key] = n + 1
+            recorded = self.entries.get(key)
+            if not recorded:
+                self.misses += 1
+                raise CassetteMiss(f"カセット {self.path} にこのプロンプトの記録がありません（key={key}）")
+        rng = random.Random(f"{self.seed}:{key}:{n}")
+        return recorded[n % len(recorded)], rng
+
+    def _delay(self, entry: dict, rng: random.Random) -> float:
+        name, values = self.latency
+        if name == "fixed":
+            return values[0]
+        if name == "uniform":
+            return rng.uniform(*values)
+        if name == "lognormal":
+            median, sigma = values
+            return rng.lognormvariate(math.log(median), sigma)
+        return entry.get("latency_seconds", 0.0) * self.speed
+
+    def stream(self, prompt: str):
+        entry, rng = self._next(prompt)
+        total = self._delay(entry, rng)
+        recorded = entry.get("latency_seconds") or 0.0
+        first_ratio = (entry["first_chunk_seconds"] / recorded
+                       if recorded and entry.get("first_chunk_seconds") is not None
+                       else DEFAULT_FIRST_CHUNK_RATIO)
+        if rng.random() < self.error_rate:
+            with self._lock:
+                self.injected += 1
+            code, message = rng.choice(INJECTED_ERRORS)
+            self.sleep(total * first_ratio)
+            raise ProviderError(code, message)
+        error = entry.get("error")
+        chunks = entry.get("chunks") or []
+        # 最初のチャンクまでに first_ratio、残りのチャンクに残りの時間を均等に割り振る
+        self.sleep(total * first_ratio)
+        if error:
+            raise ProviderError(error.get("code") or 500, error["message"])
+        rest = total * (1 - first_ratio) / max(len(chunks) - 1, 1)
+        for i, chunk in enumerate(chunks):
+            if i:
+                self.sleep(rest)
+            yield chunk
+
+    def summary(self) -> dict:
+        return {
+            "cassette": str(self.path),
+            "recorded_prompts": len(self.entries),
+            "calls": self.calls,
+            "misses": self.misses,
+            "injected_errors": self.injected,
+        }
+
+
+def make_provider(kind: str, model_name: str, api_key: str = None, cassette=None,
+                  latency: str = "recorded", error_rate: float = 0.0, seed: int = 0) -> Provider:
+    cassette = cassette or DEFAULT_CASSETTE
+    if kind == "gemini":
+        return GeminiProvider(model_name, api_key)
+    if kind == "record":
+        return RecordingProvider(GeminiProvider(model_name, api_key), model_name, cassette)
+    if kind == "replay":
+        return ReplayProvider(model_name, cassette, latency, error_rate, seed)
+    raise ValueError(f"未知のプロバイダーです: {kind}（{' / '.join(PROVIDERS)}）")
+
+
+def add_provider_args(parser) -> None:
+    """--provider / --cassette / --replay-latency / --replay-error-rate / --seed を追加する"""
+    group = parser.add_argument_group("プロバイダー（record / replay でオフライン計測）")
+    group.add_argument("--provider", choices=PROVIDERS, default="gemini",
+                       help="gemini: API を呼ぶ / record: 呼んだ結果をカセットに記録 / "
+                            "replay: カセットから返す（ネットワーク不要）")
+    group.add_argument("--cassette", default=str(DEFAULT_CASSETTE),
+                       help=f"record / replay のカセット（JSONL、既定 {DEFAULT_CASSETTE.relative_to(ROOT)}）")
+    group.add_argument("--replay-latency", default="recorded",
+                       help="replay の遅延: recorded / fixed:S / uniform:A,B / lognormal:MEDIAN,SIGMA")
+    group.add_argument("--replay-error-rate", type=float, default=0.0,
+                       help="replay で 429/500/503 を注入する割合（0〜1）")
+    group.add_argument("--seed", type=int, default=0, help="replay の遅延・エラー注入の乱数シード")
+
+
+def provider_from_args(args, model_name: str, api_key: str = None) -> Provider:
+    try:
+        parse_latency(args.replay_latency)
+    except ValueError as e:
+        raise SystemExit(f"ERROR: {e}")
+    return make_provider(args.provider, model_name, api_key, args.cassette,
+                         args.replay_latency, args.replay_error_rate, args.seed)
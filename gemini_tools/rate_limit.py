@@ -0,0 +1,176 @@
+"""
+Gemini API 呼び出し用のトークンバケット・レートリミッター。
+
+プランごとの上限は api_rate_limits テーブル
+（supabase/migrations/20260414120000_api_keys_and_usage.sql）と同じ値を使う。
+
+  バケット  容量 burst_limit、毎秒 requests_per_minute / 60 トークン補充
+  分の窓    直近60秒の送信が requests_per_minute 回まで
+  日の窓    直近24時間の送信が requests_per_day 回まで
+
+窓は check_rate_limit（直近1分 / 直近1日の api_usage_log の件数）と同じ数え方で、バケットが
+満タンでも窓の上限を超えては送らない。バケットは連続して送れる回数（burst_limit）と
+平均の送信間隔を決め、分・日の上限は窓が守る。
+
+acquire() はバケットのトークンと両方の窓の枠を予約し、すべてが空くまで待つ。
+予約は呼び出し順に積まれるので、複数スレッド / タスクから呼んでも許可された最大レートで
+送信され、それより速くはならない。429 を受けたら pause() で以降の送信を止める。
+
+使い方:
+  limiter = RateLimiter.from_plan("pro")   # 省略時は GEMINI_RATE_PLAN 環境変数 or free
+  limiter.acquire()                        # 同期
+  await limiter.acquire_async()            # asyncio
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+
+class RatePlan(NamedTuple):
+    requests_per_minute: int
+    requests_per_day: int
+    burst_limit: int
+
+
+# api_rate_limits の初期データと同じ値
+PLANS = {
+    "free": RatePlan(10, 500, 20),
+    "pro": RatePlan(60, 5000, 100),
+    "internal": RatePlan(200, 50000, 500),
+}
+DEFAULT_PLAN = "free"
+PLAN_ENV = "GEMINI_RATE_PLAN"
+
+# 429 を受けたが Retry-After が分からないときの待ち時間（秒）
+DEFAULT_PAUSE = 60.0
+
+MINUTE = 60.0
+DAY = 86400.0
+
+
+class TokenBucket:
+    """容量 capacity、毎秒 rate トークン補充のバケット。満タンから始まる"""
+
+    def __init__(self, capacity: float, rate: float, clock=time.monotonic):
+        self.capacity = capacity
+        self.rate = rate
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """1トークンを予約し、使えるようになるまでの秒数を返す（トークンは負にもなる）"""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def drain(self, now: float, until: float = None) -> None:
+        """手持ちのトークンを捨て（予約済みの負債は残す）、until までは補充しない"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+        if until is not None and until > now:
+            # 補充の起点を until にずらす（それより前の予約は until までの分を負債として持つ）
+            self.updated = until
+
+
+class SlidingWindow:
+    """直近 window 秒の送信を limit 回までに抑える（送信予定時刻を覚えておく）"""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.sent = deque()
+
+    def ready_at(self, now: float) -> float:
+        """次に送ってよい最も早い時刻"""
+        while self.sent and self.sent[0] <= now - self.window:
+            self.sent.popleft()
+        if len(self.sent) < self.limit:
+            return now
+        return self.sent[-self.limit] + self.window
+
+    def record(self, at: float) -> None:
+        # 予約は呼び出し順に確定し、送信予定時刻は単調に増えるので末尾に足せばよい
+        self.sent.append(at)
+
+
+class RateLimiter:
+    """トークンバケットと分 / 日の窓で送信時刻を決める（スレッドセーフ）"""
+
+    def __init__(self, plan: RatePlan, name: str = "custom", clock=time.monotonic):
+        self.plan = plan
+        self.name = name
+        self.clock = clock
+        # 連続して送れる回数は burst_limit。分の上限は分の窓が守る
+        self.bucket = TokenBucket(plan.burst_limit, plan.requests_per_minute / MINUTE, clock)
+        self.minute = SlidingWindow(plan.requests_per_minute, MINUTE)
+        self.day = SlidingWindow(plan.requests_per_day, DAY)
+        self.not_before = 0.0
+        self.calls = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_plan(cls, name: str = None, clock=time.monotonic) -> "RateLimiter":
+        name = name or os.environ.get(PLAN_ENV) or DEFAULT_PLAN
+        if name not in PLANS:
+            raise ValueError(f"不明なレート制限プランです: {name}（{', '.join(PLANS)}）")
+        return cls(PLANS[name], name, clock)
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = self.clock()
+            send_at = max(now + self.bucket.reserve(now), self.minute.ready_at(now),
+                          self.day.ready_at(now), self.not_before)
+            self.minute.record(send_at)
+            self.day.record(send_at)
+            wait = send_at - now
+            self.calls += 1
+            self.waited += wait
+            return wait
+
+    def acquire(self) -> float:
+        """送信してよくなるまで待つ。待った秒数を返す"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        import asyncio
+
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float = DEFAULT_PAUSE) -> None:
+        """429 を受けたとき: seconds 秒は送信せず、その後もバーストさせない"""
+        with self._lock:
+            now = self.clock()
+            self.not_before = max(self.not_before, now + seconds)
+            self.bucket.drain(now, self.not_before)
+
+    def summary(self) -> dict:
+        return {
+            "plan": self.name,
+            "requests_per_minute": self.plan.requests_per_minute,
+            "requests_per_day": self.plan.requests_per_day,
+            "burst_limit": self.plan.burst_limit,
+            "calls": self.calls,
+            "waited_seconds": round(self.waited, 3),
+        }
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """google.api_core の ResourceExhausted（HTTP 429）かどうか"""
+    return (
+        getattr(exc, "code", None) == 429
+        or type(exc).__name__ in ("ResourceExhausted", "TooManyRequests")
+    )
@@ -0,0 +1,144 @@
+"""
+generate_content 応答のオンディスク・コンテンツアドレスキャッシュ。
+
+本番 API の suggestion_generation_cache テーブルと同じ考え方で、同じ入力への応答を使い回す。
+キーはモデル名 + プロンプト + 生成パラメーターのハッシュで、1エントリ1 JSON ファイル
+（<dir>/<key 先頭2文字>/<key>.json）に保存する。
+
+  TTL       作成から ttl 秒を過ぎたエントリはミス扱いにして削除する
+  LRU       ヒットのたびに mtime を更新し、合計サイズが max_bytes を超えたら
+            mtime の古い順に削除する
+  無効化    enabled=False（各スクリプトの --no-cache / GEMINI_NO_CACHE=1）で読み書きしない
+
+使い方:
+  cache = ResponseCache()
+  key = cache.key("gemini-1.5-flash", prompt, {"temperature": 0.7})
+  text = cache.get(key)
+  if text is None:
+      text = model.generate_content(prompt).text
+      cache.put(key, text)
+  print(cache.summary())
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CACHE_DIR = ROOT / ".cache" / "gemini-responses"
+CACHE_DIR_ENV = "GEMINI_CACHE_DIR"
+NO_CACHE_ENV = "GEMINI_NO_CACHE"
+CACHE_VERSION = 1
+
+DEFAULT_TTL = 7 * 86400
+DEFAULT_MAX_BYTES = 64 << 20
+
+
+class ResponseCache:
+    """generate_content の応答テキストのキャッシュ（スレッドセーフ）"""
+
+    def __init__(self, cache_dir: Path = None, enabled: bool = None,
+                 ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir or os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR)
+        if enabled is None:
+            enabled = os.environ.get(NO_CACHE_ENV, "") not in ("1", "true")
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        # key -> (size, mtime)。最初の put で走査して作る
+        self._index = None
+
+    @staticmethod
+    def key(model: str, prompt: str, params: dict = None) -> str:
+        payload = json.dumps(
+            {"v": CACHE_VERSION, "model": model, "prompt": prompt, "params": params or {}},
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str):
+        """キャッシュ済みの応答テキストを返す。無い・期限切れ・無効なら None"""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            if time.time() - entry.get("created_at", 0) > self.ttl:
+                self.expired += 1
+                self.misses += 1
+                self._remove(key, path)
+                return None
+            self.hits += 1
+            os.utime(path)
+            if self._index is not None and key in self._index:
+                self._index[key] = (self._index[key][0], time.time())
+        return entry["text"]
+
+    def put(self, key: str, text: str, **meta) -> None:
+        """応答を保存し、合計サイズが max_bytes を超えたら古いものから削除する"""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        data = json.dumps({"created_at": time.time(), "text": text, **meta}, ensure_ascii=False)
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                tmp.write_text(data, encoding="utf-8")
+                os.replace(tmp, path)
+            finally:
+                tmp.unlink(missing_ok=True)
+            index = self._load_index()
+            index[key] = (path.stat().st_size, time.time())
+            self._evict(index)
+
+    def _load_index(self) -> dict:
+        if self._index is None:
+            self._index = {}
+            for path in self.cache_dir.glob("*/*.json"):
+                st = path.stat()
+                self._index[path.stem] = (st.st_size, st.st_mtime)
+        return self._index
+
+    def _evict(self, index: dict) -> None:
+        total = sum(size for size, _ in index.values())
+        if total <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(index.items(), key=lambda kv: kv[1][1]):
+            if total <= self.max_bytes:
+                break
+            self._remove(key, self._path(key))
+            self.evicted += 1
+            total -= size
+
+    def _remove(self, key: str, path: Path) -> None:
+        path.unlink(missing_ok=True)
+        if self._index is not None:
+            self._index.pop(key, None)
+
+    def summary(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,69 @@
+"""
+相談・テスト実行の途中結果を1ステップ1行で追記する JSONL ログ。
+
+ステップが終わるたびに {"step", "ok", "result", "elapsed_seconds", "finished_at"} を1行書いて
+flush + fsync するので、途中で落ちてもそこまでの結果は残る。再開時は ok のステップだけを
+読み戻して飛ばす（エラーだったステップはやり直す）。書きかけで切れた最終行は、再開時に
+ファイルから切り詰めてから追記する（残すと次の行がつながって読めなくなる）。
+
+使い方:
+  log = ResultsLog(path, resume=True)
+  for step in steps:
+      if step in log.completed:
+          results[step] = log.completed[step]
+          continue
+      results[step] = run(step)
+      log.append(step, results[step], ok="error" not in results[step])
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+class ResultsLog:
+    def __init__(self, path, resume: bool = False):
+        self.path = Path(path)
+        self.completed = self._load() if resume else {}
+        if not resume:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text("", encoding="utf-8")
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        completed = {}
+        try:
+            with open(self.path, "r+b") as f:
+                data = f.read()
+                # 改行で終わっていない最終行は書きかけ。切り詰めて次の追記を行頭から始める
+                complete = data.rfind(b"\n") + 1
+                if complete < len(data):
+                    f.truncate(complete)
+        except FileNotFoundError:
+            return completed
+        for line in data[:complete].decode("utf-8", errors="replace").splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("ok"):
+                completed[entry["step"]] = entry["result"]
+        return completed
+
+    def append(self, step: str, result, ok: bool = True) -> None:
+        entry = {
+            "step": step,
+            "ok": ok,
+            "result": result,
+            "elapsed_seconds": round(time.perf_counter() - self.started, 3),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
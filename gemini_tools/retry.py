@@ -0,0 +1,305 @@
+"""
+Gemini 呼び出しのリトライ（指数バックオフ + ジッター）・呼び出し全体の期限・ヘッジリクエスト。
+
+  リトライ   429 / 408 / 5xx / タイムアウト / 接続エラーは max_attempts 回まで繰り返す。
+             待ち時間は full jitter（0〜min(max_delay, base_delay * 2^n) の一様乱数）
+  期限       deadline 秒で呼び出し全体（レート制限の待ち・リトライの待ちを含む）を打ち切り、
+             DeadlineExceeded を送出する
+  ヘッジ     1回目の応答が、同じキー（ステップ）の過去の所要時間の hedge_percentile 分位を
+             超えても返らなければ2本目を送り、先に返った方を使う。負けた方には cancel
+             （threading.Event）を立てるので、ストリーミングはチャンクの受信をやめる。
+             分位はキーごとに hedge_min_samples 件揃うまで決まらない（それまではヘッジしない）。
+             1回きりの実行では latency.extend(metrics.latency_history(run)) で過去の実行の
+             所要時間を読み込まないと、ヘッジは一度も送られない
+
+fn は送信の直前（レート制限を待った後）に check_cancel(cancel) を呼ぶ。期限切れ・ヘッジで
+負けた・close() された呼び出しは、まだ送っていなければそこで Cancelled になり、送信もしない。
+送信済みの同期 SDK の呼び出しは途中で止められないので、非ストリーミングは裏で完了まで走り、
+結果は捨てる（その分も API の利用量に数えられる）。期限・ヘッジの
+ある呼び出しはデーモンスレッドで送るので、置き去りの呼び出しがプロセスの終了を待たせることはない。
+close()（または with 文の終わり）で、まだ始まっていない呼び出しを取り消し、走っている
+呼び出しには cancel を立てる。
+
+使い方:
+  with ResilientCaller(RetryPolicy(max_attempts=4), deadline=120, hedge_percentile=0.95) as caller:
+      stats = {}
+      def attempt(cancel):
+          limiter.acquire()
+          check_cancel(cancel)          # 待っている間に不要になっていたら送らない
+          return provider.generate(prompt)
+      text = caller.call(attempt, key="safety", stats=stats)
+      stats  # {"attempts": 2, "hedged": False}
+"""
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import NamedTuple
+
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "InternalServerError", "ServiceUnavailable",
+    "BadGateway", "GatewayTimeout", "DeadlineExceeded",
+}
+_STATUS_PREFIX = re.compile(r"^\s*(\d{3})\b")
+
+DEFAULT_DEADLINE = 120.0
+# ヘッジの判断に使う過去の所要時間（キーごと）
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 5
+
+
+class RetryPolicy(NamedTuple):
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """呼び出し全体の期限（deadline）を過ぎた"""
+
+
+class Cancelled(Exception):
+    """送信する前に cancel が立った（期限切れ・ヘッジで負けた・close()）。リトライしない"""
+
+
+def check_cancel(cancel) -> None:
+    """cancel（threading.Event）が立っていれば Cancelled を送出する"""
+    if cancel is not None and cancel.is_set():
+        raise Cancelled("呼び出しは取り消されました")
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """一時的なエラー（429 / 408 / 5xx / タイムアウト / 接続エラー）かどうか"""
+    if isinstance(exc, (DeadlineExceeded, Cancelled)):
+        return False
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_CODES:
+        return True
+    if type(exc).__name__ in RETRYABLE_NAMES:
+        return True
+    match = _STATUS_PREFIX.match(str(exc))
+    return bool(match) and int(match.group(1)) in RETRYABLE_CODES
+
+
+def backoff_delay(attempt: int, policy: RetryPolicy, rng: random.Random) -> float:
+    """attempt 回目（0始まり）の失敗のあとに待つ秒数（full jitter）"""
+    return rng.uniform(0, min(policy.max_delay, policy.base_delay * (2 ** attempt)))
+
+
+class LatencyTracker:
+    """キーごとの直近の所要時間と分位点"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def extend(self, history: dict) -> None:
+        """{キー: [秒, ...]} をまとめて加える（過去の実行の計測レポートから読み込んだもの）"""
+        for key, samples in history.items():
+            for seconds in samples:
+                self.add(key, seconds)
+
+    def percentile(self, key: str, q: float, min_samples: int = HEDGE_MIN_SAMPLES):
+        """サンプルが min_samples 未満なら None"""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class ResilientCaller:
+    """fn(cancel) をリトライ・期限・ヘッジ付きで呼ぶ（スレッドセーフ）"""
+
+    def __init__(self, policy: RetryPolicy = RetryPolicy(), deadline: float = None,
+                 hedge_percentile: float = None, hedge_min_samples: int = HEDGE_MIN_SAMPLES,
+                 seed: int = None, sleep=time.sleep, clock=time.perf_counter, max_workers: int = 16):
+        self.policy = policy
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker()
+        self.sleep = sleep
+        self.clock = clock
+        self.max_workers = max_workers
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadlines = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # 同時に走らせる呼び出しの上限と、未完了の呼び出し（Future -> cancel）
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._inflight = {}
+        self._closed = False
+
+    def __enter__(self) -> "ResilientCaller":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """始まっていない呼び出しを取り消し、走っている呼び出しに cancel を立てる（完了は待たない）"""
+        with self._lock:
+            self._closed = True
+            inflight = list(self._inflight.items())
+        for future, cancel in inflight:
+            future.cancel()
+            cancel.set()
+
+    def call(self, fn, key: str = "", stats: dict = None):
+        """fn(cancel: threading.Event) の戻り値を返す。stats には attempts / hedged を入れる"""
+        stats = stats if stats is not None else {}
+        stats.update(attempts=0, hedged=False)
+        started = self.clock()
+        for attempt in range(self.policy.max_attempts):
+            remaining = None
+            if self.deadline is not None:
+                remaining = self.deadline - (self.clock() - started)
+                if remaining <= 0:
+                    self._deadline_exceeded(key)
+            stats["attempts"] = attempt + 1
+            try:
+                return self._attempt(fn, key, remaining, stats)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if not is_retryable(e) or attempt + 1 >= self.policy.max_attempts:
+                    raise
+                with self._lock:
+                    delay = backoff_delay(attempt, self.policy, self._rng)
+                    self.retries += 1
+                # 待っても期限内に次を送れないなら、元のエラーのまま終える
+                if remaining is not None and self.clock() - started + delay >= self.deadline:
+                    raise
+                self.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def _deadline_exceeded(self, key: str):
+        with self._lock:
+            self.deadlines += 1
+        raise DeadlineExceeded(f"{key or '呼び出し'} が期限 {self.deadline:.0f} 秒を過ぎました")
+
+    def _hedge_after(self, key: str):
+        if self.hedge_percentile is None:
+            return None
+        return self.latency.percentile(key, self.hedge_percentile, self.hedge_min_samples)
+
+    def _submit(self, fn, cancel: threading.Event) -> Future:
+        """fn(cancel) をデーモンスレッドで呼ぶ（同時に max_workers 本まで）"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ResilientCaller は close() 済みです")
+            self._inflight[future] = cancel
+
+        def run():
+            try:
+                with self._slots:
+                    if not future.set_running_or_notify_cancel():
+                        return
+                    try:
+                        # 枠を待っている間に不要になった呼び出しは始めない
+                        check_cancel(cancel)
+                        value = fn(cancel)
+                    except BaseException as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(value)
+            finally:
+                with self._lock:
+                    self._inflight.pop(future, None)
+
+        threading.Thread(target=run, name="gemini-call", daemon=True).start()
+        return future
+
+    def _attempt(self, fn, key: str, timeout: float, stats: dict):
+        hedge_after = self._hedge_after(key)
+        started = self.clock()
+        if timeout is None and hedge_after is None:
+            # 期限もヘッジも無ければ呼び出し元のスレッドでそのまま呼ぶ
+            value = fn(threading.Event())
+            self.latency.add(key, self.clock() - started)
+            return value
+
+        primary = threading.Event()
+        futures = {self._submit(fn, primary): primary}
+        hedge = None
+        while True:
+            elapsed = self.clock() - started
+            waits = []
+            if timeout is not None:
+                waits.append(timeout - elapsed)
+            if hedge_after is not None and hedge is None:
+                waits.append(hedge_after - elapsed)
+            done, _ = wait(futures, timeout=max(0.0, min(waits)) if waits else None,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                cancel = futures.pop(future)
+                if future.exception() is None or not futures:
+                    for other in futures.values():
+                        other.set()
+                    if future.exception() is None:
+                        self.latency.add(key, self.clock() - started)
+                        if cancel is hedge:
+                            with self._lock:
+                                self.hedge_wins += 1
+                    return future.result()
+                # 片方だけ失敗: もう片方を待つ
+
+            elapsed = self.clock() - started
+            if timeout is not None and elapsed >= timeout:
+                for cancel in futures.values():
+                    cancel.set()
+                self._deadline_exceeded(key)
+            if hedge_after is not None and hedge is None and elapsed >= hedge_after:
+                hedge = threading.Event()
+                futures[self._submit(fn, hedge)] = hedge
+                stats["hedged"] = True
+                with self._lock:
+                    self.hedges += 1
+
+    def summary(self) -> dict:
+        return {
+            "max_attempts": self.policy.max_attempts,
+            "deadline_seconds": self.deadline,
+            "hedge_percentile": self.hedge_percentile,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "deadlines_exceeded": self.deadlines,
+        }
+
+
+def add_retry_args(parser) -> None:
+    """--max-attempts / --deadline / --hedge-percentile を追加する"""
+    group = parser.add_argument_group("リトライ・期限・ヘッジ")
+    group.add_argument("--max-attempts", type=int, default=RetryPolicy().max_attempts,
+                       help="429 / 5xx などの一時的なエラーで試す最大回数（1 でリトライしない）")
+    group.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE,
+                       help=f"1呼び出しの期限（秒、リトライの待ちを含む。0 で無制限。既定 {DEFAULT_DEADLINE:.0f}）")
+    group.add_argument("--hedge-percentile", type=float, default=None,
+                       help="応答が同じステップの過去の所要時間のこの分位（例 0.95）を超えたら"
+                            "2本目を送る。過去の所要時間は計測レポートから読み、ステップごとに"
+                            f"{HEDGE_MIN_SAMPLES} 件揃うまではヘッジしない（既定: ヘッジしない）")
+
+
+def caller_from_args(args, seed: int = None) -> ResilientCaller:
+    if args.max_attempts < 1:
+        raise SystemExit("ERROR: --max-attempts は1以上を指定してください")
+    if args.hedge_percentile is not None and not 0 < args.hedge_percentile < 1:
+        raise SystemExit("ERROR: --hedge-percentile は 0 と 1 の間で指定してください")
+    return ResilientCaller(RetryPolicy(max_attempts=args.max_attempts),
+                           deadline=args.deadline or None,
+                           hedge_percentile=args.hedge_percentile, seed=seed)
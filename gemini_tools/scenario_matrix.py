@@ -0,0 +1,95 @@
+"""
+年齢層 × 場面 × 時間（duration）のシナリオ行列を、セルごとに生成・採点して結果を流す。
+
+セルはワーカープール（スレッド）で並行に処理する。レート制限・キャッシュ・リトライは
+generate の呼び出し側の経路に任せる。セルが終わるたびに結果ログ（ResultsLog、JSONL）へ
+1行追記するので、途中で落ちても終わったセルは残り、resume ではそれらを飛ばす。
+
+使い方:
+  cells = matrix_cells({"student": ["studying", "home"]}, durations=(5, 15))
+  log = ResultsLog("matrix.jsonl")
+  results = run_matrix(cells, generate, score, log, workers=4)
+  # generate(cell) -> (応答テキスト, ステータス)、score(cell, 応答) -> dict
+  summarize(cells, results, totals=("valid", "invalid"))   # 年齢層ごとの集計
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple
+
+from gemini_tools.suggestion_stream import DURATIONS
+
+DEFAULT_WORKERS = 4
+
+
+class Cell(NamedTuple):
+    age_group: str
+    situation: str
+    duration: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.age_group}/{self.situation}/{self.duration}"
+
+
+def matrix_cells(scenarios: dict, durations=DURATIONS) -> list:
+    """{年齢層: [場面, ...]} と duration の全組み合わせ（年齢層・場面・duration の順）"""
+    return [Cell(age_group, situation, duration)
+            for age_group, situations in scenarios.items()
+            for situation in situations
+            for duration in durations]
+
+
+def run_matrix(cells: list, generate, score, log=None, workers: int = DEFAULT_WORKERS,
+               ok=None, on_cell=None) -> dict:
+    """各セルを生成・採点し、{セルのキー: 結果} を cells の順で返す
+
+    結果は score の戻り値に status（generate のステータス）を加えたもの。生成が例外になった
+    セルは {"status": "error", "error": ...}。ok(結果) が真のセルを結果ログで完了扱いにする
+    （既定はエラーでないもの）。on_cell(cell, 結果) は終わった順に呼ぶ。
+    """
+    ok = ok or (lambda result: result.get("status") != "error")
+    results = {}
+    pending = []
+    for cell in cells:
+        if log is not None and cell.key in log.completed:
+            results[cell.key] = log.completed[cell.key]
+        else:
+            pending.append(cell)
+
+    def one(cell: Cell) -> dict:
+        try:
+            text, status = generate(cell)
+        except Exception as e:
+            return {"status": "error", "error": str(e)}
+        return {"status": status, **score(cell, text)}
+
+    if pending:
+        with ThreadPoolExecutor(max(1, min(workers, len(pending))),
+                                thread_name_prefix="scenario-cell") as pool:
+            futures = {pool.submit(one, cell): cell for cell in pending}
+            for future in as_completed(futures):
+                cell = futures[future]
+                result = future.result()
+                results[cell.key] = result
+                if log is not None:
+                    log.append(cell.key, result, ok=ok(result))
+                if on_cell:
+                    on_cell(cell, result)
+    return {cell.key: results[cell.key] for cell in cells}
+
+
+def summarize(cells: list, results: dict, totals=()) -> dict:
+    """年齢層ごとに、場面・セル数・エラー数と、totals に挙げた数値の項目の合計を集計する"""
+    summary = {}
+    for cell in cells:
+        entry = summary.setdefault(cell.age_group, {"situations": [], "cells": 0, "errors": 0,
+                                                    **{name: 0 for name in totals}})
+        if cell.situation not in entry["situations"]:
+            entry["situations"].append(cell.situation)
+        entry["cells"] += 1
+        result = results[cell.key]
+        if result.get("status") == "error":
+            entry["errors"] += 1
+            continue
+        for name in totals:
+            entry[name] += result.get(name, 0)
+    return summary
@@ -0,0 +1,29 @@
+"""
+google.generativeai の遅延読み込み。
+
+SDK は import だけで数百ミリ秒かかり、configure() は API キーを要求するので、モジュールの
+読み込み時には触らない。実際に API を呼ぶ経路で初めて load_genai() を呼び、import と
+configure を1回だけ行う。モック・ドライラン経路は SDK を読み込まない。
+"""
+import os
+import sys
+
+SDK_MODULE = "google.generativeai"
+API_KEY_ENV = "GEMINI_API_KEY"
+
+_genai = None
+
+
+def load_genai(api_key: str = None):
+    """SDK を import して configure 済みのモジュールを返す（2回目以降は同じものを返す）"""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=api_key or os.environ.get(API_KEY_ENV))
+        _genai = genai
+    return _genai
+
+
+def sdk_loaded() -> bool:
+    """SDK がこのプロセスに読み込まれているか（ベンチマーク・確認用）"""
+    return SDK_MODULE in sys.modules
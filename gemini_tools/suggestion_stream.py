@@ -0,0 +1,190 @@
+"""
+モデル応答から提案オブジェクトを逐次取り出すストリーミング JSON パーサー。
+
+応答テキストを届いた順に feed() し、配列要素のオブジェクト（[{...}, {...}] や
+{"suggestions": [{...}]} の各要素）を閉じ括弧が来た時点で1件ずつ返す。コンテナの外にある
+テキスト（コードブロック記法の ``` や前後の説明文）は読み飛ばし、文字列中の括弧は数えない。
+1件の解析に失敗しても、その要素を捨てて次の要素から続ける。
+
+取り出したオブジェクトは validate_suggestion() で suggestions_master の制約
+（title / description 必須、duration は 5/15/30、category は 認知的/行動的、steps / tags は
+文字列配列）に
+照らして generate-seed.py の行と同じ形に揃えるので、応答の受信中からシードへ流せる。
+
+使い方:
+  parser = SuggestionStreamParser(defaults={"duration": 5, "situation": ["studying"]})
+  for chunk in response:                       # generate_content(stream=True)
+      for row in parser.feed(chunk.text):      # 検証済みの行
+          ...
+  parser.close()
+  print(parser.summary())
+"""
+import json
+
+DURATIONS = (5, 15, 30)
+CATEGORIES = ("認知的", "行動的")
+# generate-seed.py の CATEGORY_MAP と同じ対応
+CATEGORY_MAP = {"cognitive": "認知的", "behavioral": "行動的"}
+SOURCE = "ai"
+
+
+def validate_suggestion(obj, defaults: dict = None):
+    """(row, errors) を返す。errors が空でなければ row は None"""
+    defaults = defaults or {}
+    if not isinstance(obj, dict):
+        return None, ["オブジェクトではありません"]
+    errors = []
+
+    title = obj.get("title")
+    if not isinstance(title, str) or not title.strip():
+        errors.append("title がありません")
+    description = obj.get("description")
+    if not isinstance(description, str) or not description.strip():
+        errors.append("description がありません")
+
+    duration = obj.get("duration", defaults.get("duration"))
+    if isinstance(duration, str) and duration.strip().isdigit():
+        duration = int(duration)
+    elif isinstance(duration, float) and duration.is_integer():
+        duration = int(duration)
+    if duration not in DURATIONS or isinstance(duration, bool):
+        errors.append(f"duration が {'/'.join(map(str, DURATIONS))} ではありません: {duration!r}")
+
+    category = obj.get("category")
+    category = CATEGORY_MAP.get(category, category)
+    if category not in CATEGORIES:
+        errors.append(f"category が {' / '.join(CATEGORIES)} ではありません: {category!r}")
+
+    steps = obj.get("steps", [])
+    if not isinstance(steps, list) or not all(isinstance(s, str) and s.strip() for s in steps):
+        errors.append("steps が文字列の配列ではありません")
+
+    tags = obj.get("tags") or defaults.get("tags", [])
+    if not isinstance(tags, list) or not all(isinstance(t, str) and t.strip() for t in tags):
+        errors.append("tags が文字列の配列ではありません")
+
+    guide = obj.get("guide")
+    if guide is not None and not isinstance(guide, str):
+        errors.append("guide が文字列ではありません")
+
+    if errors:
+        return None, errors
+    return {
+        "title": title.strip(),
+        "description": description.strip(),
+        "duration": duration,
+        "category": category,
+        "situation": list(defaults.get("situation", [])),
+        "age_groups": list(defaults.get("age_groups", [])),
+        "tags": [t.strip() for t in tags],
+        "steps": [s.strip() for s in steps],
+        "guide": guide or "",
+        "source": SOURCE,
+    }, []
+
+
+class SuggestionStreamParser:
+    """feed() されたテキストから配列要素のオブジェクトを逐次取り出す"""
+
+    def __init__(self, defaults: dict = None, validate: bool = True):
+        self.defaults = defaults or {}
+        self.validate = validate
+        self._buf = ""
+        self._pos = 0           # _buf 内の次に読む位置
+        self._stack = []        # 開いているコンテナ（"{" / "["）
+        self._start = None      # 取り出し中のオブジェクトの開始位置（_buf 内）
+        self._start_depth = 0
+        self._in_string = False
+        self._escape = False
+        self.emitted = 0
+        self.invalid = []       # [(オブジェクト or 生テキスト, エラー一覧)]
+
+    def feed(self, text: str) -> list:
+        """text を追加し、閉じ終わったオブジェクトのリストを返す（検証有効時は行、無効時は dict）
+
+        戻り値を読まなくても text は最後まで解析され、emitted / invalid も更新される。
+        """
+        return list(self._scan(text))
+
+    def _scan(self, text: str):
+        self._buf += text
+        buf = self._buf
+        stack = self._stack
+        i = self._pos
+        n = len(buf)
+        while i < n:
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                # コンテナの外（説明文）の引用符は文字列として扱わない
+                if stack:
+                    self._in_string = True
+            elif ch == "[" or ch == "{":
+                if ch == "{" and self._start is None and stack and stack[-1] == "[":
+                    self._start = i
+                    self._start_depth = len(stack)
+                stack.append(ch)
+            elif ch == "]" or ch == "}":
+                if stack and stack[-1] == ("[" if ch == "]" else "{"):
+                    stack.pop()
+                    if ch == "}" and self._start is not None and len(stack) == self._start_depth:
+                        yield from self._emit(buf[self._start:i + 1])
+                        self._start = None
+                elif stack:
+                    # 対応しない閉じ括弧: 説明文中の括弧だったとみなして状態を捨てる
+                    stack.clear()
+                    self._start = None
+            i += 1
+        # 取り出し中の要素より前は捨てる
+        keep = self._start if self._start is not None else i
+        self._buf = buf[keep:]
+        self._pos = i - keep
+        if self._start is not None:
+            self._start = 0
+
+    def _emit(self, raw: str):
+        try:
+            obj = json.loads(raw)
+        except ValueError as e:
+            self.invalid.append((raw, [f"JSON として解析できません: {e}"]))
+            return
+        if not self.validate:
+            self.emitted += 1
+            yield obj
+            return
+        row, errors = validate_suggestion(obj, self.defaults)
+        if errors:
+            self.invalid.append((obj, errors))
+            return
+        self.emitted += 1
+        yield row
+
+    def close(self) -> None:
+        """ストリームの終わり。閉じられずに切れた要素があれば invalid に記録する"""
+        if self._start is not None:
+            self.invalid.append((self._buf, ["応答が途中で切れています"]))
+        self._buf = ""
+        self._pos = 0
+        self._start = None
+        self._stack.clear()
+
+    def summary(self) -> dict:
+        return {
+            "valid": self.emitted,
+            "invalid": len(self.invalid),
+            "errors": [errors for _, errors in self.invalid],
+        }
+
+
+def parse_suggestions(text: str, defaults: dict = None):
+    """応答テキスト全体から (行のリスト, summary) を返す"""
+    parser = SuggestionStreamParser(defaults)
+    rows = parser.feed(text)
+    parser.close()
+    return rows, parser.summary()
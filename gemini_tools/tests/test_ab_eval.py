@@ -0,0 +1,74 @@
+"""gemini_tools.ab_eval: 逐次統計・採点の取り出し・A/B 実行"""
+import asyncio
+import math
+import statistics
+
+import pytest
+
+import gemini_consultation
+from gemini_tools.ab_eval import RunningStats, parse_scores, run_ab, t_critical
+
+
+def test_running_stats_matches_statistics():
+    values = [3.0, 4.5, 2.0, 5.0, 4.0]
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    assert stats.mean == pytest.approx(statistics.mean(values))
+    assert stats.std == pytest.approx(statistics.stdev(values))
+    assert stats.half_width() == pytest.approx(2.776 * statistics.stdev(values) / math.sqrt(5))
+    low, high = stats.to_dict()["ci95"]
+    assert low < stats.mean < high
+
+
+def test_single_sample_has_no_interval():
+    stats = RunningStats()
+    stats.add(1.0)
+    assert math.isinf(stats.half_width())
+    assert stats.to_dict()["ci95"] is None
+
+
+def test_t_critical():
+    assert t_critical(1) == 12.706
+    assert t_critical(11) == 2.228       # 表に無い自由度は下の値
+    assert t_critical(500) == 1.960
+
+
+def test_parse_scores():
+    text = '```json\n{"differentiation_score": 8, "friendliness_score": "7.5", "note": "x", "flag": true}\n```'
+    assert parse_scores(text, ["differentiation_score", "friendliness_score", "note", "flag", "missing"]) == {
+        "differentiation_score": 8.0, "friendliness_score": 7.5,
+    }
+    assert parse_scores("採点できません", ["a"]) == {}
+
+
+def test_run_ab_collects_scores_and_errors():
+    async def generate(variant, prompt, i):
+        if variant == "student" and i == 2:
+            raise RuntimeError("503")
+        await asyncio.sleep(0)
+        return f"{prompt}-{i}"
+
+    async def judge(i, texts):
+        return {"differentiation_score": float(i)}
+
+    seen = []
+    report = asyncio.run(run_ab({"current": "c", "student": "s"}, samples=4, generate=generate,
+                                judge=judge, score=lambda variant, text: {"length": len(text)},
+                                window=2, on_sample=lambda r: seen.append(r.completed)))
+    data = report.to_dict()
+    assert data["completed"] == 4 and seen == [1, 2, 3, 4]
+    assert data["generation_errors"] == {"current": 0, "student": 1}
+    # 両方揃わなかったサンプルは judge しない
+    assert data["judge"]["differentiation_score"]["n"] == 3
+    assert data["judge"]["differentiation_score"]["mean"] == round((0 + 1 + 3) / 3, 4)
+    assert data["local"]["current"]["length"]["n"] == 4
+    assert [row["sample"] for row in data["rows"]] == [0, 1, 2, 3]
+
+
+def test_ab_samples_cannot_be_combined_with_batching(capsys):
+    with pytest.raises(SystemExit):
+        gemini_consultation.parse_args(["--ab-samples", "5", "--batch-size", "3"])
+    assert "--batch-size" in capsys.readouterr().err
+    args = gemini_consultation.parse_args(["--ab-samples", "5"])
+    assert args.ab_samples == 5 and args.batch_size == 1
@@ -0,0 +1,49 @@
+"""gemini_tools.metrics: トークン概算と送信回数ごとのコスト"""
+import pytest
+
+from gemini_tools.metrics import CallMetrics, estimate_cost, estimate_tokens
+
+MODEL = "gemini-1.5-pro"
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+    assert estimate_tokens("深呼吸") == 3
+
+
+def test_single_call_cost():
+    call = CallMetrics("t", MODEL).record("s", "あ" * 100, "い" * 10)
+    assert call["sent"] == 1
+    assert call["cost_usd"] == pytest.approx(estimate_cost(MODEL, 100, 10))
+
+
+def test_cost_counts_every_attempt_sent():
+    metrics = CallMetrics("t", MODEL)
+    # 429 で1回やり直し、2回目はヘッジも送った: 3回送信、応答が返ったのは2回
+    call = metrics.record("s", "あ" * 100, "い" * 10, retries=1, hedged=True, sent=3)
+    assert call["cost_usd"] == pytest.approx(estimate_cost(MODEL, 300, 20))
+    assert metrics.totals()["cost_usd"] == pytest.approx(call["cost_usd"], abs=1e-6)
+
+
+def test_error_and_cache_hit_cost():
+    metrics = CallMetrics("t", MODEL)
+    error = metrics.record("s", "あ" * 100, retries=1, error=RuntimeError("503"), sent=2)
+    assert error["cost_usd"] == pytest.approx(estimate_cost(MODEL, 200, 0))
+    assert metrics.record("s", "あ" * 100, wall_seconds=1.0, error=RuntimeError("x"), sent=0)["cost_usd"] == 0
+    hit = metrics.record("s", "あ" * 100, "い" * 10, cached=True)
+    assert hit["sent"] == 0 and hit["cost_usd"] == 0
+
+
+def test_report_and_prometheus(tmp_path):
+    metrics = CallMetrics("t", MODEL)
+    metrics.record("safety", "p", "r", wall_seconds=0.3)
+    metrics.record("safety", "p", "r", cached=True)
+    report = metrics.report()
+    assert report["steps"]["safety"]["calls"] == 2
+    assert report["steps"]["safety"]["cache_hits"] == 1
+    assert 'gemini_calls_total{run="t",model="gemini-1.5-pro",step="safety",outcome="cache_hit"} 1' \
+        in metrics.prometheus()
+    json_path, prom_path = metrics.export(tmp_path)
+    assert json_path.exists() and prom_path.exists()
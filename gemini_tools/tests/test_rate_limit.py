@@ -0,0 +1,90 @@
+"""gemini_tools.rate_limit: 時計を差し替えて送信時刻を確かめる"""
+import pytest
+
+from gemini_tools import rate_limit
+from gemini_tools.providers import ProviderError
+from gemini_tools.rate_limit import (
+    DAY, MINUTE, RateLimiter, RatePlan, SlidingWindow, TokenBucket, is_rate_limit_error,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "sleep", clock.sleep)
+    return clock
+
+
+def send_times(limiter, clock, n):
+    times = []
+    for _ in range(n):
+        limiter.acquire()
+        times.append(clock.now)
+    return times
+
+
+def max_in_window(times, window):
+    return max(sum(1 for t in times if start <= t < start + window) for start in times)
+
+
+def test_bucket_is_sized_from_burst_limit(clock):
+    limiter = RateLimiter(RatePlan(600, 100000, 5), clock=clock)
+    times = send_times(limiter, clock, 8)
+    # 5回は続けて送り、その後は 600/分 = 0.1 秒ごと
+    assert times[:5] == [1000.0] * 5
+    assert times[5:] == pytest.approx([1000.1, 1000.2, 1000.3])
+
+
+@pytest.mark.parametrize("plan", sorted(rate_limit.PLANS))
+def test_plans_never_exceed_the_minute_limit(clock, plan):
+    limiter = RateLimiter.from_plan(plan, clock=clock)
+    rpm = rate_limit.PLANS[plan].requests_per_minute
+    times = send_times(limiter, clock, rpm * 3)
+    assert max_in_window(times, MINUTE) == rpm
+
+
+def test_day_limit(clock):
+    limiter = RateLimiter(RatePlan(60, 100, 100), clock=clock)
+    times = send_times(limiter, clock, 101)
+    assert times[-1] >= times[0] + DAY
+
+
+def test_pause_delays_and_stops_burst(clock):
+    limiter = RateLimiter(RatePlan(60, 1000, 10), clock=clock)
+    limiter.pause(30)
+    times = send_times(limiter, clock, 3)
+    # 止めている間はトークンを貯めないので、再開後もバーストせず 1 秒ごと
+    assert times == pytest.approx([1031.0, 1032.0, 1033.0])
+
+
+def test_token_bucket_and_window():
+    bucket = TokenBucket(2, 1.0, clock=lambda: 0.0)
+    assert [bucket.reserve(0.0) for _ in range(3)] == [0.0, 0.0, 1.0]
+    window = SlidingWindow(2, 10.0)
+    for at in (0.0, 1.0):
+        assert window.ready_at(at) == at
+        window.record(at)
+    assert window.ready_at(2.0) == 10.0
+
+
+def test_from_plan_rejects_unknown_plan():
+    with pytest.raises(ValueError):
+        RateLimiter.from_plan("enterprise")
+
+
+def test_is_rate_limit_error():
+    assert is_rate_limit_error(ProviderError(429, "Resource exhausted"))
+    assert not is_rate_limit_error(ProviderError(503, "unavailable"))
+    # メッセージに 429 が含まれるだけのエラーは 429 ではない
+    assert not is_rate_limit_error(ValueError("request 4291 failed"))
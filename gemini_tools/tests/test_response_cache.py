@@ -0,0 +1,72 @@
+"""gemini_tools.response_cache: ヒット・TTL・LRU・無効化"""
+import itertools
+
+import pytest
+
+from gemini_tools import response_cache
+from gemini_tools.response_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(response_cache.time, "time", lambda: float(next(ticks)))
+
+
+def test_key_depends_on_model_prompt_and_params():
+    key = ResponseCache.key("m", "p", {"temperature": 0.7})
+    assert key == ResponseCache.key("m", "p", {"temperature": 0.7})
+    assert len({key, ResponseCache.key("m2", "p"), ResponseCache.key("m", "p2"),
+                ResponseCache.key("m", "p", {"temperature": 0.2})}) == 4
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ResponseCache(tmp_path, enabled=True)
+    key = cache.key("m", "p")
+    assert cache.get(key) is None
+    cache.put(key, "応答", model="m")
+    assert cache.get(key) == "応答"
+    # 別のインスタンス（別プロセス）からも読める
+    assert ResponseCache(tmp_path, enabled=True).get(key) == "応答"
+    assert cache.summary() == {"enabled": True, "hits": 1, "misses": 1, "hit_rate": 0.5,
+                               "expired": 0, "evicted": 0}
+
+
+def test_expired_entry_is_removed(tmp_path, clock):
+    # 時計は呼ぶたびに1秒進む
+    cache = ResponseCache(tmp_path, enabled=True, ttl=0.5)
+    key = cache.key("m", "p")
+    cache.put(key, "古い")
+    assert cache.get(key) is None
+    assert cache.expired == 1
+    assert not list(tmp_path.glob("*/*.json"))
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path, clock):
+    cache = ResponseCache(tmp_path, enabled=True, max_bytes=10_000)
+    keys = [cache.key("m", str(i)) for i in range(3)]
+    text = "x" * 4000
+    cache.put(keys[0], text)
+    cache.put(keys[1], text)
+    assert cache.get(keys[0]) == text          # 0 を最近使った
+    cache.put(keys[2], text)                   # 合計が上限を超える
+    assert cache.evicted == 1
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == text and cache.get(keys[2]) == text
+
+
+def test_disabled_cache_does_not_touch_disk(tmp_path, monkeypatch):
+    monkeypatch.setenv(response_cache.NO_CACHE_ENV, "1")
+    cache = ResponseCache(tmp_path / "cache")
+    assert not cache.enabled
+    cache.put("k", "v")
+    assert cache.get("k") is None
+    assert not (tmp_path / "cache").exists()
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = ResponseCache(tmp_path, enabled=True)
+    key = cache.key("m", "p")
+    cache.put(key, "v")
+    next(tmp_path.glob("*/*.json")).write_text("{", encoding="utf-8")
+    assert cache.get(key) is None
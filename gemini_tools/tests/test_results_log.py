@@ -0,0 +1,40 @@
+"""gemini_tools.results_log: 追記と再開"""
+import json
+
+from gemini_tools.results_log import ResultsLog
+
+
+def test_resume_skips_only_ok_steps(tmp_path):
+    path = tmp_path / "log.jsonl"
+    log = ResultsLog(path)
+    log.append("a", {"value": 1})
+    log.append("b", {"error": "x"}, ok=False)
+    assert ResultsLog(path, resume=True).completed == {"a": {"value": 1}}
+
+
+def test_new_log_truncates_previous_run(tmp_path):
+    path = tmp_path / "log.jsonl"
+    ResultsLog(path).append("a", 1)
+    assert ResultsLog(path).completed == {}
+    assert path.read_text(encoding="utf-8") == ""
+
+
+def test_resume_after_truncated_last_line(tmp_path):
+    path = tmp_path / "log.jsonl"
+    ResultsLog(path).append("a", 1)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"step": "b", "ok": tr')      # 書き込み中に落ちた
+
+    log = ResultsLog(path, resume=True)
+    assert log.completed == {"a": 1}
+    log.append("b", 2)
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["step"] for line in lines] == ["a", "b"]
+    assert ResultsLog(path, resume=True).completed == {"a": 1, "b": 2}
+
+
+def test_resume_without_file(tmp_path):
+    log = ResultsLog(tmp_path / "missing.jsonl", resume=True)
+    assert log.completed == {}
+    log.append("a", 1)
+    assert ResultsLog(log.path, resume=True).completed == {"a": 1}
@@ -0,0 +1,160 @@
+"""gemini_tools.retry: 期限・ヘッジ・リトライをスタブの fn で確かめる"""
+import threading
+import time
+
+import pytest
+
+from gemini_tools.providers import ProviderError
+from gemini_tools.retry import (
+    Cancelled, DeadlineExceeded, ResilientCaller, RetryPolicy, check_cancel, is_retryable,
+)
+
+
+def no_sleep(seconds):
+    pass
+
+
+def test_deadline_raises_and_cancels_the_attempt():
+    cancelled = threading.Event()
+
+    def slow(cancel):
+        cancel.wait(5)
+        if cancel.is_set():
+            cancelled.set()
+        return "late"
+
+    with ResilientCaller(deadline=0.2) as caller:
+        started = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            caller.call(slow, key="slow")
+        assert time.perf_counter() - started < 1.0
+        assert cancelled.wait(1.0)
+        assert caller.deadlines == 1
+
+
+def test_attempt_cancelled_while_waiting_is_not_sent():
+    sent = []
+    gate = threading.Event()
+
+    def attempt(cancel):
+        gate.wait(5)              # レート制限の待ちの代わり
+        check_cancel(cancel)
+        sent.append(True)
+        return "sent"
+
+    with ResilientCaller(deadline=0.1) as caller:
+        with pytest.raises(DeadlineExceeded):
+            caller.call(attempt)
+        gate.set()
+        time.sleep(0.1)
+    assert sent == []
+
+
+def test_hedge_loser_is_not_sent():
+    sent = []
+    calls = []
+    lock = threading.Lock()
+
+    def attempt(cancel):
+        with lock:
+            calls.append(cancel)
+            first = len(calls) == 1
+        if first:
+            # 1本目は送る前に長く待たされる（ヘッジに負ける）
+            cancel.wait(2)
+        check_cancel(cancel)
+        sent.append("primary" if first else "hedge")
+        return "hedge" if not first else "primary"
+
+    with ResilientCaller(hedge_percentile=0.5) as caller:
+        for _ in range(5):
+            caller.latency.add("step", 0.05)
+        stats = {}
+        assert caller.call(attempt, key="step", stats=stats) == "hedge"
+        assert stats["hedged"] is True
+        assert calls[0].wait(1.0)
+        time.sleep(0.05)
+    assert sent == ["hedge"]
+    assert caller.hedges == 1 and caller.hedge_wins == 1
+
+
+def test_no_hedge_without_enough_samples():
+    with ResilientCaller(hedge_percentile=0.5) as caller:
+        caller.latency.add("step", 0.01)
+        stats = {}
+        assert caller.call(lambda cancel: "ok", key="step", stats=stats) == "ok"
+    assert stats == {"attempts": 1, "hedged": False}
+
+
+def test_retries_on_429():
+    failures = [ProviderError(429, "Resource exhausted"), ProviderError(503, "unavailable")]
+
+    def attempt(cancel):
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    caller = ResilientCaller(RetryPolicy(max_attempts=3), sleep=no_sleep, seed=0)
+    stats = {}
+    assert caller.call(attempt, stats=stats) == "ok"
+    assert stats["attempts"] == 3
+    assert caller.retries == 2
+
+
+def test_gives_up_after_max_attempts():
+    def attempt(cancel):
+        raise ProviderError(429, "Resource exhausted")
+
+    caller = ResilientCaller(RetryPolicy(max_attempts=2), sleep=no_sleep)
+    with pytest.raises(ProviderError):
+        caller.call(attempt)
+    assert caller.retries == 1
+
+
+def test_non_retryable_error_is_raised_immediately():
+    calls = []
+
+    def attempt(cancel):
+        calls.append(1)
+        raise ProviderError(400, "bad request")
+
+    with pytest.raises(ProviderError):
+        ResilientCaller(RetryPolicy(max_attempts=4), sleep=no_sleep).call(attempt)
+    assert calls == [1]
+
+
+def test_is_retryable():
+    assert is_retryable(ProviderError(429, "x"))
+    assert is_retryable(TimeoutError())
+    assert is_retryable(RuntimeError("503 Service Unavailable"))
+    assert not is_retryable(ValueError("bad"))
+    assert not is_retryable(Cancelled())
+    assert not is_retryable(DeadlineExceeded())
+
+
+def test_call_after_close_raises():
+    caller = ResilientCaller(deadline=1.0)
+    caller.close()
+    with pytest.raises(RuntimeError):
+        caller.call(lambda cancel: "ok")
+
+
+def test_latency_history_lets_a_single_run_hedge(tmp_path):
+    from gemini_tools.metrics import CallMetrics, latency_history
+
+    for n in range(5):
+        metrics = CallMetrics("consultation", "gemini-1.5-pro")
+        metrics.started_at = metrics.started_at.replace(second=n)
+        metrics.record("safety", "p", "r", wall_seconds=0.05)
+        metrics.record("safety", "p", wall_seconds=9.0, error=RuntimeError("x"))
+        metrics.record("safety", "p", "r", wall_seconds=9.0, retries=1)
+        metrics.export(tmp_path)
+    (tmp_path / "consultation-broken.json").write_text("{", encoding="utf-8")
+
+    history = latency_history("consultation", tmp_path)
+    assert history == {"safety": [0.05] * 5}
+
+    caller = ResilientCaller(hedge_percentile=0.5)
+    assert caller._hedge_after("safety") is None
+    caller.latency.extend(history)
+    assert caller._hedge_after("safety") == 0.05
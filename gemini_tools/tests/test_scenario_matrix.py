@@ -0,0 +1,71 @@
+"""gemini_tools.scenario_matrix と、モックでのシナリオ行列の実行（コミットごとに回す）"""
+import json
+import time
+
+import pytest
+
+import age_group_implementation_test as phase_a1
+from gemini_tools.results_log import ResultsLog
+from gemini_tools.scenario_matrix import matrix_cells, run_matrix, summarize
+
+
+def test_matrix_cells_order():
+    cells = matrix_cells({"student": ["studying", "home"], "elderly": ["home"]}, durations=(5, 15))
+    assert [cell.key for cell in cells] == [
+        "student/studying/5", "student/studying/15", "student/home/5", "student/home/15",
+        "elderly/home/5", "elderly/home/15",
+    ]
+
+
+def test_run_matrix_logs_cells_and_resumes(tmp_path):
+    cells = matrix_cells({"student": ["studying", "home"]}, durations=(5,))
+    generated = []
+
+    def generate(cell):
+        generated.append(cell.key)
+        if cell.situation == "home":
+            raise RuntimeError("boom")
+        return "text", "api_success"
+
+    path = tmp_path / "matrix.jsonl"
+    results = run_matrix(cells, generate, lambda cell, text: {"valid": 1}, ResultsLog(path), workers=2)
+    assert results["student/studying/5"] == {"status": "api_success", "valid": 1}
+    assert results["student/home/5"] == {"status": "error", "error": "boom"}
+    assert summarize(cells, results, totals=("valid",))["student"]["valid"] == 1
+
+    # 再開では成功したセルだけを飛ばす
+    generated.clear()
+    run_matrix(cells, generate, lambda cell, text: {"valid": 1}, ResultsLog(path, resume=True))
+    assert generated == ["student/home/5"]
+
+
+@pytest.fixture
+def mock_tester(monkeypatch, tmp_path):
+    monkeypatch.setattr(phase_a1, "GEMINI_MOCK_MODE", True)
+    return phase_a1.PhaseA1ImplementationTester(
+        stream=True, output=tmp_path / "results.json", matrix_output=tmp_path / "matrix.jsonl")
+
+
+def test_mock_matrix_runs_every_cell_in_under_a_second(mock_tester):
+    started = time.perf_counter()
+    results = mock_tester.test_age_group_scenarios()
+    assert time.perf_counter() - started < 1.0
+    matrix = results["_matrix"]
+    assert matrix["cells"] == sum(len(s) for s in phase_a1.AGE_GROUP_SCENARIOS.values()) * 3
+    assert matrix["failed_cells"] == []
+    assert len(ResultsLog(matrix["output"], resume=True).completed) == matrix["cells"]
+
+
+def test_failed_cells_are_not_logged_as_completed(mock_tester, monkeypatch):
+    # 有効な提案が1件も無いセルは失敗
+    monkeypatch.setattr(mock_tester, "generate_mock_cell_response", lambda cell: "[]")
+    mock_tester.run_comprehensive_test()
+    matrix = mock_tester.test_results["age_group_scenarios"]["_matrix"]
+    assert len(matrix["failed_cells"]) == matrix["cells"]
+
+    entries = {}
+    for line in mock_tester.log.path.read_text(encoding="utf-8").splitlines():
+        entry = json.loads(line)
+        entries[entry["step"]] = entry["ok"]
+    assert entries == {"student_prompt": True, "age_group_scenarios": False,
+                       "prompt_personalization": True}
@@ -0,0 +1,69 @@
+"""gemini_tools.suggestion_stream: 逐次解析と検証"""
+import json
+
+from gemini_tools.suggestion_stream import SuggestionStreamParser, parse_suggestions, validate_suggestion
+
+
+def suggestion(**overrides):
+    data = {"title": "深呼吸", "description": "ゆっくり息を吐く", "category": "認知的",
+            "steps": ["座る", "吸う", "吐く"], "duration": 5}
+    data.update(overrides)
+    return data
+
+
+def test_stream_emits_objects_as_they_close():
+    text = "```json\n" + json.dumps([suggestion(title="a"), suggestion(title="b")], ensure_ascii=False) + "\n```"
+    parser = SuggestionStreamParser()
+    titles = []
+    for start in range(0, len(text), 7):
+        titles += [row["title"] for row in parser.feed(text[start:start + 7])]
+    parser.close()
+    assert titles == ["a", "b"]
+    assert parser.summary() == {"valid": 2, "invalid": 0, "errors": []}
+
+
+def test_feed_is_eager():
+    parser = SuggestionStreamParser()
+    parser.feed(json.dumps([suggestion()]))     # 戻り値を読まなくても解析される
+    assert parser.emitted == 1
+    assert isinstance(parser.feed(""), list)
+
+
+def test_wrapped_object_and_braces_in_strings():
+    text = json.dumps({"suggestions": [suggestion(description="括弧 } ] を含む")]}, ensure_ascii=False)
+    rows, summary = parse_suggestions("前置き [注] " + text)
+    assert [row["description"] for row in rows] == ["括弧 } ] を含む"]
+    assert summary["invalid"] == 0
+
+
+def test_bad_element_is_skipped():
+    text = "[" + json.dumps(suggestion(title="a")) + ", {\"title\": oops}, " + json.dumps(suggestion(title="b")) + "]"
+    rows, summary = parse_suggestions(text)
+    assert [row["title"] for row in rows] == ["a", "b"]
+    assert summary["invalid"] == 1
+
+
+def test_truncated_response_is_reported_on_close():
+    rows, summary = parse_suggestions("[" + json.dumps(suggestion()) + ", {\"title\": \"切れ")
+    assert len(rows) == 1
+    assert summary["errors"] == [["応答が途中で切れています"]]
+
+
+def test_validate_normalizes_row():
+    row, errors = validate_suggestion(suggestion(duration="15", category="behavioral", tags=[" 呼吸 "]),
+                                      {"situation": ["studying"]})
+    assert errors == []
+    assert row["duration"] == 15 and row["category"] == "行動的"
+    assert row["tags"] == ["呼吸"] and row["situation"] == ["studying"]
+
+
+def test_validate_rejects_bad_fields():
+    for bad in ({"duration": 7}, {"category": "その他"}, {"steps": "座る"}, {"title": ""},
+                {"tags": "呼吸"}, {"tags": ["呼吸", 3]}):
+        row, errors = validate_suggestion(suggestion(**bad))
+        assert row is None and errors, bad
+
+
+def test_missing_tags_fall_back_to_defaults():
+    row, _ = validate_suggestion(suggestion(), {"tags": ["既定"]})
+    assert row["tags"] == ["既定"]
@@ -0,0 +1,170 @@
+"""
+応答処理（提案のパース・検証・採点）の負荷試験用に、モデル応答の合成データを作る。
+
+generate_mock_student_response() の固定の3件ではなく、実際の応答に現れる崩れ方を混ぜた
+応答を任意の件数だけ作る。同じ seed・同じ設定なら何度作っても同じ応答になり、i 番目の応答は
+seed と i だけで決まる（件数を変えても先頭の応答は変わらない）。
+
+応答ごとに次をばらつかせる（割合は WorkloadConfig で変えられる）。
+
+  形       素の JSON 配列 / ```json のコードブロック / 前後に説明文 / {"suggestions": [...]}
+  切れ     途中で切れた JSON（最後の要素が閉じていない、または途中の要素の中で切れる）
+  欠け     必須項目（title / description / category / duration）が抜けた要素
+  不正値   duration が 5/15/30 以外、category が 認知的/行動的 以外、steps が文字列でない
+  絵文字   1項目あたりの絵文字数（emoji_density が平均）
+  長さ     日本語の説明・ガイドの長さ（短い / 普通 / 数千字の長文）
+
+各応答には、validate_suggestion() を通るはずの要素数（expected_valid）を付けるので、
+パーサーの結果と突き合わせられる（defaults に duration を含めない場合。含めると duration の
+欠けた要素も既定値で補われて通る）。
+
+使い方:
+  for response in generate_workload(WorkloadConfig(count=5000, seed=42)):
+      rows, summary = parse_suggestions(response.text)
+      assert summary["valid"] == response.expected_valid
+"""
+import json
+import random
+from typing import NamedTuple
+
+SHAPES = ("plain", "fenced", "prose", "envelope")
+
+EMOJIS = ["😊", "✨", "🌿", "☕", "🎵", "💪", "📚", "🌟", "🍵", "🌸", "🎧", "🧘"]
+# 文を組み立てる日本語の断片
+SUBJECTS = ["深呼吸", "ストレッチ", "音楽", "散歩", "お茶", "日記", "瞑想", "片付け", "空を見る", "手帳"]
+PHRASES = [
+    "ゆっくりと息を吸って、吐きましょう。",
+    "肩の力を抜いて、姿勢を整えます。",
+    "今の気持ちを言葉にしてみましょう。",
+    "目を閉じて、周りの音に耳を澄ませます。",
+    "できたことを一つ思い出してみてください。",
+    "無理をせず、自分のペースで続けましょう。",
+    "終わったら、軽く伸びをして戻ります。",
+]
+PROSE_BEFORE = ["以下が提案です。", "承知しました！学生向けの気晴らし方法を3つ提案します。"]
+PROSE_AFTER = ["いかがでしょうか。", "気に入ったものから試してみてくださいね。"]
+
+REQUIRED = ("title", "description", "category", "duration")
+INVALID_VALUES = {
+    "duration": [10, 0, "五分", None],
+    "category": ["運動", "other", ""],
+    "steps": ["ステップをまとめた1つの文字列", [1, 2, 3]],
+}
+VALID_CATEGORIES = ["認知的", "行動的", "cognitive", "behavioral"]
+VALID_DURATIONS = [5, 15, 30, "15"]
+
+
+class WorkloadConfig(NamedTuple):
+    count: int = 1000
+    seed: int = 42
+    shape_weights: tuple = (0.4, 0.3, 0.15, 0.15)    # SHAPES の順
+    truncate_rate: float = 0.1      # 途中で切れた応答の割合
+    missing_rate: float = 0.08      # 必須項目が欠けた要素の割合
+    invalid_rate: float = 0.05      # 値が不正な要素の割合
+    emoji_density: float = 1.0      # 1項目あたりの絵文字数の平均
+    long_rate: float = 0.05         # 説明・ガイドが数千字の要素の割合
+    min_items: int = 1
+    max_items: int = 5
+
+
+class SyntheticResponse(NamedTuple):
+    index: int
+    text: str
+    kinds: tuple            # この応答に入れた崩れ方（"fenced" / "truncated" / "missing" など）
+    items: int              # 応答に書いた要素数（切れた要素を含む）
+    expected_valid: int     # validate_suggestion() を通るはずの要素数
+
+
+def _sentence(rng: random.Random, length: int, emoji: int) -> str:
+    parts = []
+    total = 0
+    while total < length:
+        phrase = rng.choice(PHRASES)
+        parts.append(phrase)
+        total += len(phrase)
+    text = "".join(parts)[:max(1, length)]
+    for _ in range(emoji):
+        pos = rng.randint(0, len(text))
+        text = text[:pos] + rng.choice(EMOJIS) + text[pos:]
+    return text
+
+
+def _emoji_count(rng: random.Random, density: float) -> int:
+    # 平均 density の幾何分布に近い個数（0 個もある）
+    count = 0
+    while density > 0 and rng.random() < density / (density + 1):
+        count += 1
+    return count
+
+
+def _item(rng: random.Random, config: WorkloadConfig, i: int):
+    """(要素の dict, 検証を通るか, 崩れ方)"""
+    long = rng.random() < config.long_rate
+    title = f"{rng.choice(SUBJECTS)}で気分転換{i + 1}"
+    emoji = _emoji_count(rng, config.emoji_density)
+    if emoji:
+        title += "".join(rng.choice(EMOJIS) for _ in range(emoji))
+    item = {
+        "title": title,
+        "description": _sentence(rng, rng.randint(3000, 6000) if long else rng.randint(40, 140),
+                                 _emoji_count(rng, config.emoji_density)),
+        "category": rng.choice(VALID_CATEGORIES),
+        "steps": [_sentence(rng, rng.randint(10, 40), 0) for _ in range(rng.randint(2, 6))],
+        "guide": _sentence(rng, rng.randint(2000, 8000) if long else rng.randint(120, 320),
+                           _emoji_count(rng, config.emoji_density)),
+        "duration": rng.choice(VALID_DURATIONS),
+    }
+    kinds = ["long"] if long else []
+    valid = True
+    if rng.random() < config.missing_rate:
+        del item[rng.choice(REQUIRED)]
+        valid = False
+        kinds.append("missing")
+    elif rng.random() < config.invalid_rate:
+        field = rng.choice(sorted(INVALID_VALUES))
+        item[field] = rng.choice(INVALID_VALUES[field])
+        valid = False
+        kinds.append("invalid")
+    return item, valid, kinds
+
+
+def make_response(index: int, config: WorkloadConfig = WorkloadConfig()) -> SyntheticResponse:
+    """index 番目の合成応答（seed と index だけで決まる）"""
+    rng = random.Random(f"{config.seed}:{index}")
+    shape = rng.choices(SHAPES, weights=config.shape_weights)[0]
+    count = rng.randint(config.min_items, config.max_items)
+    kinds = {shape}
+    # 要素ごとに JSON を書き、閉じ括弧の位置（応答テキスト内）を覚えておく
+    pretty = shape != "plain" and rng.random() < 0.5
+    head = {"plain": "", "fenced": "```json\n", "prose": rng.choice(PROSE_BEFORE) + "\n",
+            "envelope": ""}[shape]
+    head += '{"suggestions": [' if shape == "envelope" else "["
+    body = head
+    valid_ends = []
+    for i in range(count):
+        item, valid, item_kinds = _item(rng, config, i)
+        kinds.update(item_kinds)
+        if i:
+            body += ","
+        body += "\n  " if pretty else ""
+        body += json.dumps(item, ensure_ascii=False, indent=2 if pretty else None)
+        if valid:
+            valid_ends.append(len(body))
+    body += "\n]" if pretty else "]"
+    if shape == "envelope":
+        body += "}"
+    body += {"plain": "", "fenced": "\n```", "prose": "\n" + rng.choice(PROSE_AFTER), "envelope": ""}[shape]
+
+    if rng.random() < config.truncate_rate:
+        # 最初の要素の開始より後のどこかで切る
+        cut = rng.randint(len(head) + 1, len(body) - 1)
+        body = body[:cut]
+        valid_ends = [end for end in valid_ends if end <= cut]
+        kinds.add("truncated")
+    return SyntheticResponse(index, body, tuple(sorted(kinds)), count, len(valid_ends))
+
+
+def generate_workload(config: WorkloadConfig = WorkloadConfig()):
+    """config.count 件の合成応答を順に返す"""
+    for index in range(config.count):
+        yield make_response(index, config)
@@ -0,0 +1 @@
+"""generate-seed.py から使う補助モジュール群。"""
@@ -0,0 +1,137 @@
+"""
+キーワード表（supabase/axis-keywords.json）による提案の軸タグ付け。
+
+全軸・全値のキーワードを1つの Aho-Corasick オートマトンにまとめてあらかじめ構築し、
+テキストを1回走査するだけで一致したすべての (軸, 値) を得る。キーワード数に依存せず
+テキスト長に比例した時間で済むので、AI を呼ばずに数十万行/分を処理できる。
+
+使い方:
+  tagger = AxisTagger.from_file(KEYWORDS_PATH)
+  axes = tagger.tag(row)   # {"season": [...], "weather": [...], ...}（値域順、該当なしは空配列）
+"""
+import json
+import unicodedata
+from collections import deque
+from pathlib import Path
+
+KEYWORDS_PATH = Path(__file__).resolve().parent.parent / "axis-keywords.json"
+
+# suggestions_master の軸カラムと値域（api/v1/_lib/contextAxes.js の VALID と同じ順）
+AXES = {
+    "season": ("spring", "summer", "autumn", "winter"),
+    "weather": ("sunny", "cloudy", "rainy", "snowy"),
+    "temperature_band": ("cold", "cool", "mild", "warm", "hot"),
+    "part_of_day": ("morning", "daytime", "evening", "night"),
+    "day_type": ("weekday", "weekend", "holiday"),
+    "mood": ("tired", "anxious", "irritated", "lonely", "bored", "sad", "calm"),
+    "intent": ("activating", "calming", "mindful", "problem_solving"),
+    "seasonal_events": ("rainy_season", "gw", "obon", "year_end_new_year",
+                        "fiscal_year_change", "pollen_high", "heat_wave"),
+    "energy_level": ("low", "medium", "high"),
+    "social_context": ("alone", "with_others"),
+    "time_pressure": ("relaxed", "pressed"),
+}
+
+# タグ付けの対象にする行のフィールド
+TEXT_FIELDS = ("title", "description", "guide")
+LIST_FIELDS = ("tags", "steps")
+
+
+def normalize(text: str) -> str:
+    """NFKC 正規化 + 小文字化（全角英数・半角カナの揺れを吸収する）"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+class AhoCorasick:
+    """複数パターンを同時に探す Aho-Corasick オートマトン。
+
+    ノードは goto 辞書・failure リンク・出力（payload の tuple）の3つの並列リストで持つ。
+    出力は構築時に failure 先の出力を合流済みなので、走査中に failure を辿り直さない。
+    """
+
+    def __init__(self, patterns):
+        """patterns: (パターン文字列, payload) のイテラブル"""
+        self._goto = [{}]
+        self._fail = [0]
+        outputs = [[]]
+        for pattern, payload in patterns:
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append([])
+                node = nxt
+            outputs[node].append(payload)
+
+        # 幅優先で failure リンクを張り、出力を合流させる
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                outputs[nxt].extend(outputs[self._fail[nxt]])
+        self._out = [tuple(dict.fromkeys(o)) for o in outputs]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def matches(self, text: str) -> set:
+        """text 中に現れたパターンの payload の集合"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+class AxisTagger:
+    """キーワード表から構築した Aho-Corasick で行に軸タグを付ける"""
+
+    def __init__(self, table: dict):
+        patterns = []
+        for axis, values in table.items():
+            if axis.startswith("_"):
+                continue
+            if axis not in AXES:
+                raise ValueError(f"未知の軸です: {axis}")
+            for value, keywords in values.items():
+                if value not in AXES[axis]:
+                    raise ValueError(f"{axis} の値域外です: {value}")
+                patterns.extend((normalize(k), (axis, value)) for k in keywords)
+        self.automaton = AhoCorasick(patterns)
+
+    @classmethod
+    def from_file(cls, path: Path = KEYWORDS_PATH) -> "AxisTagger":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def tag_text(self, text: str) -> dict:
+        found = self.automaton.matches(normalize(text))
+        return {
+            axis: [v for v in values if (axis, v) in found]
+            for axis, values in AXES.items()
+        }
+
+    def tag(self, row: dict) -> dict:
+        """行（generate-seed.py の展開済み行）の title / description / guide / tags / steps から軸を求める"""
+        parts = [row.get(field) or "" for field in TEXT_FIELDS]
+        for field in LIST_FIELDS:
+            parts.extend(row.get(field) or ())
+        # 区切りに改行を挟み、フィールドをまたいだ誤一致を防ぐ
+        return self.tag_text("\n".join(parts))
@@ -0,0 +1,153 @@
+"""
+提案カタログのインメモリ・ビットセット索引と検索。
+
+generate-seed.py の process_file() が返す行（または同じ形の dict）を読み込み、
+スカラー列（duration / category / source）と配列列（situation / age_groups / tags / 軸カラム）の
+「値ごとのビットセット」（Python の int）を持つ列指向ストアを作る。検索は各条件のビットセットを
+AND / OR するだけなので、Supabase に GIN インデックススキャンを何本も往復させずに済む。
+ローカルのフォールバックや、DB 検索結果のテストオラクルとして使う。
+
+行番号（内部 ID）は quality_score の降順（同点は読み込み順）に振り直してあるので、
+ビットの下位から取り出すだけで quality_score 順になる。
+
+絞り込みの意味は api/v1/_lib/dbSuggestions.js の getDbSuggestions と同じ:
+  situation   配列が値を含む
+  duration    一致
+  age_group   配列が値と重なる（v2 エイリアスは DB の値に読み替える）
+  軸カラム     空配列（汎用）または値と重なる
+"""
+from collections import defaultdict
+from itertools import islice
+
+SCALAR_COLUMNS = ("duration", "category", "source")
+ARRAY_COLUMNS = ("situation", "age_groups", "tags")
+# 空配列を「どの値にもマッチ」として扱う軸カラム
+AXIS_COLUMNS = (
+    "season", "weather", "temperature_band", "part_of_day", "day_type",
+    "mood", "intent", "seasonal_events",
+    "energy_level", "social_context", "time_pressure",
+)
+DEFAULT_QUALITY_SCORE = 3.0
+DEFAULT_LIMIT = 20
+
+# v2 API の age_group エイリアス → DB の age_groups 値（dbSuggestions.js と同じ）
+AGE_GROUP_ALIAS = {
+    "job_hunting_new_grad": "job_seeker",
+    "job_hunting_career": "career_changer",
+    "general": "office_worker",
+}
+
+# 1バイトの値 → 立っているビット位置
+_BYTE_BITS = [tuple(i for i in range(8) if b >> i & 1) for b in range(256)]
+
+
+def iter_bits(bits: int):
+    """立っているビットの位置を昇順に返す"""
+    if not bits:
+        return
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for offset, byte in enumerate(data):
+        if byte:
+            base = offset * 8
+            for i in _BYTE_BITS[byte]:
+                yield base + i
+
+
+def first_bits(bits: int, limit: int) -> list:
+    """下位から limit 個のビット位置（quality_score 上位 limit 件）"""
+    return list(islice(iter_bits(bits), limit))
+
+
+class CatalogIndex:
+    """列ごと・値ごとのビットセットを持つ提案カタログの索引"""
+
+    def __init__(self, rows):
+        rows = list(rows)
+        # quality_score 降順・読み込み順で内部 ID を振る
+        order = sorted(
+            range(len(rows)),
+            key=lambda i: -float(rows[i].get("quality_score", DEFAULT_QUALITY_SCORE)),
+        )
+        self.size = len(rows)
+        self.all_bits = (1 << self.size) - 1
+        # 内部 ID → 読み込み順の行番号
+        self.row_ids = order
+        self.titles = [rows[i]["title"] for i in order]
+        self.quality_scores = [
+            float(rows[i].get("quality_score", DEFAULT_QUALITY_SCORE)) for i in order
+        ]
+        # まず値ごとに内部 ID を集め、最後に1回だけ int にする（行ごとに巨大 int を作り直さない）
+        positions = {col: defaultdict(list) for col in SCALAR_COLUMNS + ARRAY_COLUMNS + AXIS_COLUMNS}
+        empty = {col: [] for col in AXIS_COLUMNS}
+        for internal, i in enumerate(order):
+            row = rows[i]
+            for col in SCALAR_COLUMNS:
+                if col in row:
+                    positions[col][row[col]].append(internal)
+            for col in ARRAY_COLUMNS:
+                for value in row.get(col) or ():
+                    positions[col][value].append(internal)
+            for col in AXIS_COLUMNS:
+                values = row.get(col) or ()
+                if not values:
+                    empty[col].append(internal)
+                for value in values:
+                    positions[col][value].append(internal)
+
+        self.bitsets = {
+            col: {value: self._to_bits(ids) for value, ids in table.items()}
+            for col, table in positions.items()
+        }
+        self.empty = {col: self._to_bits(ids) for col, ids in empty.items()}
+
+    def _to_bits(self, ids: list) -> int:
+        buf = bytearray((self.size + 7) // 8)
+        for i in ids:
+            buf[i >> 3] |= 1 << (i & 7)
+        return int.from_bytes(buf, "little")
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _any_of(self, col: str, values) -> int:
+        """col が values のいずれかを持つ行のビットセット（OR）"""
+        if isinstance(values, (str, int)):
+            values = (values,)
+        table = self.bitsets[col]
+        bits = 0
+        for value in values:
+            bits |= table.get(value, 0)
+        return bits
+
+    def match(self, situation=None, duration=None, age_group=None, category=None,
+              source=None, tags=None, **axes) -> int:
+        """条件に合う行のビットセットを返す。各条件は値1つか値のリスト（リスト内は OR）"""
+        bits = self.all_bits
+        if situation is not None:
+            bits &= self._any_of("situation", situation)
+        if duration is not None:
+            bits &= self._any_of("duration", duration)
+        if age_group is not None:
+            groups = (age_group,) if isinstance(age_group, str) else age_group
+            bits &= self._any_of("age_groups", [AGE_GROUP_ALIAS.get(g, g) for g in groups])
+        if category is not None:
+            bits &= self._any_of("category", category)
+        if source is not None:
+            bits &= self._any_of("source", source)
+        if tags is not None:
+            bits &= self._any_of("tags", tags)
+        for col, value in axes.items():
+            if col not in AXIS_COLUMNS:
+                raise ValueError(f"未知の軸です: {col}")
+            if value is not None:
+                bits &= self.empty[col] | self._any_of(col, value)
+        return bits
+
+    def query(self, limit=DEFAULT_LIMIT, **filters) -> list:
+        """条件に合う行の ID（読み込み順の行番号）を quality_score 降順で返す。limit=None で全件"""
+        bits = self.match(**filters)
+        ids = iter_bits(bits) if limit is None else first_bits(bits, limit)
+        return [self.row_ids[i] for i in ids]
+
+    def count(self, **filters) -> int:
+        return self.match(**filters).bit_count()
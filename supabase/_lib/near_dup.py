@@ -0,0 +1,193 @@
+"""
+提案カタログの近似重複検出（MinHash + LSH）。
+
+title + description の文字 n-gram（既定 2-gram）を shingle とし、one-permutation MinHash で
+署名を作る。署名を bands × rows に分けた LSH バケットで候補ペアだけを取り出し、候補ごとに
+shingle 集合の Jaccard 類似度を正確に計算して、しきい値以上のペアを Union-Find でクラスタに
+まとめる。全ペア比較をしないので処理時間はカタログ件数にほぼ線形。
+
+既定のしきい値 0.4 は、言い換えた近似重複（「深呼吸でリセット」と「深呼吸リセット法」に
+同じ手順の説明が付いたもの。Jaccard 0.44 前後）を拾い、カタログ内の別の提案同士
+（最も似たペアでも 0.24 程度）は拾わない値。LSH の S 字カーブの変曲点はしきい値の
+CANDIDATE_RATIO 倍に置き、しきい値付近のペアを候補から取りこぼさないようにする
+（余分な候補は正確な類似度で落ちる）。
+
+クラスタは単連結（A~B と B~C なら A・B・C が1つのクラスタ）なので、代表との推定類似度が
+しきい値未満のメンバーを含むことがある。まとめる（行を落とす）ときは、代表との類似度が
+しきい値以上のメンバーだけを対象にする。
+
+使い方:
+  index = NearDupIndex(threshold=0.4)
+  for key, text in items:
+      index.add(key, text)
+  for cluster in index.clusters():   # [(key, 代表との類似度), ...]（先頭が代表 = 最初に add したもの）
+      dups = [key for key, sim in cluster[1:] if sim >= index.threshold]   # 代表にまとめてよいもの
+"""
+import re
+import unicodedata
+import zlib
+from array import array
+from collections import defaultdict
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE_SIZE = 2
+DEFAULT_THRESHOLD = 0.4
+# LSH の変曲点 = しきい値 × CANDIDATE_RATIO
+CANDIDATE_RATIO = 0.75
+# これより大きい LSH バケットは全ペアを比べず、署名順に並べて後ろの BUCKET_NEIGHBORS 件とだけ比べる
+MAX_BUCKET_PAIRS = 64
+BUCKET_NEIGHBORS = 8
+
+_EMPTY = 0xFFFFFFFF
+_IGNORED = re.compile(r"[\s、。・！？!?「」『』（）()【】\[\]:：,，.．〜~ー\-]+")
+
+
+def normalize(text: str) -> str:
+    """NFKC 正規化・小文字化し、空白と記号を除く（全角半角や句読点の揺れを吸収する）"""
+    return _IGNORED.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def shingles(text: str, size: int = DEFAULT_SHINGLE_SIZE) -> set:
+    """文字 n-gram の集合。size 未満の短い文字列はそれ自体を1要素とする"""
+    text = normalize(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(shingle_set: set, num_perm: int = DEFAULT_NUM_PERM) -> array:
+    """one-permutation MinHash 署名（num_perm 個の 32bit 値）。
+
+    各 shingle の CRC32 を num_perm 個のビンに振り分け、ビンごとの最小値を取る。
+    空のビンは右隣の空でないビンの値で埋める（densification）。
+    shingle 1つにつきハッシュ1回で済むので、k 回ハッシュする古典的 MinHash より速い。
+    """
+    sig = array("I", [_EMPTY]) * num_perm
+    for sh in shingle_set:
+        h = zlib.crc32(sh.encode("utf-8"))
+        b = h % num_perm
+        v = h // num_perm
+        if v < sig[b]:
+            sig[b] = v
+    filled = [i for i in range(num_perm) if sig[i] != _EMPTY]
+    if filled and len(filled) < num_perm:
+        nxt = filled[0] + num_perm
+        for i in range(num_perm - 1, -1, -1):
+            if sig[i] != _EMPTY:
+                nxt = i
+            else:
+                # ビン位置を混ぜて、別のビンから借りた値同士が偶然一致しないようにする
+                sig[i] = (sig[nxt % num_perm] + (nxt - i) * 0x9E3779B1) & 0xFFFFFFFF
+    return sig
+
+
+def similarity(a: array, b: array) -> float:
+    """2つの署名から Jaccard 類似度を推定する"""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def jaccard(a: set, b: set) -> float:
+    """2つの shingle 集合の Jaccard 類似度"""
+    if not a and not b:
+        return 1.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+def lsh_params(threshold: float, num_perm: int = DEFAULT_NUM_PERM) -> tuple:
+    """(bands, rows) を返す。S 字カーブの変曲点 (1/b)^(1/r) がしきい値に最も近い分割を選ぶ
+
+    bands × rows が num_perm に満たないときは、署名の末尾の余りをバンドに使わない。
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        diff = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or diff < best[0]:
+            best = (diff, bands, rows)
+    return best[1], best[2]
+
+
+class NearDupIndex:
+    """MinHash 署名を LSH バケットに入れ、近似重複クラスタを求める"""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM,
+                 shingle_size: int = DEFAULT_SHINGLE_SIZE):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold は 0 より大きく 1 以下で指定してください")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_params(threshold * CANDIDATE_RATIO, num_perm)
+        self.keys = []
+        self.signatures = []
+        self.shingle_sets = []
+        self._buckets = [defaultdict(list) for _ in range(self.bands)]
+
+    def add(self, key, text: str) -> None:
+        """key（呼び出し側の識別子）と比較対象テキストを登録する"""
+        idx = len(self.keys)
+        shingle_set = shingles(text, self.shingle_size)
+        sig = minhash(shingle_set, self.num_perm)
+        self.keys.append(key)
+        self.signatures.append(sig)
+        self.shingle_sets.append(frozenset(shingle_set))
+        r = self.rows
+        for band, bucket in enumerate(self._buckets):
+            bucket[sig[band * r:(band + 1) * r].tobytes()].append(idx)
+
+    def _candidate_pairs(self):
+        seen = set()
+        for bucket in self._buckets:
+            for members in bucket.values():
+                if len(members) < 2:
+                    continue
+                if len(members) <= MAX_BUCKET_PAIRS:
+                    pairs = ((a, b) for i, a in enumerate(members) for b in members[i + 1:])
+                else:
+                    # 登録順ではなく署名の順に並べるので、比べる組は入力の順序によらない
+                    ordered = sorted(members, key=lambda i: self.signatures[i].tobytes())
+                    pairs = ((min(a, b), max(a, b)) for i, a in enumerate(ordered)
+                             for b in ordered[i + 1:i + 1 + BUCKET_NEIGHBORS])
+                for pair in pairs:
+                    if pair not in seen:
+                        seen.add(pair)
+                        yield pair
+
+    def clusters(self) -> list:
+        """2件以上のクラスタを返す。各クラスタは [(key, 代表との Jaccard 類似度), ...]。
+
+        代表は登録順で最初の要素。クラスタも代表の登録順に並べる。連鎖でつながったメンバーの
+        類似度はしきい値未満になりうる。
+        """
+        parent = list(range(len(self.keys)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        sets = self.shingle_sets
+        for a, b in self._candidate_pairs():
+            if jaccard(sets[a], sets[b]) >= self.threshold:
+                ra, rb = find(a), find(b)
+                if ra != rb:
+                    # 小さい添字（先に登録された方）を根にして代表を安定させる
+                    parent[max(ra, rb)] = min(ra, rb)
+
+        groups = defaultdict(list)
+        for i in range(len(self.keys)):
+            groups[find(i)].append(i)
+
+        result = []
+        for root in sorted(groups):
+            members = groups[root]
+            if len(members) < 2:
+                continue
+            rep = sets[root]
+            result.append([
+                (self.keys[i], 1.0 if i == root else round(jaccard(rep, sets[i]), 3))
+                for i in members
+            ])
+        return result
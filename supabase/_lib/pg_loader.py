@@ -0,0 +1,157 @@
+"""
+Postgres への直接ロード（並列 COPY → 1トランザクションで入れ替え）。
+
+1. UNLOGGED のステージングテーブル（suggestions_master と同じ列・既定値）を作る
+2. 行を COPY テキスト形式のチャンクにして有界キューに流し、workers 本の接続がそれぞれ
+   COPY ... FROM STDIN で並列に書き込む（接続ごとに独立してコミット）
+3. 全ワーカーが成功したら、1トランザクションで suggestions_master を DELETE し
+   ステージングから INSERT ... SELECT して入れ替える
+
+suggestions_master は suggestion_variants / user_saved_suggestions から外部キーで参照され、
+RLS ポリシーやトリガーも付いているため、テーブルの RENAME ではなく同一トランザクション内の
+DELETE + INSERT で入れ替える。コミットまでは他のセッションから旧データがそのまま見えるので、
+リロード中に半分空のテーブルが見えることはない。
+
+psycopg（v3）が必要: pip install "psycopg[binary]"
+"""
+import queue
+import threading
+import time
+
+STAGING_TABLE = "suggestions_master_load"
+DEFAULT_WORKERS = 4
+# 1チャンクあたりの行数（ワーカーへの受け渡し単位）
+CHUNK_ROWS = 2000
+
+
+def _connect(dsn: str):
+    try:
+        import psycopg
+    except ImportError as e:
+        raise RuntimeError(
+            '--load には psycopg が必要です: pip install "psycopg[binary]"'
+        ) from e
+    return psycopg.connect(dsn)
+
+
+class _Worker(threading.Thread):
+    """キューから COPY テキストのチャンクを受け取り、自分の接続でステージングに流し込む"""
+
+    def __init__(self, index: int, dsn: str, copy_sql: str, chunks: queue.Queue, abort: threading.Event):
+        super().__init__(name=f"copy-worker-{index}", daemon=True)
+        self.index = index
+        self.dsn = dsn
+        self.copy_sql = copy_sql
+        self.chunks = chunks
+        self.abort = abort
+        self.rows = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.error = None
+
+    def run(self):
+        start = time.perf_counter()
+        finished = False
+        try:
+            with _connect(self.dsn) as conn, conn.cursor() as cur:
+                with cur.copy(self.copy_sql) as copy:
+                    while True:
+                        item = self.chunks.get()
+                        if item is None:
+                            finished = True
+                            break
+                        if self.abort.is_set():
+                            continue
+                        count, text = item
+                        data = text.encode("utf-8")
+                        copy.write(data)
+                        self.rows += count
+                        self.bytes += len(data)
+                conn.commit()
+        except Exception as e:  # noqa: BLE001 - 呼び出し側でまとめて報告する
+            self.error = e
+            self.abort.set()
+            # 送り手が詰まらないよう、終了の合図（None）まで残りのチャンクを読み捨てる
+            while not finished:
+                finished = self.chunks.get() is None
+        finally:
+            self.seconds = time.perf_counter() - start
+
+
+def load_parallel(dsn: str, rows, columns: tuple, render, workers: int = DEFAULT_WORKERS,
+                  chunk_rows: int = CHUNK_ROWS, log=print) -> int:
+    """rows を並列 COPY でステージングに入れ、suggestions_master と入れ替える。件数を返す。
+
+    render は行を COPY テキスト形式の1行（改行付き）にする関数。
+    いずれかのワーカー、または行の生成・変換（rows / render）が失敗した場合はステージングを
+    破棄し、suggestions_master は変更しない（後者はその例外をそのまま送出する）。
+    """
+    column_list = ", ".join(columns)
+    with _connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+            cur.execute(
+                f"CREATE UNLOGGED TABLE {STAGING_TABLE} (LIKE suggestions_master INCLUDING DEFAULTS)"
+            )
+        conn.commit()
+
+        chunks = queue.Queue(maxsize=workers * 2)
+        abort = threading.Event()
+        copy_sql = f"COPY {STAGING_TABLE} ({column_list}) FROM STDIN"
+        pool = [_Worker(i, dsn, copy_sql, chunks, abort) for i in range(workers)]
+        for w in pool:
+            w.start()
+
+        start = time.perf_counter()
+        total = 0
+        produce_error = None
+        try:
+            buf = []
+            for row in rows:
+                if abort.is_set():
+                    break
+                buf.append(render(row))
+                if len(buf) >= chunk_rows:
+                    chunks.put((len(buf), "".join(buf)))
+                    total += len(buf)
+                    buf = []
+            if buf and not abort.is_set():
+                chunks.put((len(buf), "".join(buf)))
+                total += len(buf)
+        except BaseException as e:
+            # 行の生成・変換で失敗した: ワーカーには残りのチャンクを書かせない
+            produce_error = e
+            abort.set()
+        finally:
+            for _ in pool:
+                chunks.put(None)
+            for w in pool:
+                w.join()
+
+        for w in pool:
+            rate = w.rows / w.seconds if w.seconds else 0
+            log(f"  worker {w.index}: {w.rows} rows, {w.bytes / 1e6:.1f} MB, "
+                f"{w.seconds:.2f} s ({rate:,.0f} rows/s)"
+                + (f" ERROR: {w.error}" if w.error else ""))
+        errors = [w.error for w in pool if w.error]
+        if errors or produce_error is not None:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+            conn.commit()
+            if produce_error is not None:
+                raise produce_error
+            raise RuntimeError(f"COPY に失敗したため suggestions_master は変更していません: {errors[0]}")
+        log(f"  copy: {total} rows in {time.perf_counter() - start:.2f} s ({workers} workers)")
+
+        swap_start = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute("LOCK TABLE suggestions_master IN EXCLUSIVE MODE")
+            cur.execute("DELETE FROM suggestions_master")
+            cur.execute(
+                f"INSERT INTO suggestions_master ({column_list}) "
+                f"SELECT {column_list} FROM {STAGING_TABLE}"
+            )
+            cur.execute(f"DROP TABLE {STAGING_TABLE}")
+        conn.commit()
+        log(f"  swap: {time.perf_counter() - swap_start:.2f} s")
+    return total
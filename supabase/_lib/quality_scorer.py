@@ -0,0 +1,184 @@
+"""
+提案の品質ヒューリスティック（学生向けプロンプトの必須条件）のバッチ採点。
+
+age_group_implementation_test.py の学生向けプロンプトが各提案に課す条件を、列ごとの
+配列演算でまとめて判定する。
+
+  title_length   タイトルが 20 文字以内
+  step_count     手順が 3〜5 ステップ
+  guide_length   ガイドが 200 文字程度（150〜250 文字）
+  emoji_count    絵文字が 1〜2 個（title / description / steps / guide の合計）
+  duration       expected_duration と一致（指定が無ければ 5 / 15 / 30 のいずれか）
+  category       「認知的」または「行動的」
+
+行から取り出すのは各列の長さ・個数（絵文字は正規表現で数える）だけで、条件の判定と
+合成スコア（通過した条件の重み付き割合 × SCORE_SCALE）は NumPy の配列演算で行う。
+NumPy が無い環境では同じ判定を純 Python で行う（結果は同じ）。
+
+使い方:
+  result = score_suggestions(suggestions, expected_duration=5)
+  result.pass_rates()      # {"title_length": 0.93, ...}
+  result.composite         # 行ごとの合成スコア（0〜SCORE_SCALE）
+  for row in score_rows(rows, stats=stats):   # row["quality_score"] を埋めて流す
+      ...
+"""
+import re
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:  # NumPy が無ければ純 Python で同じ判定をする
+    np = None
+
+RULES = ("title_length", "step_count", "guide_length", "emoji_count", "duration", "category")
+DEFAULT_WEIGHTS = {rule: 1.0 for rule in RULES}
+
+TITLE_MAX = 20
+STEPS_MIN, STEPS_MAX = 3, 5
+# ガイドの「200文字程度」は ±25% まで許す
+GUIDE_MIN, GUIDE_MAX = 150, 250
+EMOJI_MIN, EMOJI_MAX = 1, 2
+DURATIONS = (5, 15, 30)
+CATEGORIES = ("認知的", "行動的")
+# suggestions_master.quality_score の尺度（シードの既定値 3.0 と同じ 0〜5）
+SCORE_SCALE = 5.0
+# score_rows が1回の配列演算で採点する行数
+SCORE_BATCH_ROWS = 5000
+
+# 絵文字（記号・絵文字の主なブロック。異体字セレクタと ZWJ は数えない）
+EMOJI = re.compile(
+    "[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\u2300-\u23FF\u3297\u3299\u203C\u2049]"
+)
+
+
+def _emoji_count(s: dict) -> int:
+    steps = s.get("steps") or []
+    text = "\n".join([s.get("title") or "", s.get("description") or "", *map(str, steps),
+                      s.get("guide") or ""])
+    return len(EMOJI.findall(text))
+
+
+def _duration(value):
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    return -1
+
+
+def _count(flags) -> int:
+    if np is not None and isinstance(flags, np.ndarray):
+        return int(np.count_nonzero(flags))
+    return sum(flags)
+
+
+class ScoreResult:
+    """rule ごとの通過フラグ（passed）と行ごとの合成スコア（composite）"""
+
+    def __init__(self, passed: dict, composite):
+        self.passed = passed
+        self.composite = composite
+
+    def __len__(self) -> int:
+        return len(self.composite)
+
+    def pass_rates(self) -> dict:
+        n = len(self)
+        return {rule: (_count(flags) / n if n else 0.0) for rule, flags in self.passed.items()}
+
+    def scores(self) -> list:
+        return [round(float(score), 2) for score in self.composite]
+
+
+def extract_columns(suggestions: list) -> dict:
+    """判定に使う列（長さ・個数・値）を行から取り出す"""
+    return {
+        "title_len": [len(s.get("title") or "") for s in suggestions],
+        "steps": [len(s.get("steps") or []) for s in suggestions],
+        "guide_len": [len(s.get("guide") or "") for s in suggestions],
+        "duration": [_duration(s.get("duration")) for s in suggestions],
+        "category": [s.get("category") or "" for s in suggestions],
+        "emoji": [_emoji_count(s) for s in suggestions],
+    }
+
+
+def _score_numpy(cols: dict, expected_duration, weights: dict) -> ScoreResult:
+    n = len(cols["emoji"])
+    title_len = np.fromiter(cols["title_len"], dtype=np.int64, count=n)
+    steps = np.fromiter(cols["steps"], dtype=np.int64, count=n)
+    guide_len = np.fromiter(cols["guide_len"], dtype=np.int64, count=n)
+    duration = np.fromiter(cols["duration"], dtype=np.int64, count=n)
+    emoji = np.fromiter(cols["emoji"], dtype=np.int64, count=n)
+    category = np.array(cols["category"], dtype=object)
+
+    expected = DURATIONS if expected_duration is None else (expected_duration,)
+    passed = {
+        "title_length": (title_len > 0) & (title_len <= TITLE_MAX),
+        "step_count": (steps >= STEPS_MIN) & (steps <= STEPS_MAX),
+        "guide_length": (guide_len >= GUIDE_MIN) & (guide_len <= GUIDE_MAX),
+        "emoji_count": (emoji >= EMOJI_MIN) & (emoji <= EMOJI_MAX),
+        "duration": np.isin(duration, expected),
+        "category": np.isin(category, CATEGORIES),
+    }
+    total = sum(weights.values())
+    composite = sum(passed[rule] * weight for rule, weight in weights.items()) * (SCORE_SCALE / total)
+    return ScoreResult(passed, np.asarray(composite, dtype=np.float64).reshape(n))
+
+
+def _score_python(cols: dict, expected_duration, weights: dict) -> ScoreResult:
+    expected = DURATIONS if expected_duration is None else (expected_duration,)
+    passed = {
+        "title_length": [0 < x <= TITLE_MAX for x in cols["title_len"]],
+        "step_count": [STEPS_MIN <= x <= STEPS_MAX for x in cols["steps"]],
+        "guide_length": [GUIDE_MIN <= x <= GUIDE_MAX for x in cols["guide_len"]],
+        "emoji_count": [EMOJI_MIN <= x <= EMOJI_MAX for x in cols["emoji"]],
+        "duration": [x in expected for x in cols["duration"]],
+        "category": [x in CATEGORIES for x in cols["category"]],
+    }
+    total = sum(weights.values())
+    composite = [
+        sum(passed[rule][i] * weight for rule, weight in weights.items()) * (SCORE_SCALE / total)
+        for i in range(len(cols["emoji"]))
+    ]
+    return ScoreResult(passed, composite)
+
+
+def score_suggestions(suggestions: list, expected_duration: int = None, weights: dict = None,
+                      use_numpy: bool = None) -> ScoreResult:
+    """提案（dict）のリストを採点する。use_numpy=None は NumPy があれば使う"""
+    return score_columns(extract_columns(suggestions), expected_duration, weights, use_numpy)
+
+
+def score_columns(cols: dict, expected_duration: int = None, weights: dict = None,
+                  use_numpy: bool = None) -> ScoreResult:
+    """extract_columns() の列を採点する"""
+    weights = weights or DEFAULT_WEIGHTS
+    unknown = set(weights) - set(RULES)
+    if unknown:
+        raise ValueError(f"未知のルールです: {', '.join(sorted(unknown))}")
+    if use_numpy and np is None:
+        raise RuntimeError("NumPy がありません: pip install numpy")
+    if np is not None and use_numpy is not False:
+        return _score_numpy(cols, expected_duration, weights)
+    return _score_python(cols, expected_duration, weights)
+
+
+def score_rows(rows, batch_size: int = SCORE_BATCH_ROWS, stats: dict = None, **kwargs):
+    """行を batch_size 件ずつ採点して row["quality_score"] を埋めながら流す
+
+    stats には rows（件数）と rule ごとの通過件数（passed）を積み上げる。
+    """
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, batch_size))
+        if not batch:
+            return
+        result = score_suggestions(batch, **kwargs)
+        if stats is not None:
+            stats["rows"] = stats.get("rows", 0) + len(batch)
+            passed = stats.setdefault("passed", {rule: 0 for rule in result.passed})
+            for rule, flags in result.passed.items():
+                passed[rule] += _count(flags)
+        for row, score in zip(batch, result.scores()):
+            row["quality_score"] = score
+        yield from batch
@@ -0,0 +1,62 @@
+"""_lib.axis_tagger: キーワード表による軸タグ付け"""
+import pytest
+
+from _lib.axis_tagger import AXES, KEYWORDS_PATH, AhoCorasick, AxisTagger
+
+
+@pytest.fixture(scope="module")
+def tagger():
+    return AxisTagger.from_file(KEYWORDS_PATH)
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = AhoCorasick([("he", 1), ("she", 2), ("his", 3), ("hers", 4), ("", 5)])
+    assert automaton.matches("ushers") == {1, 2, 4}
+    assert automaton.matches("this") == {3}
+    assert automaton.matches("xyz") == set()
+
+
+def test_tags_situation_keywords(tagger):
+    axes = tagger.tag({"title": "寝る前の深呼吸", "description": "布団に入ったら、ゆっくり呼吸法を試す",
+                       "steps": ["一人で静かな場所に座る"], "tags": []})
+    assert axes["part_of_day"] == ["night"]
+    assert axes["intent"] == ["calming"]
+    assert axes["social_context"] == ["alone"]
+    assert axes["season"] == []
+    assert list(axes) == list(AXES)
+
+
+def test_values_follow_axis_order(tagger):
+    axes = tagger.tag_text("雪の日、晴れた日")
+    assert axes["weather"] == ["sunny", "snowy"]
+
+
+@pytest.mark.parametrize("text", [
+    "座布団に座る",          # 布団
+    "新年度の目標",          # 新年
+    "1分類ごとに整理",        # 1分
+    "(1分)",
+])
+def test_broad_keywords_do_not_match(tagger, text):
+    axes = tagger.tag_text(text)
+    assert axes["part_of_day"] == []
+    assert "year_end_new_year" not in axes["seasonal_events"]
+    assert axes["time_pressure"] == []
+
+
+def test_normalizes_width(tagger):
+    assert tagger.tag_text("ＧＷの過ごし方")["seasonal_events"] == ["gw"]
+
+
+def test_fields_are_not_joined(tagger):
+    # title の末尾と description の先頭がつながって「夜の」にならない
+    assert tagger.tag({"title": "今夜", "description": ""})["part_of_day"] == ["night"]
+    assert tagger.tag({"title": "深夜", "description": "のんびり"})["part_of_day"] == []
+
+
+def test_rejects_unknown_axis_or_value():
+    with pytest.raises(ValueError):
+        AxisTagger({"colour": {"red": ["赤"]}})
+    with pytest.raises(ValueError):
+        AxisTagger({"season": {"monsoon": ["雨季"]}})
+    AxisTagger({"_comment": "無視される", "season": {"spring": ["春の"]}})
@@ -0,0 +1,76 @@
+"""_lib.catalog_index: ビットセット索引の検索（素朴なフィルタと同じ結果になること）"""
+import random
+
+import pytest
+
+from _lib.catalog_index import CatalogIndex, first_bits, iter_bits
+
+ROWS = [
+    {"title": "a", "duration": 5, "category": "認知的", "situation": ["studying"],
+     "age_groups": ["student"], "tags": ["呼吸"], "mood": [], "quality_score": 3.0},
+    {"title": "b", "duration": 15, "category": "行動的", "situation": ["home", "workplace"],
+     "age_groups": ["office_worker"], "tags": [], "mood": ["tired"], "quality_score": 4.5},
+    {"title": "c", "duration": 5, "category": "行動的", "situation": ["home"],
+     "age_groups": ["job_seeker", "student"], "tags": ["散歩"], "mood": ["anxious"]},
+    {"title": "d", "duration": 5, "category": "認知的", "situation": ["home"],
+     "age_groups": ["student"], "tags": [], "mood": [], "quality_score": 4.5},
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return CatalogIndex(ROWS)
+
+
+def test_iter_bits():
+    assert list(iter_bits(0)) == []
+    assert list(iter_bits(0b1000_0000_0101)) == [0, 2, 11]
+    assert first_bits((1 << 100) | 0b110, 2) == [1, 2]
+
+
+def test_orders_by_quality_score_then_input(index):
+    assert index.query(limit=None) == [1, 3, 0, 2]
+    assert index.query(limit=2) == [1, 3]
+
+
+def test_filters(index):
+    assert index.query(situation="home", duration=5) == [3, 2]
+    assert index.query(situation=["studying", "workplace"]) == [1, 0]
+    assert index.query(category="行動的", tags="散歩") == [2]
+    assert index.count(age_group="student") == 3
+    # v2 のエイリアスは DB の値に読み替える
+    assert index.query(age_group="job_hunting_new_grad") == [2]
+    assert index.query(situation="nowhere") == []
+
+
+def test_empty_axis_matches_any_value(index):
+    assert index.query(mood="tired") == [1, 3, 0]
+    assert index.query(mood=["tired", "anxious"]) == [1, 3, 0, 2]
+    with pytest.raises(ValueError):
+        index.query(colour="red")
+
+
+def naive(rows, situation, duration, mood):
+    hits = [i for i, row in enumerate(rows)
+            if situation in row["situation"] and row["duration"] == duration
+            and (not row["mood"] or mood in row["mood"])]
+    return sorted(hits, key=lambda i: -row_score(rows[i]))
+
+
+def row_score(row):
+    return float(row.get("quality_score", 3.0))
+
+
+def test_matches_naive_filter_on_random_catalog():
+    rng = random.Random(0)
+    rows = [{"title": str(i), "duration": rng.choice((5, 15, 30)),
+             "situation": rng.sample(["home", "workplace", "studying", "outside"], rng.randint(1, 3)),
+             "mood": rng.sample(["tired", "anxious", "sad"], rng.randint(0, 2)),
+             "quality_score": rng.choice((2.0, 3.0, 4.0))}
+            for i in range(500)]
+    index = CatalogIndex(rows)
+    for situation in ("home", "studying"):
+        for duration in (5, 30):
+            for mood in ("tired", "sad"):
+                assert index.query(limit=None, situation=situation, duration=duration, mood=mood) == \
+                    naive(rows, situation, duration, mood)
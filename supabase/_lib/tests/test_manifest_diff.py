@@ -0,0 +1,83 @@
+"""generate-seed.py の差分モードとマニフェストの更新"""
+import importlib.util
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parents[2] / "generate-seed.py"
+
+
+@pytest.fixture(scope="module")
+def seed():
+    spec = importlib.util.spec_from_file_location("generate_seed", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_rows(seed, descriptions: dict):
+    """{title: description} の行と、そのフィンガープリント"""
+    rows = [{"title": title, "description": description, "category": "認知的", "duration": 5,
+             "situation": ["home"], "age_groups": [], "tags": [], "steps": [], "guide": "",
+             "source": "manual", "is_public": True}
+            for title, description in descriptions.items()]
+    fingerprints = {}
+    return list(seed.record_fingerprints(rows, fingerprints)), fingerprints
+
+
+def test_diff_writes_changed_rows_and_deletes(seed):
+    _, previous = make_rows(seed, {"a": "説明", "b": "説明", "c": "説明"})
+    rows, fingerprints = make_rows(seed, {"a": "説明", "b": "変更", "d": "説明"})
+
+    out = io.StringIO()
+    changed, removed = seed.write_diff(out, rows, previous, fingerprints, batch_size=10)
+    sql = out.getvalue()
+    assert (changed, removed) == (2, 1)
+    assert "ON CONFLICT (title, duration) DO UPDATE" in sql
+    assert "'b'" in sql and "'d'" in sql and "('a'" not in sql
+    assert "DELETE FROM suggestions_master WHERE (title, duration) IN (\n  ('c', 5)\n)" in sql
+
+
+def test_removed_keys_keeps_colons_in_title(seed):
+    assert seed.removed_keys({"15:時間: 15分": "x"}, {}) == [("時間: 15分", 15)]
+
+
+def test_manifest_version_mismatch_treats_all_rows_as_changed(seed, tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"version": -1, "rows": {"5:a": "x"}}), encoding="utf-8")
+    assert seed.load_manifest(path) == {}
+    assert seed.load_manifest(tmp_path / "missing.json") == {}
+
+
+def run(seed, tmp_path, *args):
+    seed.main([*args, "--manifest", str(tmp_path / "manifest.json"), "--cache-dir", str(tmp_path / "cache")])
+
+
+def test_manifest_is_updated_only_when_asked(seed, tmp_path, capsys):
+    manifest = tmp_path / "manifest.json"
+    # --output で別の場所に書いた全件出力はマニフェストを作らない
+    run(seed, tmp_path, "--output", str(tmp_path / "seed.sql"))
+    assert not manifest.exists()
+
+    run(seed, tmp_path, "--output", str(tmp_path / "seed.sql"), "--update-manifest")
+    saved = json.loads(manifest.read_text(encoding="utf-8"))
+    assert saved["rows"]
+
+    # 差分を出しても、適用するまではマニフェストを進めない
+    edited = dict(saved, rows=dict(saved["rows"]))
+    key = sorted(edited["rows"])[0]
+    edited["rows"][key] = "0" * 32
+    edited["rows"]["5:削除された提案"] = "0" * 32
+    manifest.write_text(json.dumps(edited), encoding="utf-8")
+    capsys.readouterr()
+    run(seed, tmp_path, "--diff", "--output", str(tmp_path / "diff.sql"))
+    assert "Diff: upsert 1 rows, delete 1 rows" in capsys.readouterr().out
+    assert json.loads(manifest.read_text(encoding="utf-8")) == edited
+
+    run(seed, tmp_path, "--diff", "--output", str(tmp_path / "diff.sql"), "--update-manifest")
+    assert json.loads(manifest.read_text(encoding="utf-8")) == saved
+    capsys.readouterr()
+    run(seed, tmp_path, "--diff", "--output", str(tmp_path / "diff.sql"))
+    assert "Diff: upsert 0 rows, delete 0 rows" in capsys.readouterr().out
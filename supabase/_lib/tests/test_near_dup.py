@@ -0,0 +1,79 @@
+"""_lib.near_dup: 近似重複クラスタ"""
+from _lib.near_dup import (
+    DEFAULT_THRESHOLD, NearDupIndex, jaccard, lsh_params, minhash, normalize, shingles, similarity,
+)
+
+# 依頼の例: 同じ手順を言い換えた提案
+RESET = "深呼吸でリセット\n4秒吸って7秒止め、8秒で吐く呼吸法で気持ちをリセットする"
+RESET_HOWTO = "深呼吸リセット法\n4秒吸って、7秒止めて、8秒かけて吐く深呼吸で心をリセットする"
+# カタログで最も似ている別の提案同士
+MUSIC = "好きな音楽を聴く\nお気に入りの曲を聴いて気分転換"
+PHOTOS = "好きな写真や動画を見る\nお気に入りの写真や動画を見て気分転換"
+
+
+def cluster_keys(index):
+    return [[key for key, _ in cluster] for cluster in index.clusters()]
+
+
+def test_example_pair_clusters_at_defaults():
+    index = NearDupIndex()
+    index.add("reset", RESET)
+    index.add("howto", RESET_HOWTO)
+    [cluster] = index.clusters()
+    assert cluster[0] == ("reset", 1.0)
+    assert cluster[1][0] == "howto" and cluster[1][1] >= DEFAULT_THRESHOLD
+
+
+def test_titles_alone_cluster():
+    index = NearDupIndex()
+    index.add("a", "深呼吸でリセット")
+    index.add("b", "深呼吸リセット法")
+    assert cluster_keys(index) == [["a", "b"]]
+
+
+def test_distinct_suggestions_do_not_cluster():
+    index = NearDupIndex()
+    for key, text in (("music", MUSIC), ("photos", PHOTOS), ("reset", RESET)):
+        index.add(key, text)
+    assert index.clusters() == []
+
+
+def test_chained_member_keeps_low_similarity_to_representative():
+    index = NearDupIndex(threshold=0.5)
+    index.add("a", "あいうえおかきくけこ")
+    index.add("b", "うえおかきくけこさし")
+    index.add("c", "かきくけこさしすせそ")
+    [cluster] = index.clusters()
+    sims = dict(cluster)
+    assert set(sims) == {"a", "b", "c"}
+    assert sims["b"] >= 0.5 > sims["c"]
+
+
+def test_representative_is_first_added_and_order_is_stable():
+    texts = [("x", RESET), ("y", RESET_HOWTO), ("z", MUSIC)]
+    forward, backward = NearDupIndex(), NearDupIndex()
+    for key, text in texts:
+        forward.add(key, text)
+    for key, text in reversed(texts):
+        backward.add(key, text)
+    assert cluster_keys(forward) == [["x", "y"]]
+    assert cluster_keys(backward) == [["y", "x"]]
+
+
+def test_normalize_and_shingles():
+    assert normalize("深呼吸・リセット！ ＡＢ") == "深呼吸リセットab"
+    assert shingles("深呼吸") == {"深呼", "呼吸"}
+    assert shingles("あ") == {"あ"}
+    assert shingles("、。") == set()
+
+
+def test_minhash_estimates_jaccard():
+    a, b = shingles(RESET), shingles(RESET_HOWTO)
+    assert similarity(minhash(a), minhash(a)) == 1.0
+    assert abs(similarity(minhash(a), minhash(b)) - jaccard(a, b)) < 0.15
+
+
+def test_lsh_params():
+    bands, rows = lsh_params(0.3, 128)
+    assert (bands, rows) == (42, 3)
+    assert bands * rows <= 128
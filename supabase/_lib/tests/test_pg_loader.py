@@ -0,0 +1,98 @@
+"""_lib.pg_loader: psycopg の接続を差し替えて、失敗時にステージングを破棄することを確かめる"""
+import threading
+
+import pytest
+
+from _lib import pg_loader
+
+
+class FakeDB:
+    """接続ごとの SQL と COPY で書かれたデータを記録する"""
+
+    def __init__(self, fail_copy: bool = False):
+        self.fail_copy = fail_copy
+        self.sql = []
+        self.copied = []
+        self.lock = threading.Lock()
+
+    def connect(self, dsn):
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+
+class FakeCursor(FakeConnection):
+    def execute(self, sql):
+        with self.db.lock:
+            self.db.sql.append(sql)
+
+    def copy(self, sql):
+        return FakeCopy(self.db)
+
+
+class FakeCopy(FakeConnection):
+    def write(self, data):
+        if self.db.fail_copy:
+            raise OSError("connection lost")
+        with self.db.lock:
+            self.db.copied.append(data.decode("utf-8"))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(pg_loader, "_connect", db.connect)
+    return db
+
+
+def render(row):
+    return f"{row}\n"
+
+
+def swapped(db):
+    return any(sql.startswith("DELETE FROM suggestions_master") for sql in db.sql)
+
+
+def test_load_swaps_after_all_chunks(db):
+    total = pg_loader.load_parallel("dsn", range(25), ("title",), render, workers=3, chunk_rows=4,
+                                    log=lambda *a: None)
+    assert total == 25
+    assert sorted(int(line) for chunk in db.copied for line in chunk.splitlines()) == list(range(25))
+    assert swapped(db)
+    assert db.sql[-1] == f"DROP TABLE {pg_loader.STAGING_TABLE}"
+
+
+def test_worker_error_drops_staging(db):
+    db.fail_copy = True
+    with pytest.raises(RuntimeError, match="変更していません"):
+        pg_loader.load_parallel("dsn", range(25), ("title",), render, workers=2, chunk_rows=4,
+                                log=lambda *a: None)
+    assert not swapped(db)
+    assert db.sql[-1] == f"DROP TABLE IF EXISTS {pg_loader.STAGING_TABLE}"
+
+
+def test_producer_error_drops_staging_and_reraises(db):
+    def rows():
+        yield from range(10)
+        raise ValueError("bad source row")
+
+    with pytest.raises(ValueError, match="bad source row"):
+        pg_loader.load_parallel("dsn", rows(), ("title",), render, workers=2, chunk_rows=4,
+                                log=lambda *a: None)
+    assert not swapped(db)
+    assert db.sql[-1] == f"DROP TABLE IF EXISTS {pg_loader.STAGING_TABLE}"
@@ -0,0 +1,70 @@
+"""_lib.quality_scorer: 条件ごとの判定と合成スコア"""
+import pytest
+
+from _lib import quality_scorer
+from _lib.quality_scorer import RULES, SCORE_SCALE, score_rows, score_suggestions
+
+GOOD = {
+    "title": "深呼吸でリセット🌿",
+    "steps": ["座る", "吸う", "吐く"],
+    "guide": "あ" * 200,
+    "duration": 5,
+    "category": "認知的",
+}
+BAD = {
+    "title": "とても長いタイトルでにじゅう文字をこえてしまう提案です",
+    "steps": ["一つだけ"],
+    "guide": "短い",
+    "duration": 7,
+    "category": "その他",
+}
+
+BACKENDS = [False] + ([True] if quality_scorer.np is not None else [])
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+def test_each_rule(use_numpy):
+    result = score_suggestions([GOOD, BAD], use_numpy=use_numpy)
+    for rule in RULES:
+        assert [bool(x) for x in result.passed[rule]] == [True, False], rule
+    assert result.scores() == [SCORE_SCALE, 0.0]
+    assert result.pass_rates() == {rule: 0.5 for rule in RULES}
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+def test_emoji_and_duration_edges(use_numpy):
+    three_emoji = dict(GOOD, title="🌿🌿🌿")
+    string_duration = dict(GOOD, duration="15")
+    result = score_suggestions([three_emoji, string_duration], use_numpy=use_numpy)
+    assert [bool(x) for x in result.passed["emoji_count"]] == [False, True]
+    assert [bool(x) for x in result.passed["duration"]] == [True, True]
+    # 期待する duration を指定すればそれ以外は通らない
+    result = score_suggestions([string_duration], expected_duration=5, use_numpy=use_numpy)
+    assert not result.passed["duration"][0]
+
+
+def test_numpy_and_python_agree():
+    if quality_scorer.np is None:
+        pytest.skip("NumPy がありません")
+    rows = [GOOD, BAD, dict(GOOD, steps=[]), dict(BAD, category="行動的")] * 3
+    fast = score_suggestions(rows, use_numpy=True)
+    slow = score_suggestions(rows, use_numpy=False)
+    assert fast.scores() == slow.scores()
+    assert fast.pass_rates() == slow.pass_rates()
+
+
+def test_weights():
+    result = score_suggestions([dict(BAD, category="行動的")], weights={"category": 3, "title_length": 1},
+                               use_numpy=False)
+    assert result.scores() == [SCORE_SCALE * 3 / 4]
+    with pytest.raises(ValueError):
+        score_suggestions([GOOD], weights={"unknown": 1})
+
+
+def test_score_rows_fills_quality_score_in_batches():
+    rows = [dict(GOOD) for _ in range(5)] + [dict(BAD)]
+    stats = {}
+    scored = list(score_rows(rows, batch_size=2, stats=stats))
+    assert [row["quality_score"] for row in scored] == [SCORE_SCALE] * 5 + [0.0]
+    assert stats["rows"] == 6
+    assert stats["passed"] == {rule: 5 for rule in RULES}
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+_lib/catalog_index.py（ビットセット索引）と素朴なリスト走査の検索速度比較。
+
+合成カタログ（generate-seed.py の展開済み行と同じ形 + 軸カラム + quality_score）を作り、
+同じ条件を両方で解いて結果が一致することを確かめてから、1クエリあたりの時間を比べる。
+
+使い方:
+  python3 supabase/benchmarks/catalog_query.py [--rows 100000] [--seed 42] [--repeat 200]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from _lib.catalog_index import AGE_GROUP_ALIAS, AXIS_COLUMNS, CatalogIndex  # noqa: E402
+
+SITUATIONS = ["workplace", "home", "outside", "studying", "school", "commuting", "job_hunting"]
+AGE_GROUPS = ["office_worker", "student", "middle_school", "housewife", "elderly",
+              "job_seeker", "career_changer"]
+AXIS_VALUES = {
+    "season": ["spring", "summer", "autumn", "winter"],
+    "weather": ["sunny", "cloudy", "rainy", "snowy"],
+    "part_of_day": ["morning", "daytime", "evening", "night"],
+    "mood": ["tired", "anxious", "irritated", "lonely", "bored", "sad", "calm"],
+    "energy_level": ["low", "medium", "high"],
+}
+
+QUERIES = [
+    {"situation": "workplace", "duration": 5, "age_group": "student", "mood": "tired"},
+    {"situation": "home", "duration": 15},
+    {"situation": "studying", "duration": 30, "age_group": "general", "season": "winter",
+     "weather": "rainy", "part_of_day": "night"},
+    {"situation": "outside", "duration": 5, "category": "行動的", "energy_level": "high"},
+]
+
+
+def synthetic_rows(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        row = {
+            "title": f"合成提案{i:07d}",
+            "duration": rng.choice((5, 15, 30)),
+            "category": rng.choice(("認知的", "行動的")),
+            "source": "manual",
+            "situation": rng.sample(SITUATIONS, rng.randint(1, 3)),
+            "age_groups": rng.sample(AGE_GROUPS, rng.randint(1, 2)),
+            "tags": [],
+            "quality_score": round(rng.uniform(1, 5), 1),
+        }
+        for col in AXIS_COLUMNS:
+            values = AXIS_VALUES.get(col, [])
+            # 半分程度の行は空配列（汎用）にする
+            row[col] = rng.sample(values, rng.randint(1, 2)) if values and rng.random() < 0.5 else []
+        rows.append(row)
+    return rows
+
+
+def naive_query(rows: list, limit: int = 20, situation=None, duration=None, age_group=None,
+                category=None, **axes) -> list:
+    """dbSuggestions.js と同じ条件をリスト走査で解く（比較・検証用）"""
+    hits = []
+    for i, row in enumerate(rows):
+        if situation is not None and situation not in row["situation"]:
+            continue
+        if duration is not None and row["duration"] != duration:
+            continue
+        if age_group is not None and AGE_GROUP_ALIAS.get(age_group, age_group) not in row["age_groups"]:
+            continue
+        if category is not None and row["category"] != category:
+            continue
+        if any(row[col] and value not in row[col] for col, value in axes.items()):
+            continue
+        hits.append(i)
+    hits.sort(key=lambda i: -rows[i]["quality_score"])
+    return hits[:limit]
+
+
+def per_query_us(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ビットセット索引と素朴なフィルタの比較")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows, args.seed)
+    start = time.perf_counter()
+    index = CatalogIndex(rows)
+    print(f"rows: {len(rows)}, build: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    naive_repeat = max(1, args.repeat // 50)
+    print(f"{'matches':>8} {'bitset us':>10} {'naive us':>10} {'speedup':>8}  query")
+    for q in QUERIES:
+        expected = naive_query(rows, **q)
+        got = index.query(**q)
+        if got != expected:
+            raise SystemExit(f"結果が一致しません: {q}\n  index: {got}\n  naive: {expected}")
+        bitset_us = per_query_us(lambda: index.query(**q), args.repeat)
+        naive_us = per_query_us(lambda: naive_query(rows, **q), naive_repeat)
+        print(f"{index.count(**q):>8} {bitset_us:>10.1f} {naive_us:>10.1f} "
+              f"{naive_us / bitset_us:>7.0f}x  {q}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+_lib/quality_scorer.py の NumPy の配列演算と純 Python の判定の速度比較。
+
+合成の提案（タイトル長・手順数・ガイド長・絵文字数・duration・カテゴリを条件の内外に散らしたもの）を
+作り、両方で採点して条件ごとの通過フラグと合成スコアが一致することを確かめてから、
+条件ごとの通過率と、1000 件あたりの時間を「列の取り出し（共通）」と「判定 + 合成」に分けて出す。
+NumPy が無ければ純 Python だけ測る。
+
+使い方:
+  python3 supabase/benchmarks/quality_scorer.py [--rows 50000] [--seed 42] [--repeat 3]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from _lib import quality_scorer  # noqa: E402
+from _lib.quality_scorer import extract_columns, score_columns  # noqa: E402
+
+EMOJIS = ["😊", "🌿", "✨", "☕", "🎵", "🌬️", "💪"]
+
+
+def synthetic_suggestions(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        emoji = "".join(rng.choice(EMOJIS) for _ in range(rng.choice((0, 1, 1, 2, 2, 3))))
+        rows.append({
+            "title": f"{emoji}合成提案{i}" + "あ" * rng.randint(0, 16),
+            "description": "気分を切り替える短い休憩です。" * rng.randint(1, 4),
+            "steps": [f"ステップ{n}" for n in range(rng.randint(1, 7))],
+            "guide": "ゆっくり息を吸って、吐きましょう。" * rng.randint(5, 16),
+            "duration": rng.choice((5, 5, 15, 30, 10)),
+            "category": rng.choice(("認知的", "行動的", "行動的", "cognitive")),
+        })
+    return rows
+
+
+def per_1k_ms(fn, count: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best / count * 1000 * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = synthetic_suggestions(args.rows, args.seed)
+    cols = extract_columns(rows)
+    python = score_columns(cols, use_numpy=False)
+    print(f"rows: {len(rows)}")
+    print(f"{'rule':<14} {'pass':>6}")
+    for rule, rate in python.pass_rates().items():
+        print(f"{rule:<14} {rate:>6.1%}")
+    print(f"{'composite':<14} {sum(python.composite) / len(rows):>6.2f}（平均、0〜{quality_scorer.SCORE_SCALE:g}）")
+
+    extract_ms = per_1k_ms(lambda: extract_columns(rows), len(rows), args.repeat)
+    python_ms = per_1k_ms(lambda: score_columns(cols, use_numpy=False), len(rows), args.repeat)
+    print(f"\n{'extract ms/1k':>14} {'python ms/1k':>13} {'numpy ms/1k':>12} {'speedup':>8}")
+    if quality_scorer.np is None:
+        print(f"{extract_ms:>14.2f} {python_ms:>13.2f} {'-':>12} {'-':>8}  （NumPy がありません）")
+        return
+    vectorized = score_columns(cols, use_numpy=True)
+    for rule in quality_scorer.RULES:
+        if list(vectorized.passed[rule]) != list(python.passed[rule]):
+            raise SystemExit(f"通過フラグが一致しません: {rule}")
+    if vectorized.scores() != python.scores():
+        raise SystemExit("合成スコアが一致しません")
+    numpy_ms = per_1k_ms(lambda: score_columns(cols, use_numpy=True), len(rows), args.repeat)
+    print(f"{extract_ms:>14.2f} {python_ms:>13.2f} {numpy_ms:>12.2f} {python_ms / numpy_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+generate-seed.py のストリーミングパイプラインのピークメモリ（RSS）計測。
+
+合成データ（{"suggestions": [...]} 形式）を件数を変えて作り、件数ごとに別プロセスで
+parse → duration 展開 → 重複排除 → SQL 書き出し（/dev/null）を実行して ru_maxrss を比べる。
+比較用に旧実装相当（json.load + 全行リスト化）も計測する。
+
+使い方:
+  python3 supabase/benchmarks/seed_memory.py [--sizes 10000,100000,300000] [--modes stream,legacy]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SEED_SCRIPT = Path(__file__).resolve().parent.parent / "generate-seed.py"
+
+CHILD = r"""
+import importlib.util, json, os, resource, sys
+spec = importlib.util.spec_from_file_location("generate_seed", sys.argv[1])
+gs = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gs)
+path, mode = sys.argv[2], sys.argv[3]
+stats = {"total": 0, "unique": 0}
+if mode == "stream":
+    rows = gs.dedup_rows(gs.iter_source_rows([(path, "manual", [])], stats), stats)
+else:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    all_rows = []
+    for s in data["suggestions"]:
+        all_rows.extend(gs.expand_suggestion(s, "manual", []))
+    rows = list(gs.dedup_rows(all_rows, stats))
+with open(os.devnull, "w", encoding="utf-8") as out:
+    gs.write_seed(out, rows)
+print(json.dumps({"maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  "unique": stats["unique"]}))
+"""
+
+
+def write_synthetic(path: Path, count: int) -> None:
+    """count 件の合成提案を1件ずつ書き出す（生成側もメモリを使わない）"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"suggestions": [\n')
+        for i in range(count):
+            s = {
+                "id": f"syn{i:07d}",
+                "category": "cognitive" if i % 2 else "behavioral",
+                "title": f"合成提案{i:07d}",
+                "description": "ベンチマーク用の合成データです。" * 3,
+                "situations": ["workplace", "home"],
+                "durations": [5, 15, 30],
+                "guide": {
+                    str(d): f"{d}分間の手順です。ゆっくり深呼吸します。肩の力を抜きます。" * 2
+                    for d in (5, 15, 30)
+                },
+            }
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(s, ensure_ascii=False))
+        f.write("\n]}\n")
+
+
+def measure(path: Path, mode: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, str(SEED_SCRIPT), str(path), mode],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="generate-seed.py のピーク RSS 計測")
+    parser.add_argument("--sizes", default="10000,100000,300000")
+    parser.add_argument("--modes", default="stream,legacy")
+    args = parser.parse_args()
+    sizes = [int(n) for n in args.sizes.split(",")]
+    modes = args.modes.split(",")
+
+    print(f"{'suggestions':>12} {'file MB':>8} " + " ".join(f"{m + ' MB':>10}" for m in modes))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = Path(tmp) / f"synthetic-{n}.json"
+            write_synthetic(path, n)
+            size_mb = os.path.getsize(path) / 1e6
+            cols = [f"{measure(path, m)['maxrss_kb'] / 1024:>10.1f}" for m in modes]
+            print(f"{n:>12} {size_mb:>8.1f} " + " ".join(cols))
+            path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+generate-seed.py のステージ別スループット / メモリ計測。
+
+backend/src/data/suggestions.json と同じ形（duration キーの guide / situations / tags /
+ageGroups）の合成ソースをシード付きで生成し、件数ごとに別プロセスで以下を計測する。
+
+  parse          iter_json_array による要素の切り出し
+  extract_steps  guide の分割（expand_suggestion 内の呼び出しを含む）
+  expand         duration ごとの行への展開（extract_steps を除く）
+  dedup          (title, duration) の重複排除
+  emit           SQL 書き出し（/dev/null）
+
+時間は全ステージを1本のストリームで流し、各ステージの入力イテレータの next() に
+かかった時間を差し引いた「自ステージ分」を測る。メモリはステージまでの累積パイプラインを
+別プロセスで流し、tracemalloc のピークと ru_maxrss を取る（前ステージとの差が増分）。
+
+結果はコミットハッシュ付きの JSON に書き出すので、--compare で前回の結果と比べられる。
+
+使い方:
+  python3 supabase/benchmarks/seed_stages.py [--sizes 10000,100000,1000000] [--seed 42]
+      [--format insert|multi-insert|copy] [--no-memory] [--output PATH] [--compare PREVIOUS.json]
+  python3 supabase/benchmarks/seed_stages.py --generate 100000 --output catalog.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+SEED_SCRIPT = BENCH_DIR.parent / "generate-seed.py"
+RESULTS_DIR = BENCH_DIR / "results"
+
+STAGES = ("parse", "extract_steps", "expand", "dedup", "emit")
+RESULT_VERSION = 1
+
+SITUATIONS = ["workplace", "home", "outside", "studying", "school", "commuting", "job_hunting"]
+AGE_GROUPS = ["office_worker", "student", "middle_school", "housewife", "elderly",
+              "job_seeker", "career_changer"]
+CATEGORIES = {"cognitive": ["memory", "imagination", "mindfulness"],
+              "behavioral": ["refreshment", "exercise", "breathing"]}
+TAGS = ["リラックス", "呼吸", "ストレッチ", "音楽", "散歩", "集中", "気分転換", "睡眠"]
+SENTENCES = [
+    "目を閉じて、ゆっくりと深呼吸をしましょう。",
+    "肩の力を抜いて、背筋を伸ばします。",
+    "最近楽しかったことを思い出してみましょう。",
+    "窓の外の景色を眺めて、目を休めます。",
+    "温かい飲み物を一口ずつ味わってください。",
+    "好きな音楽を一曲だけ聴いてみましょう。",
+    "手首と足首をゆっくり回します。",
+    "今の気持ちを紙に書き出してみます。",
+]
+# 既存提案と同じタイトルを再利用する割合（重複排除ステージに仕事をさせる）
+DUP_RATE = 0.05
+
+# 子プロセス: argv = [script, source, until, fmt, trace]
+CHILD = r"""
+import importlib.util, itertools, json, os, resource, sys, time, tracemalloc
+spec = importlib.util.spec_from_file_location("generate_seed", sys.argv[1])
+gs = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gs)
+path, until, fmt, trace = sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5] == "1"
+STAGES = ("parse", "extract_steps", "expand", "dedup", "emit")
+depth = STAGES.index(until)
+
+
+class Timed:
+    # next() にかかった時間（上流を含む）と件数を数えるラッパー
+    def __init__(self, it):
+        self.it, self.seconds, self.count = iter(it), 0.0, 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t = time.perf_counter()
+        try:
+            item = next(self.it)
+        finally:
+            self.seconds += time.perf_counter() - t
+        self.count += 1
+        return item
+
+
+steps_time = 0.0
+steps_calls = 0
+extract_steps = gs.extract_steps
+
+
+def timed_extract_steps(guide, durations):
+    global steps_time, steps_calls
+    t = time.perf_counter()
+    try:
+        return extract_steps(guide, durations)
+    finally:
+        steps_time += time.perf_counter() - t
+        steps_calls += 1
+
+
+gs.extract_steps = timed_extract_steps
+if trace:
+    tracemalloc.start()
+stats = {"total": 0, "unique": 0}
+seconds = {}
+counts = {}
+started = time.perf_counter()
+with open(path, encoding="utf-8") as f:
+    parsed = Timed(gs.iter_json_array(f))
+    if depth == 0:
+        for _ in parsed:
+            pass
+    elif depth == 1:
+        for s in parsed:
+            for d in s.get("durations", []):
+                timed_extract_steps(s.get("guide", {}), [d])
+    else:
+        expanded = Timed(itertools.chain.from_iterable(
+            gs.expand_suggestion(s, "manual", []) for s in parsed))
+        if depth == 2:
+            for _ in expanded:
+                pass
+        else:
+            unique = Timed(gs.dedup_rows(expanded, stats))
+            if depth == 3:
+                for _ in unique:
+                    pass
+            else:
+                with open(os.devnull, "w", encoding="utf-8") as out:
+                    t = time.perf_counter()
+                    gs.write_seed(out, unique, fmt)
+                    seconds["emit"] = time.perf_counter() - t - unique.seconds
+                counts["emit"] = unique.count
+            seconds["dedup"] = unique.seconds - expanded.seconds
+            counts["dedup"] = unique.count
+        seconds["expand"] = expanded.seconds - parsed.seconds - steps_time
+        counts["expand"] = expanded.count
+    seconds["parse"] = parsed.seconds
+    counts["parse"] = parsed.count
+    if depth >= 1:
+        seconds["extract_steps"] = steps_time
+        counts["extract_steps"] = steps_calls
+print(json.dumps({
+    "wall_seconds": time.perf_counter() - started,
+    "seconds": seconds,
+    "counts": counts,
+    "peak_alloc_bytes": tracemalloc.get_traced_memory()[1] if trace else None,
+    "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "total": counts.get("expand", 0),
+    "unique": stats["unique"],
+}))
+"""
+
+
+def synthetic_suggestions(count: int, seed: int):
+    """suggestions.json と同じ形の合成提案を1件ずつ返す（seed が同じなら同じ列）"""
+    rng = random.Random(seed)
+    for i in range(count):
+        category = rng.choice(list(CATEGORIES))
+        durations = sorted(rng.sample((5, 15, 30), rng.randint(1, 3)))
+        if i and rng.random() < DUP_RATE:
+            title = f"合成提案{rng.randrange(i):07d}"
+        else:
+            title = f"合成提案{i:07d}"
+        s = {
+            "id": f"syn{i:07d}",
+            "category": category,
+            "subcategory": rng.choice(CATEGORIES[category]),
+            "title": title,
+            "description": "".join(rng.sample(SENTENCES, 2)),
+            "situations": rng.sample(SITUATIONS, rng.randint(1, 4)),
+            "durations": durations,
+            "guide": {str(d): "".join(rng.choices(SENTENCES, k=rng.randint(2, 6)))
+                      for d in durations},
+        }
+        if rng.random() < 0.5:
+            s["tags"] = rng.sample(TAGS, rng.randint(1, 3))
+        if rng.random() < 0.5:
+            s["ageGroups"] = rng.sample(AGE_GROUPS, rng.randint(1, 3))
+        yield s
+
+
+def write_catalog(path: Path, count: int, seed: int) -> None:
+    """合成提案を {"suggestions": [...]} 形式で1件ずつ書き出す"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{\n  "suggestions": [\n')
+        for i, s in enumerate(synthetic_suggestions(count, seed)):
+            if i:
+                f.write(",\n")
+            f.write("    " + json.dumps(s, ensure_ascii=False))
+        f.write("\n  ]\n}\n")
+
+
+def run_child(path: Path, until: str, fmt: str, trace: bool) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, str(SEED_SCRIPT), str(path), until, fmt, "1" if trace else "0"],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure(path: Path, fmt: str, memory: bool = True) -> dict:
+    """1ファイル分: 全ステージのタイミング + ステージまでの累積メモリ"""
+    timing = run_child(path, "emit", fmt, trace=False)
+    stages = {}
+    prev_alloc = prev_rss = 0
+    for stage in STAGES:
+        seconds = timing["seconds"][stage]
+        count = timing["counts"][stage]
+        stages[stage] = {
+            "seconds": round(seconds, 4),
+            "items": count,
+            "items_per_sec": round(count / seconds) if seconds > 0 else None,
+        }
+        if memory:
+            # tracemalloc は遅いのでタイミング計測とは別プロセスで取る
+            mem = run_child(path, stage, fmt, trace=True)
+            stages[stage].update({
+                "peak_alloc_bytes": mem["peak_alloc_bytes"],
+                "peak_alloc_delta_bytes": mem["peak_alloc_bytes"] - prev_alloc,
+                "maxrss_kb": mem["maxrss_kb"],
+                "maxrss_delta_kb": mem["maxrss_kb"] - prev_rss,
+            })
+            prev_alloc, prev_rss = mem["peak_alloc_bytes"], mem["maxrss_kb"]
+    return {
+        "wall_seconds": round(timing["wall_seconds"], 4),
+        "maxrss_kb": timing["maxrss_kb"],
+        "rows_total": timing["total"],
+        "rows_unique": timing["unique"],
+        "stages": stages,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_table(size: int, result: dict, previous: dict = None) -> None:
+    print(f"\n== {size:,} suggestions → {result['rows_unique']:,} rows "
+          f"({result['wall_seconds']:.2f} s, maxrss {result['maxrss_kb'] / 1024:.1f} MB)")
+    header = f"{'stage':<14} {'seconds':>9} {'items/s':>12} {'alloc Δ MB':>11} {'rss Δ MB':>9}"
+    if previous:
+        header += f" {'vs prev':>8}"
+    print(header)
+    for stage, r in result["stages"].items():
+        line = f"{stage:<14} {r['seconds']:>9.3f} {r['items_per_sec'] or 0:>12,} "
+        if "maxrss_kb" in r:
+            line += f"{r['peak_alloc_delta_bytes'] / 1e6:>11.1f} {r['maxrss_delta_kb'] / 1024:>9.1f}"
+        else:
+            line += f"{'-':>11} {'-':>9}"
+        prev = previous and previous["stages"].get(stage)
+        if prev and prev["seconds"]:
+            line += f" {r['seconds'] / prev['seconds']:>7.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="generate-seed.py のステージ別ベンチマーク")
+    parser.add_argument("--sizes", default="10000,100000",
+                        help="合成提案の件数（カンマ区切り。1000000 も可）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=("insert", "multi-insert", "copy"), default="insert",
+                        help="emit ステージの出力形式")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="結果 JSON（既定: benchmarks/results/seed-stages-<commit>.json）")
+    parser.add_argument("--compare", type=Path, default=None, help="比較する前回の結果 JSON")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="メモリ計測（ステージごとの tracemalloc パス）を省く")
+    parser.add_argument("--generate", type=int, default=None, metavar="N",
+                        help="計測せず N 件の合成ソースを --output に書き出す")
+    args = parser.parse_args()
+
+    if args.generate is not None:
+        if args.output is None:
+            parser.error("--generate には --output が必要です")
+        write_catalog(args.output, args.generate, args.seed)
+        print(f"Generated: {args.output} ({args.generate} suggestions, seed {args.seed})")
+        return
+
+    sizes = [int(n) for n in args.sizes.split(",")]
+    previous = {}
+    if args.compare:
+        previous = json.loads(args.compare.read_text(encoding="utf-8")).get("results", {})
+
+    commit = git_commit()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = Path(tmp) / f"synthetic-{n}.json"
+            write_catalog(path, n, args.seed)
+            results[str(n)] = measure(path, args.format, memory=not args.no_memory)
+            results[str(n)]["source_bytes"] = os.path.getsize(path)
+            print_table(n, results[str(n)], previous.get(str(n)))
+            path.unlink()
+
+    output = args.output or RESULTS_DIR / f"seed-stages-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "version": RESULT_VERSION,
+        "commit": commit,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "format": args.format,
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"\nResults: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+-- generate-seed.py --diff 用: (title, duration) を一意キーにする
+-- 差分シードは INSERT ... ON CONFLICT (title, duration) DO UPDATE で変更行だけを更新するため、
+-- 衝突判定に使う一意インデックスが必要。seed 側は既に (title, duration) で重複排除済み。
+-- 既存DBに重複行がある場合はこのマイグレーション適用前に解消すること。
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_suggestions_master_title_duration
+  ON suggestions_master (title, duration);
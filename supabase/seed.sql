@@ -1,6 +1,5 @@
 -- 自動生成: generate-seed.py
 -- 提案マスタのシードデータ
--- 159 件
 
 DELETE FROM suggestions_master;
 
@@ -2389,3 +2388,4 @@ INSERT INTO suggestions_master (title, description, duration, category, situatio
   3.0
 );
 
+-- 159 件